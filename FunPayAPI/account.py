@@ -44,11 +44,15 @@ class Account:
 
     :param locale: текущий язык аккаунта, опционально.
     :type locale: :obj:`Literal["ru", "en", "uk"]` or :obj:`None`
+
+    :param max_saved_chats: максимальное кол-во сохраненных чатов и ID собеседников
+        (давно не использовавшиеся вытесняются). `None` - без ограничения.
+    :type max_saved_chats: :obj:`int` or :obj:`None`, опционально
     """
 
     def __init__(self, golden_key: str, user_agent: str | None = None,
                  requests_timeout: int | float = 10, proxy: Optional[dict] = None,
-                 locale: Literal["ru", "en", "uk"] | None = None):
+                 locale: Literal["ru", "en", "uk"] | None = None, max_saved_chats: int | None = 5000):
         self.golden_key: str = golden_key
         """Токен (golden_key) аккаунта."""
         self.user_agent: str | None = user_agent
@@ -57,6 +61,8 @@ class Account:
         """Тайм-аут ожидания ответа на запросы."""
         self.proxy = proxy
         """Прокси"""
+        self.session: requests.Session = requests.Session()
+        """Сессия requests (пул соединений с funpay.com, общий для всех запросов аккаунта и Runner'а)."""
         self.html: str | None = None
         """HTML основной страницы FunPay."""
         self.app_data: dict | None = None
@@ -102,12 +108,12 @@ class Account:
         self.last_update: int | None = None
         """Последнее время обновления аккаунта."""
 
-        self.interlocutor_ids: dict[int, int] = {}
+        self.interlocutor_ids: dict[int, int] = utils.LRUDict(max_saved_chats)
         """{id чата: id собеседника}"""
 
         self.__initiated: bool = False
 
-        self.__saved_chats: dict[int, types.ChatShortcut] = {}
+        self.__saved_chats: dict[int, types.ChatShortcut] = utils.LRUDict(max_saved_chats)
         self.runner: Runner | None = None
         """Объект Runner'а."""
         self._logout_link: str | None = None
@@ -186,17 +192,17 @@ class Account:
         if request_method == "get" and locale and locale != self.locale:
             link += f'{"&" if "?" in link else "?"}setlocale={locale}'
         for i in range(10):
-            response = getattr(requests, request_method)(link, headers=headers, data=payload,
-                                                         timeout=self.requests_timeout,
-                                                         proxies=self.proxy or {}, allow_redirects=False)
+            response = getattr(self.session, request_method)(link, headers=headers, data=payload,
+                                                             timeout=self.requests_timeout,
+                                                             proxies=self.proxy or {}, allow_redirects=False)
             if not (300 <= response.status_code < 400) or 'Location' not in response.headers:
                 break
             link = response.headers['Location']
             update_locale(link)
         else:
-            response = getattr(requests, request_method)(link, headers=headers, data=payload,
-                                                         timeout=self.requests_timeout,
-                                                         proxies=self.proxy or {})
+            response = getattr(self.session, request_method)(link, headers=headers, data=payload,
+                                                             timeout=self.requests_timeout,
+                                                             proxies=self.proxy or {})
         if response.status_code == 429:
             self.last_429_err_time = time.time()
 
@@ -343,7 +349,7 @@ class Account:
                     del attributes[i]
 
             lot_obj = types.LotShortcut(offer_id, server, description, amount, price, currency, subcategory_obj, seller,
-                                        auto, promo, attributes, str(offer))
+                                        auto, promo, attributes, str(offer) if types.KEEP_HTML else None)
             result.append(lot_obj)
         return result
 
@@ -1121,7 +1127,7 @@ class Account:
                         self.currency = currency
                 lot_obj = types.LotShortcut(offer_id, server, description, amount, price, currency, subcategory_obj,
                                             None, auto,
-                                            None, None, str(j))
+                                            None, None, str(j) if types.KEEP_HTML else None)
                 user_obj.add_lot(lot_obj)
         return user_obj
 
@@ -1481,7 +1487,8 @@ class Account:
             id1, id2 = sorted([buyer_id, self.id])
             chat_id = f"users-{id1}-{id2}"
             order_obj = types.OrderShortcut(order_id, description, price, currency, buyer_username, buyer_id, chat_id,
-                                            order_status, order_date, subcategory_name, subcategory, str(div))
+                                            order_status, order_date, subcategory_name, subcategory,
+                                            str(div) if types.KEEP_HTML else None)
             sales.append(order_obj)
 
         return next_order_id, sales, locale, sudcategories
@@ -1508,6 +1515,18 @@ class Account:
         for i in chats:
             self.__saved_chats[i.id] = i
 
+    def get_cache_sizes(self) -> dict[str, int]:
+        """
+        Возвращает текущие размеры кэшей аккаунта (для контроля потребления памяти).
+
+        :return: словарь {название кэша: кол-во элементов}.
+        :rtype: :obj:`dict` {:obj:`str`: :obj:`int`}
+        """
+        return {
+            "saved_chats": len(self.__saved_chats),
+            "interlocutor_ids": len(self.interlocutor_ids)
+        }
+
     def request_chats(self) -> list[types.ChatShortcut]:
         """
         Запрашивает чаты и парсит их.
@@ -1562,7 +1581,8 @@ class Account:
             elif last_msg_text.startswith(self.old_bot_character):
                 last_msg_text = last_msg_text[1:]
                 by_vertex = True
-            chat_obj = types.ChatShortcut(chat_id, chat_with, last_msg_text, node_msg_id, user_msg_id, unread, str(msg))
+            chat_obj = types.ChatShortcut(chat_id, chat_with, last_msg_text, node_msg_id, user_msg_id, unread,
+                                          str(msg) if types.KEEP_HTML else None)
             if not is_image:
                 chat_obj.last_by_bot = by_bot
                 chat_obj.last_by_vertex = by_vertex
@@ -1603,9 +1623,9 @@ class Account:
         if not self.is_initiated:
             raise exceptions.AccountNotInitiatedError()
 
-        for i in self.__saved_chats:
-            if self.__saved_chats[i].name == name:
-                return self.__saved_chats[i]
+        for chat in list(self.__saved_chats.values()):
+            if chat.name == name:
+                return self.__saved_chats.get(chat.id, chat)
 
         if make_request:
             self.add_chats(self.request_chats())
@@ -1926,6 +1946,7 @@ class Account:
                          interlocutor_id: Optional[int] = None, interlocutor_username: Optional[str] = None,
                          from_id: int = 0) -> list[types.Message]:
         messages = []
+        parsers = []
         ids = {self.id: self.username, 0: "FunPay"}
         badges = {}
         if interlocutor_id is not None:
@@ -1982,15 +2003,22 @@ class Account:
                                         None, author_id, i["html"], image_link, image_name, determine_msg_type=False)
             message_obj.by_bot = by_bot
             message_obj.by_vertex = by_vertex
-            message_obj.type = types.MessageTypes.NON_SYSTEM if author_id != 0 else message_obj.get_message_type()
+            if author_id == 0:
+                system_message = utils.parse_system_message(message_text)
+                message_obj.type = system_message.type
+                message_obj.order_id = system_message.order_id
+                message_obj.initiator_username = system_message.initiator_username
+            else:
+                message_obj.type = types.MessageTypes.NON_SYSTEM
 
             messages.append(message_obj)
+            parsers.append(parser)
 
-        for i in messages:
+        # переиспользуем уже распарсенный HTML, т.к. в самом сообщении он может не сохраняться (types.KEEP_HTML)
+        for i, parser in zip(messages, parsers):
             i.author = ids.get(i.author_id)
             i.chat_name = interlocutor_username
             i.badge = badges.get(i.author_id) if badges.get(i.author_id) != 0 else None
-            parser = BeautifulSoup(i.html, "lxml")
             if i.badge:
                 i.is_employee = True
                 if i.badge in ("поддержка", "підтримка", "support"):
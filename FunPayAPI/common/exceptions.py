@@ -1,6 +1,8 @@
 """
 В данном модуле описаны все кастомные исключения, используемые в пакете FunPayAPI.
 """
+from __future__ import annotations
+
 import requests
 from .. import types
 
@@ -1,11 +1,15 @@
 """
 В данном модуле написаны вспомогательные функции.
 """
+from __future__ import annotations
 
 import string
 import random
+import time
+import threading
 import re
-from .enums import Currency
+from collections import OrderedDict
+from .enums import Currency, MessageTypes
 
 MONTHS = {
     "января": 1,
@@ -75,6 +79,86 @@ def parse_wait_time(response: str) -> int:
         return 10
 
 
+class LRUDict(OrderedDict):
+    """
+    Словарь ограниченного размера с вытеснением давно не использовавшихся элементов (LRU).
+    Нужен для кэшей Runner'а и аккаунта, которые иначе бесконечно растут в долгоживущем процессе.
+
+    :param maxsize: максимальное кол-во элементов (`None` - без ограничения).
+    :type maxsize: :obj:`int` or :obj:`None`, опционально
+
+    :param ttl: время (в секундах), после которого не использовавшийся элемент удаляется (`None` - без ограничения).
+    :type ttl: :obj:`int` or :obj:`float` or :obj:`None`, опционально
+    """
+
+    def __init__(self, maxsize: int | None = None, ttl: int | float | None = None):
+        super().__init__()
+        self.maxsize: int | None = maxsize
+        """Максимальное кол-во элементов."""
+        self.ttl: int | float | None = ttl
+        """Время жизни не использовавшегося элемента (в секундах)."""
+        self.__times = {}
+        self.__lock = threading.RLock()
+
+    def __touch(self, key):
+        self.move_to_end(key)
+        if self.ttl is not None:
+            self.__times[key] = time.time()
+
+    def __expired(self, key) -> bool:
+        return self.ttl is not None and time.time() - self.__times.get(key, 0) > self.ttl
+
+    def purge(self):
+        """
+        Удаляет элементы, которые не использовались дольше :attr:`ttl` секунд, и лишние элементы сверх :attr:`maxsize`.
+        """
+        with self.__lock:
+            while self.maxsize is not None and len(self) > self.maxsize:
+                self.__times.pop(self.popitem(last=False)[0], None)
+            # элементы упорядочены по времени последнего использования, поэтому устаревшие всегда в начале
+            while self.ttl is not None and len(self) and self.__expired(next(iter(self))):
+                self.__times.pop(self.popitem(last=False)[0], None)
+
+    def __setitem__(self, key, value):
+        with self.__lock:
+            super().__setitem__(key, value)
+            self.__touch(key)
+            self.purge()
+
+    def __getitem__(self, key):
+        with self.__lock:
+            if super().__contains__(key) and self.__expired(key):
+                del self[key]
+            value = super().__getitem__(key)
+            self.__touch(key)
+            return value
+
+    def __delitem__(self, key):
+        with self.__lock:
+            super().__delitem__(key)
+            self.__times.pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        with self.__lock:
+            return super().__contains__(key) and not self.__expired(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        with self.__lock:
+            self.__times.pop(key, None)
+            return super().pop(key, *default)
+
+    def clear(self):
+        with self.__lock:
+            super().clear()
+            self.__times.clear()
+
+
 def parse_currency(s: str) -> Currency:
     return {"₽": Currency.RUB,
             "€": Currency.EUR,
@@ -95,6 +179,9 @@ class RegularExpressions(object):
         return getattr(cls, "instance")
 
     def __init__(self):
+        # __init__ вызывается при каждом RegularExpressions(), а компилировать выражения нужно только один раз
+        if hasattr(self, "SYSTEM_MESSAGE"):
+            return
         self.ORDER_PURCHASED = \
             re.compile(r"(Покупатель|The buyer) [a-zA-Z0-9]+ (оплатил заказ|has paid for order) #[A-Z0-9]{8}\.")
         """
@@ -226,3 +313,104 @@ class RegularExpressions(object):
         """
         Скомпилированное регулярное выражение, описывающее фразу о смене валюты.
         """
+
+        # Регулярные выражения выставлены в порядке от самых часто-используемых к самым редко-используемым
+        self.SYSTEM_MESSAGE_TYPES: dict[MessageTypes, re.Pattern] = {
+            MessageTypes.ORDER_PURCHASED: self.ORDER_PURCHASED,
+            MessageTypes.ORDER_CONFIRMED: self.ORDER_CONFIRMED,
+            MessageTypes.NEW_FEEDBACK: self.NEW_FEEDBACK,
+            MessageTypes.NEW_FEEDBACK_ANSWER: self.NEW_FEEDBACK_ANSWER,
+            MessageTypes.FEEDBACK_CHANGED: self.FEEDBACK_CHANGED,
+            MessageTypes.FEEDBACK_DELETED: self.FEEDBACK_DELETED,
+            MessageTypes.REFUND: self.REFUND,
+            MessageTypes.FEEDBACK_ANSWER_CHANGED: self.FEEDBACK_ANSWER_CHANGED,
+            MessageTypes.FEEDBACK_ANSWER_DELETED: self.FEEDBACK_ANSWER_DELETED,
+            MessageTypes.ORDER_CONFIRMED_BY_ADMIN: self.ORDER_CONFIRMED_BY_ADMIN,
+            MessageTypes.PARTIAL_REFUND: self.PARTIAL_REFUND,
+            MessageTypes.ORDER_REOPENED: self.ORDER_REOPENED,
+            MessageTypes.REFUND_BY_ADMIN: self.REFUND_BY_ADMIN,
+            MessageTypes.DISCORD: self.DISCORD,
+            MessageTypes.DEAR_VENDORS: self.DEAR_VENDORS
+        }
+        """
+        Регулярные выражения системных сообщений ({тип сообщения: регулярное выражение}).
+        """
+
+        self.SYSTEM_MESSAGE = re.compile("|".join(
+            f"(?P<{t.name}>{self.__with_named_groups(t.name, r.pattern)})"
+            for t, r in self.SYSTEM_MESSAGE_TYPES.items()
+        ))
+        """
+        Скомпилированное регулярное выражение, объединяющее все системные сообщения.
+        Для каждого типа сообщения есть именованная группа с названием типа (см. MessageTypes), а также группы
+        <тип>_user1, <тип>_user2 (никнеймы в порядке упоминания) и <тип>_order (ID заказа).
+        """
+
+    @staticmethod
+    def __with_named_groups(prefix: str, pattern: str) -> str:
+        """
+        Заменяет в регулярном выражении никнеймы и ID заказа на именованные группы с переданным префиксом.
+        """
+        users = iter(("user1", "user2"))
+        pattern = re.sub(r"\[a-zA-Z0-9\]\+", lambda _: f"(?P<{prefix}_{next(users)}>[a-zA-Z0-9]+)", pattern)
+        return pattern.replace("#[A-Z0-9]{8}", f"#(?P<{prefix}_order>[A-Z0-9]{{8}})")
+
+
+class SystemMessage:
+    """
+    Результат разбора системного сообщения FunPay.
+    """
+    __slots__ = ("type", "order_id", "initiator_username", "buyer_username")
+
+    def __init__(self, type_: MessageTypes, order_id: str | None = None, initiator_username: str | None = None,
+                 buyer_username: str | None = None):
+        self.type: MessageTypes = type_
+        """Тип сообщения."""
+        self.order_id: str | None = order_id
+        """ID заказа (без #)."""
+        self.initiator_username: str | None = initiator_username
+        """Никнейм пользователя, который выполнил действие."""
+        self.buyer_username: str | None = buyer_username
+        """Никнейм покупателя по заказу (если он упоминается в сообщении)."""
+
+
+_BUYER_IS_SECOND_USER = (MessageTypes.REFUND, MessageTypes.REFUND_BY_ADMIN)
+_BUYER_IS_INITIATOR = (MessageTypes.ORDER_PURCHASED, MessageTypes.ORDER_CONFIRMED, MessageTypes.NEW_FEEDBACK,
+                       MessageTypes.FEEDBACK_CHANGED, MessageTypes.FEEDBACK_DELETED)
+
+
+def parse_system_message(text: str | None) -> SystemMessage:
+    """
+    Определяет тип сообщения и извлекает из него ID заказа и никнеймы за один проход по тексту
+    (одно объединенное регулярное выражение :attr:`RegularExpressions.SYSTEM_MESSAGE`).
+
+    !Внимание! Как и сравнение с отдельными регулярными выражениями, не является правильным в 100% случаев:
+    пользователь может написать "поддельное" системное сообщение.
+
+    :param text: текст сообщения.
+    :type text: :obj:`str` or :obj:`None`
+
+    :return: результат разбора (для несистемных сообщений - тип MessageTypes.NON_SYSTEM и пустые поля).
+    :rtype: :class:`FunPayAPI.common.utils.SystemMessage`
+    """
+    # Все системные сообщения, кроме DISCORD и DEAR_VENDORS, содержат ID заказа
+    if not text or ("#" not in text and "Discord" not in text and "продавцы" not in text and "vendors" not in text):
+        return SystemMessage(MessageTypes.NON_SYSTEM)
+
+    res = RegularExpressions()
+    for match in res.SYSTEM_MESSAGE.finditer(text):
+        msg_type = MessageTypes[match.lastgroup]
+        if msg_type is MessageTypes.ORDER_PURCHASED and not res.ORDER_PURCHASED2.search(text):
+            continue
+        # groupdict() собирал бы все ~45 групп выражения, нужны только группы совпавшего типа
+        group_names = res.SYSTEM_MESSAGE.groupindex
+        group = lambda name: match.group(name) if name in group_names else None
+        initiator = group(f"{match.lastgroup}_user1")
+        if msg_type in _BUYER_IS_INITIATOR:
+            buyer = initiator
+        elif msg_type in _BUYER_IS_SECOND_USER:
+            buyer = group(f"{match.lastgroup}_user2")
+        else:
+            buyer = None
+        return SystemMessage(msg_type, group(f"{match.lastgroup}_order"), initiator, buyer)
+    return SystemMessage(MessageTypes.NON_SYSTEM)
@@ -5,15 +5,40 @@ from __future__ import annotations
 from typing import Literal, overload, Optional
 
 import FunPayAPI.common.enums
-from .common.utils import RegularExpressions
+from .common.utils import RegularExpressions, parse_system_message
 from .common.enums import MessageTypes, OrderStatuses, SubCategoryTypes, Currency
 import datetime
 
+KEEP_HTML: bool = True
+"""
+Сохранять ли исходный HTML-код в объектах :class:`ChatShortcut`, :class:`Message`, :class:`OrderShortcut` и
+:class:`LotShortcut`. При большом кол-ве кэшированных чатов и сообщений HTML занимает большую часть памяти;
+если он не нужен, установите `False` до создания аккаунта - тогда атрибут `html` этих объектов будет `None`.
+"""
+
+
+class HTMLStorage:
+    """
+    Примесь для классов, хранящих исходный HTML-код только при включенной настройке :data:`KEEP_HTML`.
+    Классы-наследники должны объявить слот `_html`.
+    """
+    __slots__ = ()
+
+    @property
+    def html(self) -> str | None:
+        """HTML-код объекта (`None`, если сохранение HTML отключено)."""
+        return self._html
+
+    @html.setter
+    def html(self, value: str | None):
+        self._html = value if KEEP_HTML else None
+
 
 class BaseOrderInfo:
     """
     Класс, представляющий информацию о заказе.
     """
+    __slots__ = ("_order", "_order_attempt_made", "_order_attempt_error")
 
     def __init__(self):
         self._order: Order | None = None
@@ -24,7 +49,7 @@ class BaseOrderInfo:
         """Возникла ли ошибка при получении заказа?"""
 
 
-class ChatShortcut(BaseOrderInfo):
+class ChatShortcut(HTMLStorage, BaseOrderInfo):
     """
     Данный класс представляет виджет чата со страницы https://funpay.com/chat/
 
@@ -46,6 +71,8 @@ class ChatShortcut(BaseOrderInfo):
     :param determine_msg_type: определять ли тип последнего сообщения?
     :type determine_msg_type: :obj:`bool`, опционально
     """
+    __slots__ = ("id", "name", "last_message_text", "last_by_bot", "last_by_vertex", "unread", "node_msg_id",
+                 "user_msg_id", "last_message_type", "_html")
 
     def __init__(self, id_: int, name: str, last_message_text: str, node_msg_id: int, user_msg_id: int,
                  unread: bool, html: str, determine_msg_type: bool = True):
@@ -67,7 +94,7 @@ class ChatShortcut(BaseOrderInfo):
         """ID последнего прочитанного сообщения."""
         self.last_message_type: MessageTypes | None = None if not determine_msg_type else self.get_last_message_type()
         """Тип последнего сообщения."""
-        self.html: str = html
+        self.html: str | None = html
         """HTML код виджета чата."""
         BaseOrderInfo.__init__(self)
 
@@ -83,40 +110,7 @@ class ChatShortcut(BaseOrderInfo):
         :return: тип последнего сообщения.
         :rtype: :class:`FunPayAPI.common.enums.MessageTypes`
         """
-        res = RegularExpressions()
-        if res.DISCORD.search(self.last_message_text):
-            return MessageTypes.DISCORD
-
-        if res.DEAR_VENDORS.search(self.last_message_text):
-            return MessageTypes.DEAR_VENDORS
-
-        if res.ORDER_PURCHASED.findall(self.last_message_text) and res.ORDER_PURCHASED2.findall(self.last_message_text):
-            return MessageTypes.ORDER_PURCHASED
-
-        if res.ORDER_ID.search(self.last_message_text) is None:
-            return MessageTypes.NON_SYSTEM
-
-        # Регулярные выражения выставлены в порядке от самых часто-используемых к самым редко-используемым
-        sys_msg_types = {
-            MessageTypes.ORDER_CONFIRMED: res.ORDER_CONFIRMED,
-            MessageTypes.NEW_FEEDBACK: res.NEW_FEEDBACK,
-            MessageTypes.NEW_FEEDBACK_ANSWER: res.NEW_FEEDBACK_ANSWER,
-            MessageTypes.FEEDBACK_CHANGED: res.FEEDBACK_CHANGED,
-            MessageTypes.FEEDBACK_DELETED: res.FEEDBACK_DELETED,
-            MessageTypes.REFUND: res.REFUND,
-            MessageTypes.FEEDBACK_ANSWER_CHANGED: res.FEEDBACK_ANSWER_CHANGED,
-            MessageTypes.FEEDBACK_ANSWER_DELETED: res.FEEDBACK_ANSWER_DELETED,
-            MessageTypes.ORDER_CONFIRMED_BY_ADMIN: res.ORDER_CONFIRMED_BY_ADMIN,
-            MessageTypes.PARTIAL_REFUND: res.PARTIAL_REFUND,
-            MessageTypes.ORDER_REOPENED: res.ORDER_REOPENED,
-            MessageTypes.REFUND_BY_ADMIN: res.REFUND_BY_ADMIN
-        }
-
-        for i in sys_msg_types:
-            if sys_msg_types[i].search(self.last_message_text):
-                return i
-        else:
-            return MessageTypes.NON_SYSTEM
+        return parse_system_message(self.last_message_text).type
 
     def __str__(self):
         return self.last_message_text
@@ -181,7 +175,7 @@ class Chat:
         """Последние 100 сообщений чата."""
 
 
-class Message(BaseOrderInfo):
+class Message(HTMLStorage, BaseOrderInfo):
     """
     Данный класс представляет отдельное сообщение.
 
@@ -212,12 +206,17 @@ class Message(BaseOrderInfo):
     :param determine_msg_type: определять ли тип сообщения.
     :type determine_msg_type: :obj:`bool`, опционально
     """
+    __slots__ = ("id", "text", "chat_id", "chat_name", "interlocutor_id", "buyer_viewing", "type", "author",
+                 "author_id", "image_link", "image_name", "by_bot", "by_vertex", "badge", "is_employee",
+                 "is_support", "is_moderation", "is_arbitration", "is_autoreply", "initiator_username",
+                 "initiator_id", "i_am_seller", "i_am_buyer", "order_id", "_html")
 
     def __init__(self, id_: int, text: str | None, chat_id: int | str, chat_name: str | None,
                  interlocutor_id: int | None,
                  author: str | None, author_id: int, html: str,
                  image_link: str | None = None, image_name: str | None = None,
                  determine_msg_type: bool = True, badge_text: Optional[str] = None):
+        system_message = parse_system_message(text) if determine_msg_type else None
         self.id: int = id_
         """ID сообщения."""
         self.text: str | None = text
@@ -230,13 +229,13 @@ class Message(BaseOrderInfo):
         """ID собеседника"""
         self.buyer_viewing: BuyerViewing | None = None
         """Лот, который смотрит собеседник (если включена настройка)"""
-        self.type: MessageTypes | None = None if not determine_msg_type else self.get_message_type()
+        self.type: MessageTypes | None = system_message.type if system_message else None
         """Тип сообщения."""
         self.author: str | None = author
         """Автор сообщения."""
         self.author_id: int = author_id
         """ID автора сообщения."""
-        self.html: str = html
+        self.html: str | None = html
         """HTML-код сообщения."""
         self.image_link: str | None = image_link
         """Ссылка на изображение в сообщении (если оно есть)."""
@@ -258,7 +257,7 @@ class Message(BaseOrderInfo):
         """Наличие бэйджика арбитража."""
         self.is_autoreply: bool = False
         """Наличие бэйджика автоответа."""
-        self.initiator_username: str | None = None
+        self.initiator_username: str | None = system_message.initiator_username if system_message else None
         """Ник пользователя, который выполнил действие (для системных сообщений)."""
         self.initiator_id: int | None = None
         """ID пользователя, который выполнил действие (для системных сообщений)."""
@@ -266,6 +265,8 @@ class Message(BaseOrderInfo):
         """Являемся ли мы продавцом по заказу (для системных сообщений)."""
         self.i_am_buyer: bool | None = None
         """Являемся ли мы покупателем по заказу (для системных сообщений)."""
+        self.order_id: str | None = system_message.order_id if system_message else None
+        """ID заказа (для системных сообщений)."""
 
         BaseOrderInfo.__init__(self)
 
@@ -281,48 +282,13 @@ class Message(BaseOrderInfo):
         :return: тип последнего сообщения в чате.
         :rtype: :class:`FunPayAPI.common.enums.MessageTypes`
         """
-        if not self.text:
-            return MessageTypes.NON_SYSTEM
-
-        res = RegularExpressions()
-        if res.DISCORD.search(self.text):
-            return MessageTypes.DISCORD
-        if res.DEAR_VENDORS.search(self.text):
-            return MessageTypes.DEAR_VENDORS
-
-        if res.ORDER_PURCHASED.findall(self.text) and res.ORDER_PURCHASED2.findall(self.text):
-            return MessageTypes.ORDER_PURCHASED
-
-        if res.ORDER_ID.search(self.text) is None:
-            return MessageTypes.NON_SYSTEM
-
-        # Регулярные выражения выставлены в порядке от самых часто-используемых к самым редко-используемым
-        sys_msg_types = {
-            MessageTypes.ORDER_CONFIRMED: res.ORDER_CONFIRMED,
-            MessageTypes.NEW_FEEDBACK: res.NEW_FEEDBACK,
-            MessageTypes.NEW_FEEDBACK_ANSWER: res.NEW_FEEDBACK_ANSWER,
-            MessageTypes.FEEDBACK_CHANGED: res.FEEDBACK_CHANGED,
-            MessageTypes.FEEDBACK_DELETED: res.FEEDBACK_DELETED,
-            MessageTypes.REFUND: res.REFUND,
-            MessageTypes.FEEDBACK_ANSWER_CHANGED: res.FEEDBACK_ANSWER_CHANGED,
-            MessageTypes.FEEDBACK_ANSWER_DELETED: res.FEEDBACK_ANSWER_DELETED,
-            MessageTypes.ORDER_CONFIRMED_BY_ADMIN: res.ORDER_CONFIRMED_BY_ADMIN,
-            MessageTypes.PARTIAL_REFUND: res.PARTIAL_REFUND,
-            MessageTypes.ORDER_REOPENED: res.ORDER_REOPENED,
-            MessageTypes.REFUND_BY_ADMIN: res.REFUND_BY_ADMIN
-        }
-
-        for i in sys_msg_types:
-            if sys_msg_types[i].search(self.text):
-                return i
-        else:
-            return MessageTypes.NON_SYSTEM
+        return parse_system_message(self.text).type
 
     def __str__(self):
         return self.text if self.text is not None else self.image_link if self.image_link is not None else ""
 
 
-class OrderShortcut(BaseOrderInfo):
+class OrderShortcut(HTMLStorage, BaseOrderInfo):
     """
     Данный класс представляет виджет заказа со страницы https://funpay.com/orders/trade
 
@@ -365,6 +331,8 @@ class OrderShortcut(BaseOrderInfo):
     :param dont_search_amount: не искать кол-во товара.
     :type dont_search_amount: :obj:`bool`, опционально
     """
+    __slots__ = ("id", "description", "price", "currency", "amount", "buyer_username", "buyer_id", "chat_id",
+                 "status", "date", "subcategory_name", "subcategory", "_html")
 
     def __init__(self, id_: str, description: str, price: float, currency: Currency,
                  buyer_username: str, buyer_id: int, chat_id: int | str, status: OrderStatuses,
@@ -394,7 +362,7 @@ class OrderShortcut(BaseOrderInfo):
         """Название подкатегории, к которой относится заказ."""
         self.subcategory: SubCategory | None = subcategory
         """Подкатегория, к которой относится заказ."""
-        self.html: str = html
+        self.html: str | None = html
         """HTML код виджета заказа."""
         BaseOrderInfo.__init__(self)
 
@@ -857,7 +825,7 @@ class SellerShortcut:
         return f"https://funpay.com/users/{self.id}/"
 
 
-class LotShortcut:
+class LotShortcut(HTMLStorage):
     """
     Данный класс представляет виджет лота.
 
@@ -882,6 +850,8 @@ class LotShortcut:
     :param html: HTML код виджета лота.
     :type html: :obj:`str`
     """
+    __slots__ = ("id", "server", "description", "title", "amount", "price", "currency", "seller", "auto", "promo",
+                 "attributes", "subcategory", "public_link", "_html")
 
     def __init__(self, id_: int | str, server: str | None,
                  description: str | None, amount: int | None, price: float, currency: Currency,
@@ -914,7 +884,7 @@ class LotShortcut:
         """Атрибуты лота (только для лотов из таблицы)"""
         self.subcategory: SubCategory = subcategory
         """Подкатегория лота."""
-        self.html: str = html
+        self.html: str | None = html
         """HTML-код виджета лота."""
         self.public_link: str = f"https://funpay.com/chips/offer?id={self.id}" \
             if self.subcategory.type is SubCategoryTypes.CURRENCY else f"https://funpay.com/lots/offer?id={self.id}"
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import re
-from typing import TYPE_CHECKING, Generator
+from typing import TYPE_CHECKING, Callable, Generator
 
 if TYPE_CHECKING:
     from ..account import Account
 
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 
 from ..common import exceptions
@@ -39,11 +41,16 @@ class Runner:
         Из событий, связанных с заказами, будет возвращаться только
         :class:`FunPayAPI.updater.events.OrdersListChangedEvent`.
     :type disabled_order_requests: :obj:`bool`, опционально
+
+    :param max_cached_chats: максимальное кол-во чатов, информация о которых хранится в кэшах Runner'а
+        (давно не менявшиеся чаты вытесняются). `None` - без ограничения.
+    :type max_cached_chats: :obj:`int` or :obj:`None`, опционально
     """
 
     def __init__(self, account: Account, disable_message_requests: bool = False,
                  disabled_order_requests: bool = False,
-                 disabled_buyer_viewing_requests: bool = True):
+                 disabled_buyer_viewing_requests: bool = True,
+                 max_cached_chats: int | None = 5000):
         # todo добавить события и исключение событий о новых покупках (не продажах!)
         if not account.is_initiated:
             raise exceptions.AccountNotInitiatedError()
@@ -64,21 +71,24 @@ class Runner:
         self.saved_orders: dict[str, types.OrderShortcut] = {}
         """Сохраненные состояния заказов ({ID заказа: экземпляр types.OrderShortcut})."""
 
-        self.runner_last_messages: dict[int, list[int, int, str | None]] = {}
+        self.runner_last_messages: dict[int, list[int, int, str | None]] = utils.LRUDict(max_cached_chats)
         """ID последний сообщений {ID чата: [ID последего сообщения чата, ID последнего прочитанного сообщения чата, 
         текст последнего сообщения или None, если это изображение]}."""
 
-        self.by_bot_ids: dict[int, list[int]] = {}
+        self.by_bot_ids: dict[int, list[int]] = utils.LRUDict(max_cached_chats)
         """ID сообщений, отправленных с помощью self.account.send_message ({ID чата: [ID сообщения, ...]})."""
 
-        self.last_messages_ids: dict[int, int] = {}
+        self.last_messages_ids: dict[int, int] = utils.LRUDict(max_cached_chats)
         """ID последних сообщений в чатах ({ID чата: ID последнего сообщения})."""
 
-        self.buyers_viewing: dict[int, types.BuyerViewing] = {}
-        """Что смотрит покупатель? ({ID покупателя: что смотрит}"""
+        self.buyers_viewing: dict[int, types.BuyerViewing] = utils.LRUDict(max_cached_chats)
+        """Что смотрит покупатель? ({ID покупателя: что смотрит}. Очищается после каждого цикла :meth:`listen`,
+        поэтому сообщениям достается только свежее значение."""
 
         self.runner_len: int = 10
         """Количество событий, на которое успешно отвечает funpay.com/runner/"""
+        self.max_workers: int = 4
+        """Максимальное кол-во одновременных запросов к funpay.com/runner/ при получении историй чатов."""
         self.__interlocutor_ids: set = set()
         """Айди собеседников, у которых будет получено поле "Покупатель смотрит\""""
 
@@ -211,7 +221,7 @@ class Runner:
 
             chat_with = chat.find("div", {"class": "media-user-name"}).text
             chat_obj = types.ChatShortcut(chat_id, chat_with, last_msg_text, node_msg_id,
-                                          user_msg_id, unread, str(chat))
+                                          user_msg_id, unread, str(chat) if types.KEEP_HTML else None)
             if last_msg_text_or_none is not None:
                 chat_obj.last_by_bot = by_bot
                 chat_obj.last_by_vertex = by_vertex
@@ -249,63 +259,131 @@ class Runner:
             self.__interlocutor_ids = self.__interlocutor_ids | set([self.account.interlocutor_ids.get(i.chat.id)
                                                                      for i in lcmc_events_with_new_mess if
                                                                      i.chat.id in self.account.interlocutor_ids])
+            bv_ids = [i for i in self.__interlocutor_ids if i not in self.buyers_viewing]
+            # без изменившихся чатов отдельные запросы делаем только для почти полных пачек "Покупатель смотрит"
+            if not lcmc_events_with_new_mess and len(bv_ids) < self.runner_len - 2:
+                bv_ids = []
+            self.__interlocutor_ids = self.__interlocutor_ids - set(bv_ids)
+        else:
+            bv_ids = []
+
+        chats_names = {i.chat.id: i.chat.name for i in lcmc_events_with_new_mess}
+        batches = self.plan_batches(list(chats_names), bv_ids)
+        histories = self.request_chats_histories([({cid: chats_names[cid] for cid in chat_ids}, bv_pack)
+                                                  for chat_ids, bv_pack in batches])
+        new_msg_events = {}
+        for chats in histories:
+            new_msg_events.update(self.parse_chats_histories(chats))
 
-        while lcmc_events_with_new_mess or len(self.__interlocutor_ids) >= self.runner_len - 2:
-            chats_pack = lcmc_events_with_new_mess[:self.runner_len]
-            del lcmc_events_with_new_mess[:self.runner_len]
-            bv_pack = []
-            while self.make_buyer_viewing_requests and \
-                    len(chats_pack) + len(bv_pack) < self.runner_len and self.__interlocutor_ids:
-                interlocutor_id = self.__interlocutor_ids.pop()
-                if interlocutor_id not in self.buyers_viewing:
-                    bv_pack.append(interlocutor_id)
-
-            chats_data = {i.chat.id: i.chat.name for i in chats_pack}
-            new_msg_events = self.generate_new_message_events(chats_data, bv_pack)
-
-            if self.make_buyer_viewing_requests:
-                # Если раньше айди не знали, то добавляем
-                for chat_id, msgs in new_msg_events.items():
-                    if chat_id not in self.account.interlocutor_ids and msgs and msgs[0].message.interlocutor_id:
-                        self.account.interlocutor_ids[chat_id] = msgs[0].message.interlocutor_id
-                        self.__interlocutor_ids.add(msgs[0].message.interlocutor_id)
-
-            # [LastChatMessageChanged, NewMSG, NewMSG ..., LastChatMessageChanged, NewMSG, NewMSG ...]
-            for i in chats_pack:
-                events.append(i)
-                if new_msg_events.get(i.chat.id):
-                    events.extend(new_msg_events[i.chat.id])
+        if self.make_buyer_viewing_requests:
+            # Если раньше айди не знали, то добавляем
+            for chat_id, msgs in new_msg_events.items():
+                if chat_id not in self.account.interlocutor_ids and msgs and msgs[0].message.interlocutor_id:
+                    self.account.interlocutor_ids[chat_id] = msgs[0].message.interlocutor_id
+                    self.__interlocutor_ids.add(msgs[0].message.interlocutor_id)
+
+        # [LastChatMessageChanged, NewMSG, NewMSG ..., LastChatMessageChanged, NewMSG, NewMSG ...]
+        for i in lcmc_events_with_new_mess:
+            events.append(i)
+            if new_msg_events.get(i.chat.id):
+                events.extend(new_msg_events[i.chat.id])
         return events
 
-    def generate_new_message_events(self, chats_data: dict[int, str],
-                                    interlocutor_ids: list[int] | None = None) -> dict[int, list[NewMessageEvent]]:
+    def plan_batches(self, chat_ids: list[int], interlocutor_ids: list[int] | None = None) \
+            -> list[tuple[list[int], list[int]]]:
         """
-        Получает историю переданных чатов и генерирует события новых сообщений.
+        Распределяет чаты и ID собеседников по минимальному кол-ву запросов к funpay.com/runner/.
+        Каждый запрос вмещает не больше :attr:`runner_len` объектов, поэтому для N чатов и M собеседников
+        получается ceil((N + M) / runner_len) пачек. Чаты идут первыми, "Покупатель смотрит" - в оставшиеся места.
+
+        :param chat_ids: ID чатов, историю которых нужно получить.
+        :type chat_ids: :obj:`list` of :obj:`int`
+
+        :param interlocutor_ids: ID собеседников, у которых нужно получить поле "Покупатель смотрит".
+        :type interlocutor_ids: :obj:`list` of :obj:`int` or :obj:`None`, опционально
+
+        :return: список пачек в формате [([ID чатов], [ID собеседников]), ...].
+        :rtype: :obj:`list` of :obj:`tuple` (:obj:`list` of :obj:`int`, :obj:`list` of :obj:`int`)
+        """
+        objects = [(True, i) for i in chat_ids] + [(False, i) for i in interlocutor_ids or []]
+        batches = []
+        for start in range(0, len(objects), self.runner_len):
+            pack = objects[start:start + self.runner_len]
+            batches.append(([i for is_chat, i in pack if is_chat], [i for is_chat, i in pack if not is_chat]))
+        return batches
+
+    def request_chats_histories(self, batches: list[tuple[dict[int, str | None], list[int]]]) \
+            -> list[dict[int, list[types.Message]]]:
+        """
+        Получает истории чатов сразу для нескольких пачек, отправляя запросы параллельно
+        (не больше :attr:`max_workers` одновременно) через общую сессию аккаунта.
 
+        :param batches: пачки в формате [({ID чата: никнейм собеседника}, [ID собеседников]), ...].
+        :type batches: :obj:`list` of :obj:`tuple` (:obj:`dict`, :obj:`list` of :obj:`int`)
+
+        :return: истории чатов для каждой пачки (в том же порядке). Для неудачных пачек - пустой словарь.
+        :rtype: :obj:`list` of :obj:`dict` {:obj:`int`: :obj:`list` of :class:`FunPayAPI.types.Message`}
+        """
+        if len(batches) <= 1 or self.max_workers <= 1:
+            return [self.get_chats_histories(*batch) for batch in batches]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            return list(executor.map(lambda batch: self.get_chats_histories(*batch), batches))
+
+    def get_chats_histories(self, chats_data: dict[int, str | None],
+                            interlocutor_ids: list[int] | None = None) -> dict[int, list[types.Message]]:
+        """
+        Получает историю переданных чатов (делает до 3 попыток).
 
         :param chats_data: ID чатов и никнеймы собеседников (None, если никнейм неизвестен)
             Например: {48392847: "SLLMK", 58392098: "Amongus", 38948728: None}
         :type chats_data: :obj:`dict` {:obj:`int`: :obj:`str` or :obj:`None`}
 
-        :return: словарь с событиями новых сообщений в формате {ID чата: [список событий]}
-        :rtype: :obj:`dict` {:obj:`int`: :obj:`list` of :class:`FunPayAPI.updater.events.NewMessageEvent`}
+        :param interlocutor_ids: ID собеседников, у которых нужно получить поле "Покупатель смотрит".
+        :type interlocutor_ids: :obj:`list` of :obj:`int` or :obj:`None`, опционально
+
+        :return: словарь с историями чатов в формате {ID чата: [список сообщений]} или пустой словарь,
+            если получить истории не удалось.
+        :rtype: :obj:`dict` {:obj:`int`: :obj:`list` of :class:`FunPayAPI.types.Message`}
         """
         attempts = 3
         while attempts:
             attempts -= 1
             try:
-                chats = self.account.get_chats_histories(chats_data, interlocutor_ids)
-                break
+                return self.account.get_chats_histories(chats_data, interlocutor_ids)
             except exceptions.RequestFailedError as e:
                 logger.error(e)
             except:
                 logger.error(f"Не удалось получить истории чатов {list(chats_data.keys())}.")
                 logger.debug("TRACEBACK", exc_info=True)
             time.sleep(1)
-        else:
-            logger.error(f"Не удалось получить истории чатов {list(chats_data.keys())}: превышено кол-во попыток.")
-            return {}
+        logger.error(f"Не удалось получить истории чатов {list(chats_data.keys())}: превышено кол-во попыток.")
+        return {}
+
+    def generate_new_message_events(self, chats_data: dict[int, str],
+                                    interlocutor_ids: list[int] | None = None) -> dict[int, list[NewMessageEvent]]:
+        """
+        Получает историю переданных чатов и генерирует события новых сообщений.
+
+
+        :param chats_data: ID чатов и никнеймы собеседников (None, если никнейм неизвестен)
+            Например: {48392847: "SLLMK", 58392098: "Amongus", 38948728: None}
+        :type chats_data: :obj:`dict` {:obj:`int`: :obj:`str` or :obj:`None`}
+
+        :return: словарь с событиями новых сообщений в формате {ID чата: [список событий]}
+        :rtype: :obj:`dict` {:obj:`int`: :obj:`list` of :class:`FunPayAPI.updater.events.NewMessageEvent`}
+        """
+        return self.parse_chats_histories(self.get_chats_histories(chats_data, interlocutor_ids))
+
+    def parse_chats_histories(self, chats: dict[int, list[types.Message]]) -> dict[int, list[NewMessageEvent]]:
+        """
+        Генерирует события новых сообщений из полученных историй чатов.
+
+        :param chats: результат выполнения :meth:`FunPayAPI.updater.runner.Runner.get_chats_histories`.
+        :type chats: :obj:`dict` {:obj:`int`: :obj:`list` of :class:`FunPayAPI.types.Message`}
 
+        :return: словарь с событиями новых сообщений в формате {ID чата: [список событий]}
+        :rtype: :obj:`dict` {:obj:`int`: :obj:`list` of :class:`FunPayAPI.updater.events.NewMessageEvent`}
+        """
         result = {}
 
         for cid in chats:
@@ -426,20 +504,42 @@ class Runner:
         else:
             self.by_bot_ids[chat_id].append(message_id)
 
-    def listen(self, requests_delay: int | float = 6.0,
-               ignore_exceptions: bool = True) -> Generator[InitialChatEvent | ChatsListChangedEvent |
+    def get_cache_sizes(self) -> dict[str, int]:
+        """
+        Возвращает текущие размеры кэшей Runner'а и привязанного аккаунта (для контроля потребления памяти).
+
+        :return: словарь {название кэша: кол-во элементов}.
+        :rtype: :obj:`dict` {:obj:`str`: :obj:`int`}
+        """
+        return {
+            "runner_last_messages": len(self.runner_last_messages),
+            "by_bot_ids": len(self.by_bot_ids),
+            "last_messages_ids": len(self.last_messages_ids),
+            "buyers_viewing": len(self.buyers_viewing),
+            "saved_orders": len(self.saved_orders),
+            **self.account.get_cache_sizes()
+        }
+
+    def listen(self, requests_delay: int | float | Callable[[], int | float] = 6.0,
+               ignore_exceptions: bool = True,
+               stop_event: threading.Event | None = None) -> Generator[InitialChatEvent | ChatsListChangedEvent |
                                                             LastChatMessageChangedEvent | NewMessageEvent |
                                                             InitialOrderEvent | OrdersListChangedEvent | NewOrderEvent |
                                                             OrderStatusChangedEvent]:
         """
         Бесконечно отправляет запросы для получения новых событий.
 
-        :param requests_delay: задержка между запросами (в секундах).
-        :type requests_delay: :obj:`int` or :obj:`float`, опционально
+        :param requests_delay: задержка между запросами (в секундах) или функция, возвращающая её
+            (вызывается перед каждой паузой, позволяет менять задержку без перезапуска).
+        :type requests_delay: :obj:`int` or :obj:`float` or :obj:`Callable`, опционально
 
         :param ignore_exceptions: игнорировать ошибки?
         :type ignore_exceptions: :obj:`bool`, опционально
 
+        :param stop_event: событие остановки: после его установки генератор завершается
+            (ожидание между запросами прерывается сразу).
+        :type stop_event: :obj:`threading.Event`, опционально
+
         :return: генератор событий FunPay.
         :rtype: :obj:`Generator` of :class:`FunPayAPI.updater.events.InitialChatEvent`,
             :class:`FunPayAPI.updater.events.ChatsListChangedEvent`,
@@ -450,7 +550,7 @@ class Runner:
             :class:`FunPayAPI.updater.events.OrderStatusChangedEvent`
         """
         events = []
-        while True:
+        while stop_event is None or not stop_event.is_set():
             try:
                 self.__interlocutor_ids = set([event.message.interlocutor_id for event in events
                                                if event.type == EventTypes.NEW_MESSAGE])
@@ -468,7 +568,7 @@ class Runner:
 
                     yield event
                 events = next_events
-                self.buyers_viewing = {}
+                self.buyers_viewing.clear()
             except Exception as e:
                 if not ignore_exceptions:
                     raise e
@@ -476,4 +576,8 @@ class Runner:
                     logger.error("Произошла ошибка при получении событий. "
                                  "(ничего страшного, если это сообщение появляется нечасто).")
                     logger.debug("TRACEBACK", exc_info=True)
-            time.sleep(requests_delay)
+            delay = requests_delay() if callable(requests_delay) else requests_delay
+            if stop_event is None:
+                time.sleep(delay)
+            else:
+                stop_event.wait(delay)
@@ -0,0 +1,94 @@
+# Bulk account import of a generated archive: wall time, peak memory and the
+# database insert with executemany against one add_account() call per row.
+# Run from the repository root: python -m benchmarks.bulk_import --rows 10000
+import argparse
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from botHandler.bulk_import import import_accounts
+from databaseHandler.databaseSetup import SQLiteDB
+
+
+def make_archive(rows):
+    """Zip of rows maFiles named by SteamID plus a manifest.csv referencing them, in memory."""
+    buffer = io.BytesIO()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(("account_name", "login", "password", "duration", "mafile"))
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(rows):
+            login = f"bench{i:06d}"
+            steamid = 76561198000000000 + i
+            mafile = {
+                "account_name": login,
+                "shared_secret": base64.b64encode(os.urandom(20)).decode(),
+                "identity_secret": base64.b64encode(os.urandom(20)).decode(),
+                "device_id": f"android:{i:08d}",
+                "Session": {"SteamID": steamid},
+            }
+            archive.writestr(f"maFiles/{steamid}.maFile", json.dumps(mafile))
+            writer.writerow((f"Аренда {login}", login, f"password{i:06d}", 1, f"{steamid}.maFile"))
+        archive.writestr("manifest.csv", manifest.getvalue())
+    return buffer.getvalue()
+
+
+def benchmark(rows, single_rows=1000):
+    """
+    Returns:
+        dict: import (s), peak (bytes of Python memory during the import), added,
+        executemany (s) for inserting rows rows and add_account (s) for the first
+        single_rows of them, one commit per row is too slow to wait for all of them
+    """
+    archive = make_archive(rows)
+    with tempfile.TemporaryDirectory() as workdir:
+        save_dir = os.path.join(workdir, "maFiles")
+        os.makedirs(save_dir)
+        db = SQLiteDB(os.path.join(workdir, "import.db"))
+        tracemalloc.start()
+        started = time.perf_counter()
+        summary = import_accounts(io.BytesIO(archive), db, save_dir)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.close()
+
+        values = [(f"Лот {i}", f"maFiles/{i}.maFile", f"login{i}", "password", 1) for i in range(rows)]
+        db = SQLiteDB(os.path.join(workdir, "bulk.db"))
+        started = time.perf_counter()
+        db.add_accounts_bulk(values)
+        bulk = time.perf_counter() - started
+        db.close()
+        db = SQLiteDB(os.path.join(workdir, "single.db"))
+        started = time.perf_counter()
+        for value in values[:single_rows]:
+            db.add_account(*value)
+        single = time.perf_counter() - started
+        db.close()
+    return {
+        "import": elapsed,
+        "peak": peak,
+        "added": summary.added,
+        "executemany": bulk,
+        "add_account": single,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk account import benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--single-rows", type=int, default=1000, help="rows inserted one add_account() at a time")
+    args = parser.parse_args()
+    single_rows = min(args.single_rows, args.rows)
+    result = benchmark(args.rows, single_rows)
+    print(f"import of {args.rows} rows: {result['added']} added in {result['import']:.2f}s, "
+          f"peak {result['peak'] / 2 ** 20:.1f} MiB")
+    print(f"insert: executemany {result['executemany']:.2f}s for {args.rows} rows, "
+          f"add_account per row {result['add_account']:.2f}s for {single_rows} rows "
+          f"(~{result['add_account'] * args.rows / single_rows:.0f}s for {args.rows})")
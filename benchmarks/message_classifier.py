@@ -0,0 +1,102 @@
+# System message classification: the combined regex of utils.parse_system_message
+# against the former one-pattern-at-a-time matching of Message.get_message_type.
+# Run from the repository root: python -m benchmarks.message_classifier
+import argparse
+import time
+
+from FunPayAPI.common.enums import MessageTypes
+from FunPayAPI.common.utils import RegularExpressions, parse_system_message
+
+# System messages as FunPay sends them, and what buyers usually write in a rental chat
+CORPUS = [
+    "Покупатель buyer01 оплатил заказ #ABCD1234. Аренда аккаунта Steam, 2 часа.\n"
+    "buyer01, не забудьте потом нажать кнопку «Подтвердить выполнение заказа».",
+    "The buyer buyer02 has paid for order #EFGH5678. Steam account rent, 1 hour.\n"
+    "buyer02, do not forget to press the «Confirm order fulfilment» button once you finish.",
+    "Покупатель buyer01 подтвердил успешное выполнение заказа #ABCD1234 и отправил деньги продавцу seller.",
+    "Покупатель buyer03 написал отзыв к заказу #QWER0001.",
+    "Покупатель buyer03 изменил отзыв к заказу #QWER0001.",
+    "Покупатель buyer04 удалил отзыв к заказу #QWER0002.",
+    "Продавец seller ответил на отзыв к заказу #QWER0001.",
+    "Продавец seller изменил ответ на отзыв к заказу #QWER0001.",
+    "Продавец seller удалил ответ на отзыв к заказу #QWER0002.",
+    "Продавец seller вернул деньги покупателю buyer05 по заказу #ZXCV9999.",
+    "Администратор admin вернул деньги покупателю buyer06 по заказу #ZXCV8888.",
+    "Администратор admin подтвердил успешное выполнение заказа #ZXCV7777 и отправил деньги продавцу seller.",
+    "Часть средств по заказу #ZXCV6666 возвращена покупателю.",
+    "Заказ #ZXCV5555 открыт повторно.",
+    "Вы можете перейти в Discord. Внимание: общение за пределами сервера FunPay считается нарушением правил.",
+    "Уважаемые продавцы, не доверяйте сообщениям в чате! Перед выполнением заказа всегда проверяйте "
+    "наличие оплаты в разделе «Мои продажи».",
+    "Здравствуйте! Когда выдадите аккаунт?",
+    "!код",
+    "Не могу зайти, пишет неверный пароль",
+    "Спасибо, всё работает",
+    "Можно продлить аренду ещё на 2 часа?",
+    "Заказ #ABCD1234, подскажите, где код Steam Guard?",
+]
+
+
+def sequential_message_type(text):
+    """Message.get_message_type() before the combined regex: one pattern after another."""
+    if not text:
+        return MessageTypes.NON_SYSTEM
+    res = RegularExpressions()
+    if res.DISCORD.search(text):
+        return MessageTypes.DISCORD
+    if res.DEAR_VENDORS.search(text):
+        return MessageTypes.DEAR_VENDORS
+    if res.ORDER_PURCHASED.findall(text) and res.ORDER_PURCHASED2.findall(text):
+        return MessageTypes.ORDER_PURCHASED
+    if res.ORDER_ID.search(text) is None:
+        return MessageTypes.NON_SYSTEM
+    sys_msg_types = {
+        MessageTypes.ORDER_CONFIRMED: res.ORDER_CONFIRMED,
+        MessageTypes.NEW_FEEDBACK: res.NEW_FEEDBACK,
+        MessageTypes.NEW_FEEDBACK_ANSWER: res.NEW_FEEDBACK_ANSWER,
+        MessageTypes.FEEDBACK_CHANGED: res.FEEDBACK_CHANGED,
+        MessageTypes.FEEDBACK_DELETED: res.FEEDBACK_DELETED,
+        MessageTypes.REFUND: res.REFUND,
+        MessageTypes.FEEDBACK_ANSWER_CHANGED: res.FEEDBACK_ANSWER_CHANGED,
+        MessageTypes.FEEDBACK_ANSWER_DELETED: res.FEEDBACK_ANSWER_DELETED,
+        MessageTypes.ORDER_CONFIRMED_BY_ADMIN: res.ORDER_CONFIRMED_BY_ADMIN,
+        MessageTypes.PARTIAL_REFUND: res.PARTIAL_REFUND,
+        MessageTypes.ORDER_REOPENED: res.ORDER_REOPENED,
+        MessageTypes.REFUND_BY_ADMIN: res.REFUND_BY_ADMIN
+    }
+    for msg_type, regex in sys_msg_types.items():
+        if regex.search(text):
+            return msg_type
+    return MessageTypes.NON_SYSTEM
+
+
+def _per_message(classify, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in CORPUS:
+            classify(text)
+    return (time.perf_counter() - started) / (rounds * len(CORPUS))
+
+
+def benchmark(rounds):
+    """
+    Returns:
+        tuple: (seconds per message sequentially, seconds per message combined,
+        corpus messages the two classify differently)
+    """
+    mismatches = [text for text in CORPUS if sequential_message_type(text) != parse_system_message(text).type]
+    return (_per_message(sequential_message_type, rounds),
+            _per_message(parse_system_message, rounds),
+            mismatches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="System message classifier benchmark")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    sequential, combined, mismatches = benchmark(args.rounds)
+    print(f"{len(CORPUS)} messages, {sum(parse_system_message(t).type != MessageTypes.NON_SYSTEM for t in CORPUS)} system")
+    print(f"sequential: {sequential * 1e6:.1f} us/message")
+    print(f"  combined: {combined * 1e6:.1f} us/message")
+    for text in mismatches:
+        print(f"classified differently: {text!r}")
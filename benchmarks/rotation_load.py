@@ -0,0 +1,100 @@
+# Load test of the password rotation: N accounts change their passwords in
+# parallel through changeSteamPassword() against the offline Steam stand-in.
+# Reports wall time, peak memory, requests per endpoint and rotation_metrics.
+# Run from the repository root: python -m benchmarks.rotation_load --accounts 100
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import time
+
+
+async def benchmark(accounts, latency, failure_rate, confirmation_delay, limit_per_host):
+    """
+    Rotate the passwords of accounts stand-in accounts at once.
+
+    Steam sessions are stored in the database.db of a temporary directory,
+    the database of the bot is not touched.
+
+    Returns:
+        tuple: (rotated, errors by type, wall time in seconds, stand-in requests, rotation_metrics snapshot)
+    """
+    # Imported here: the session storage opens database.db in the working directory on import
+    from steamHandler.changePassword import changeSteamPassword, rotation_metrics, steam_transport
+    from steampassword.standin import StandinSteam
+
+    standin = StandinSteam(latency=latency, failure_rate=failure_rate, confirmation_delay=confirmation_delay)
+    os.environ["STEAM_STANDIN_URL"] = await standin.start()
+    steam_transport.limit_per_host = limit_per_host
+    try:
+        paths = []
+        for i in range(accounts):
+            mafile = standin.make_mafile(f"load{i:04d}", f"oldpass{i:04d}")
+            path = f"load{i:04d}.maFile"
+            with open(path, "w") as f:
+                json.dump(mafile, f)
+            paths.append(path)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                changeSteamPassword(path, f"oldpass{i:04d}", f"newpass{i:04d}")
+                for i, path in enumerate(paths)
+            ),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        await steam_transport.close()
+        await standin.stop()
+
+    errors = {}
+    for result in results:
+        if isinstance(result, BaseException):
+            errors[type(result).__name__] = errors.get(type(result).__name__, 0) + 1
+    rotated = sum(
+        standin.accounts[f"load{i:04d}"].password == f"newpass{i:04d}" for i in range(accounts)
+    )
+    return rotated, errors, elapsed, dict(standin.requests), rotation_metrics.snapshot()
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            rotated, errors, elapsed, requests, snapshot = asyncio.run(
+                benchmark(args.accounts, tuple(args.latency), args.failure_rate,
+                          args.confirmation_delay, args.limit_per_host)
+            )
+        finally:
+            from steamHandler.sessionStorage import cookie_storage
+            cookie_storage.db.close()
+            os.chdir(cwd)
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{rotated}/{args.accounts} rotated in {elapsed:.2f}s, errors {errors or 'none'}, peak RSS {peak_rss:.0f} MiB")
+    print("stand-in requests per rotation:")
+    for endpoint, count in sorted(requests.items(), key=lambda item: -item[1]):
+        print(f"  {count / args.accounts:6.2f}  {endpoint}")
+    print("steps:")
+    for step, stats in snapshot["steps"].items():
+        print(
+            f"  {step:<28} count {stats['count']:>4}  errors {stats['errors']:>3}  "
+            f"avg {stats['avg']:.3f}s  p95 {stats['p95'] or 0:.3f}s  max {stats['max']:.3f}s"
+        )
+    print(f"requests per host: {snapshot['requests']}")
+    print(f"retries: {snapshot['retries'] or 'none'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel password rotations against the Steam stand-in")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.01, 0.05), metavar=("MIN", "MAX"))
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--confirmation-delay", type=float, default=0.3)
+    parser.add_argument("--limit-per-host", type=int, default=10)
+    main(parser.parse_args())
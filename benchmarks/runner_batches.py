@@ -0,0 +1,96 @@
+# Chat history burst through Runner: runner/ POSTs and wall time.
+# Run from the repository root: python -m benchmarks.runner_batches --chats 200
+import argparse
+import json
+import threading
+import time
+
+from FunPayAPI.account import Account
+from FunPayAPI.updater.runner import Runner
+
+ACCOUNT_ID = 1000
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+        self.status_code = 200
+
+    def json(self):
+        return self._data
+
+
+class StubFunPay:
+    """Answers Account.method() runner/ requests like FunPay, after a fixed latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.posts = 0
+        self._lock = threading.Lock()
+
+    def method(self, request_method, api_method, headers, payload, *args, **kwargs):
+        with self._lock:
+            self.posts += 1
+        time.sleep(self.latency)
+        objects = []
+        for obj in json.loads(payload["objects"]):
+            if obj["type"] == "chat_node":
+                chat_id = obj["id"]
+                objects.append({"type": "chat_node", "id": chat_id, "data": {
+                    "node": {"silent": False, "name": f"users-{ACCOUNT_ID}-{chat_id}"},
+                    "messages": [{"id": chat_id * 10 + 1, "author": chat_id,
+                                  "html": '<div class="chat-msg-text">Здравствуйте</div>'}],
+                }})
+        return _Response({"objects": objects})
+
+
+def _bookmarks(chat_ids, message_id):
+    html = "".join(
+        f'<a class="contact-item unread" data-id="{chat_id}" data-node-msg="{message_id(chat_id)}" '
+        f'data-user-msg="{message_id(chat_id)}"><div class="media-user-name">buyer{chat_id}</div>'
+        f'<div class="contact-item-message">Здравствуйте</div></a>'
+        for chat_id in chat_ids
+    )
+    return {"type": "chat_bookmarks", "tag": "00000000", "data": {"html": html}}
+
+
+def make_runner(stub, **kwargs):
+    """Runner over an offline Account whose requests are answered by stub."""
+    account = Account("benchmark")
+    account.id, account.username, account.csrf_token = ACCOUNT_ID, "seller", "csrf"
+    account._Account__initiated = True
+    account.method = stub.method
+    return Runner(account, disabled_order_requests=True, **kwargs)
+
+
+def benchmark(chats, latency, max_workers):
+    """
+    Changed chats burst handled by Runner.parse_chat_updates.
+
+    Returns:
+        tuple: (runner/ POSTs, wall time in seconds, new message events)
+    """
+    stub = StubFunPay(latency)
+    runner = make_runner(stub)
+    runner.max_workers = max_workers
+
+    chat_ids = list(range(1, chats + 1))
+    # The first update only remembers the chats, the second one is the burst
+    runner.parse_updates({"objects": [_bookmarks(chat_ids, lambda chat_id: chat_id * 10)]})
+    stub.posts = 0
+    started = time.perf_counter()
+    events = runner.parse_updates({"objects": [_bookmarks(chat_ids, lambda chat_id: chat_id * 10 + 1)]})
+    elapsed = time.perf_counter() - started
+    new_messages = sum(1 for event in events if type(event).__name__ == "NewMessageEvent")
+    return stub.posts, elapsed, new_messages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runner chat history batching benchmark")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.15, help="runner/ response time, seconds")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    for label, workers in (("sequential", 1), ("concurrent", args.workers)):
+        posts, elapsed, new_messages = benchmark(args.chats, args.latency, workers)
+        print(f"{label:>10}: {posts} runner/ POSTs, {elapsed:.2f}s, {new_messages} new messages")
@@ -0,0 +1,63 @@
+# Soak test of the bounded Runner/Account caches: replays synthetic chat events
+# from ever new chats and checks that the number of live Python memory blocks stays flat.
+# Run from the repository root: python -m benchmarks.runner_soak --events 1000000
+import argparse
+import gc
+import sys
+import time
+
+from FunPayAPI import types
+from FunPayAPI.updater.events import EventTypes
+
+from benchmarks.runner_batches import StubFunPay, _bookmarks, make_runner
+
+
+def soak(events, batch, max_cached_chats, checkpoints=10):
+    """
+    Feed events changed chats to a Runner, batch chats per update, all chat IDs distinct.
+
+    Returns:
+        list: (events replayed, allocated memory blocks, cache sizes) per checkpoint
+    """
+    # Like the bot (see funpay.py), the raw HTML isn't kept
+    types.KEEP_HTML = False
+    runner = make_runner(StubFunPay(0), max_cached_chats=max_cached_chats)
+    results = []
+    every = max(events // checkpoints, batch)
+    replayed, next_checkpoint, chat_id = 0, every, 1
+    while replayed < events:
+        chat_ids = list(range(chat_id, chat_id + batch))
+        chat_id += batch
+        # Every chat shows up twice: its first message and a new one with a history request
+        runner.parse_updates({"objects": [_bookmarks(chat_ids, lambda cid: cid * 10)]})
+        for event in runner.parse_updates({"objects": [_bookmarks(chat_ids, lambda cid: cid * 10 + 1)]}):
+            if event.type == EventTypes.NEW_MESSAGE:
+                runner.mark_as_by_bot(event.message.chat_id, event.message.id + 1)
+        replayed += batch * 2
+        if replayed >= next_checkpoint:
+            next_checkpoint += every
+            # Parsed HTML trees are cyclic, only live objects are counted
+            gc.collect()
+            results.append((replayed, sys.getallocatedblocks(), runner.get_cache_sizes()))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runner cache soak test")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=100, help="changed chats per update")
+    parser.add_argument("--max-cached-chats", type=int, default=5000)
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="allowed growth of live memory blocks after the caches filled up, fraction")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    results = soak(args.events, args.batch, args.max_cached_chats)
+    for replayed, blocks, sizes in results:
+        print(f"{replayed:>10,} events  {blocks:>9,} blocks  "
+              + " ".join(f"{name}={size}" for name, size in sizes.items()))
+    print(f"{args.events:,} events in {time.perf_counter() - started:.0f}s")
+    # The caches are full after the first checkpoints, from then on the heap must not grow
+    baseline = results[len(results) // 3][1]
+    peak = max(blocks for _, blocks, _ in results[len(results) // 3:])
+    assert peak <= baseline * (1 + args.tolerance), f"live memory blocks grew from {baseline:,} to {peak:,}"
+    print("memory is flat")
@@ -0,0 +1,63 @@
+# Memory per object of the FunPayAPI shortcut types, with and without the raw HTML.
+# Run from the repository root: python -m benchmarks.types_memory --objects 20000
+import argparse
+import datetime
+import tracemalloc
+
+from FunPayAPI import types
+
+
+def _html(i, size):
+    # Distinct strings, like real pages: nothing is shared between objects
+    return f'<div class="chat-msg-item" id="message-{i}">' + "x" * size + "</div>"
+
+
+_SUBCATEGORY = types.SubCategory(1, "Аккаунты", types.SubCategoryTypes.COMMON, types.Category(1, "Steam"))
+
+FACTORIES = {
+    "Message": lambda i, html: types.Message(
+        i, f"Сообщение {i}", i, "buyer", i, "buyer", i, html, determine_msg_type=False),
+    "ChatShortcut": lambda i, html: types.ChatShortcut(
+        i, "buyer", f"Сообщение {i}", i, i, False, html, determine_msg_type=False),
+    "OrderShortcut": lambda i, html: types.OrderShortcut(
+        f"ABC{i}", "Аренда аккаунта, 1 час", 50.0, types.Currency.RUB, "buyer", i, i,
+        types.OrderStatuses.PAID, datetime.datetime(2024, 1, 1), "Steam", _SUBCATEGORY, html, dont_search_amount=True),
+    "LotShortcut": lambda i, html: types.LotShortcut(
+        i, None, f"Лот {i}", None, 50.0, types.Currency.RUB, _SUBCATEGORY, None, True, None, None, html),
+}
+
+
+def bytes_per_object(factory, objects, html_size, keep_html):
+    types.KEEP_HTML = keep_html
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # The parsed HTML strings are freed unless the objects keep them
+    created = [factory(i, _html(i, html_size)) for i in range(objects)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del created
+    return used / objects
+
+
+def benchmark(objects, html_size):
+    """
+    Returns:
+        dict: type name -> (bytes per object with the HTML kept, bytes per object without it)
+    """
+    try:
+        return {
+            name: (bytes_per_object(factory, objects, html_size, True),
+                   bytes_per_object(factory, objects, html_size, False))
+            for name, factory in FACTORIES.items()
+        }
+    finally:
+        types.KEEP_HTML = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FunPayAPI types memory benchmark")
+    parser.add_argument("--objects", type=int, default=20000)
+    parser.add_argument("--html-size", type=int, default=600, help="raw HTML length, characters")
+    args = parser.parse_args()
+    for name, (with_html, without_html) in benchmark(args.objects, args.html_size).items():
+        print(f"{name:>14}: {with_html:6.0f} B/object with HTML, {without_html:6.0f} B/object without")
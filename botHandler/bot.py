@@ -1,38 +1,43 @@
 import asyncio
+import html
+import io
 import os
 import sys
 import sqlite3
+import time
 
 import telebot
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from config import ADMIN_ID, BOT_TOKEN, HOURS_FOR_REVIEW, SECRET_PHRASE, FUNPAY_GOLDEN_KEY, PROXY_URL as CONF_PROXY_URL, PROXY_LOGIN as CONF_PROXY_LOGIN, PROXY_PASSWORD as CONF_PROXY_PASSWORD
+from botHandler.bulk_import import import_accounts
+from configHandler.configService import config_service, credential_validator
+from botHandler.notifications import NotificationQueue
+from botHandler.states import StateStore
+from botHandler.statistics import StatisticsService
 from databaseHandler.databaseSetup import SQLiteDB
+from FunPayAPI.common.utils import LRUDict
 from funpayHandler.funpay import send_message_by_owner
 from logger import logger
-from steamHandler.changePassword import changeSteamPassword
+from steamHandler.changePassword import changeSteamPassword, rotation_metrics
+from supervisorHandler.supervisor import supervisor
 
-import requests
 
 db_bot = SQLiteDB()
-API_TOKEN = BOT_TOKEN
+# Statistics screens are served from a snapshot refreshed at most once a minute
+stats_service = StatisticsService(db_bot, max_age=60)
+# Token and admin are bound at startup, the rest of the settings is read live
+API_TOKEN = config_service.settings.BOT_TOKEN
+ADMIN_ID = config_service.settings.ADMIN_ID
 
 # --- ПРОКСИ НАСТРОЙКА ---
-PROXY_URL = os.getenv("PROXY_URL") or CONF_PROXY_URL
-PROXY_LOGIN = os.getenv("PROXY_LOGIN") or CONF_PROXY_LOGIN
-PROXY_PASSWORD = os.getenv("PROXY_PASSWORD") or CONF_PROXY_PASSWORD
-
-def configure_proxy():
-    import telebot.apihelper
-    if PROXY_URL:
-        telebot.apihelper.proxy = {
-            "http": PROXY_URL,
-            "https": PROXY_URL,
-        }
-    else:
-        telebot.apihelper.proxy = None
+def configure_proxy(settings):
+    # aiohttp transport takes a single proxy URL for all schemes and reads it per request
+    asyncio_helper.proxy = settings.PROXY_URL or None
 
-configure_proxy()
+configure_proxy(config_service.settings)
+config_service.subscribe(configure_proxy, "PROXY_URL")
 # --- КОНЕЦ ПРОКСИ ---
 
 SAVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "accounts")
@@ -42,30 +47,61 @@ except PermissionError:
     SAVE_DIR = os.path.join(os.path.expanduser("~"), "UniFlex_accounts")
     os.makedirs(SAVE_DIR, exist_ok=True)
 
-bot = telebot.TeleBot(API_TOKEN)
-user_states = {}
-whitelisted_users = set()
-
-bot.set_my_commands(
-    [
-        telebot.types.BotCommand("/start", "Начать бота"),
-        telebot.types.BotCommand("/accounts", "Посмотреть аккаунты"),
-        telebot.types.BotCommand("/setproxy", "Установить прокси для бота"),
-        telebot.types.BotCommand("/unsetproxy", "Сбросить прокси для бота"),
-        telebot.types.BotCommand("/restart", "Перезапустить бота"),
-        telebot.types.BotCommand("/unowned", "Свободные аккаунты"),
-    ]
-)
+bot = AsyncTeleBot(API_TOKEN)
+# Abandoned multi-step flows are dropped after an hour of inactivity
+user_states = StateStore(ttl=3600, db=db_bot)
+whitelisted_users = set(db_bot.get_authorized_users())
+# Message handlers of multi-step flows by state name, see dispatch_user_state()
+STATE_HANDLERS = {}
+
+# Admin alerts are queued and sent by the "notifications" component, see main.py
+admin_notifications = NotificationQueue(bot.send_message, ADMIN_ID)
+# Strong references to running background jobs, so they are not garbage collected
+background_tasks = set()
+
+BOT_COMMANDS = [
+    telebot.types.BotCommand("/start", "Начать бота"),
+    telebot.types.BotCommand("/accounts", "Посмотреть аккаунты"),
+    telebot.types.BotCommand("/setproxy", "Установить прокси для бота"),
+    telebot.types.BotCommand("/unsetproxy", "Сбросить прокси для бота"),
+    telebot.types.BotCommand("/restart", "Перезапустить бота"),
+    telebot.types.BotCommand("/unowned", "Свободные аккаунты"),
+    telebot.types.BotCommand("/health", "Состояние компонентов"),
+    telebot.types.BotCommand("/steam_metrics", "Гистограммы смены паролей Steam"),
+    telebot.types.BotCommand("/quarantine", "Аккаунты с неудачной сменой пароля"),
+]
+
+def run_in_background(coro):
+    """Run a long job as a task so the handler returns and the bot keeps polling."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def edit_progress(message, text):
+    """Report job progress by editing the status message in place."""
+    try:
+        await bot.edit_message_text(
+            text, chat_id=message.chat.id, message_id=message.message_id
+        )
+    except Exception as e:
+        logger.error(f"Failed to update progress message: {str(e)}")
 
 def set_user_state(user_id, state, data=None):
-    user_states[user_id] = {"state": state, "data": data or {}}
+    user_states.set(user_id, state, data)
 
 def get_user_state(user_id):
-    return user_states.get(user_id, {"state": None, "data": {}})
+    return user_states.get(user_id)
 
 def clear_user_state(user_id):
-    if user_id in user_states:
-        del user_states[user_id]
+    user_states.clear(user_id)
+
+def state_handler(state):
+    """Register a handler for text messages of users in the given flow state."""
+    def decorator(handler):
+        STATE_HANDLERS[state] = handler
+        return handler
+    return decorator
 
 # --- КРАСИВЫЕ КЛАВИАТУРЫ ---
 
@@ -88,72 +124,193 @@ def get_main_keyboard():
         InlineKeyboardButton("🛠️ Настройки", callback_data="settings_menu"),
     )
     keyboard.add(
+        InlineKeyboardButton("📦 Массовый импорт", callback_data="bulk_import"),
         InlineKeyboardButton("❓ Помощь", callback_data="help_menu"),
     )
     return keyboard
 
 ACCOUNTS_PER_PAGE = 5
+# Rendered account pages keyed by (page, cursor, inventory version)
+accounts_page_cache = LRUDict(256)
 
-def get_accounts_pagination_keyboard(page, total_pages):
+def get_accounts_pagination_keyboard(page, total_pages, first_id, last_id):
     keyboard = InlineKeyboardMarkup(row_width=2)
     if page > 0:
-        keyboard.add(InlineKeyboardButton("⬅️ Назад", callback_data=f"accounts_page_{page - 1}"))
+        keyboard.add(InlineKeyboardButton("⬅️ Назад", callback_data=f"accounts_back_{page - 1}_{first_id}"))
     if page < total_pages - 1:
-        keyboard.add(InlineKeyboardButton("➡️ Вперёд", callback_data=f"accounts_page_{page + 1}"))
+        keyboard.add(InlineKeyboardButton("➡️ Вперёд", callback_data=f"accounts_page_{page + 1}_{last_id}"))
     keyboard.add(InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_main"))
     return keyboard
 
 @bot.callback_query_handler(func=lambda call: call.data == "show_accounts")
-def show_accounts_callback(call):
-    accounts = db_bot.get_all_accounts()
-    if not accounts:
-        bot.edit_message_text(
+async def show_accounts_callback(call):
+    if not db_bot.get_total_accounts():
+        await bot.edit_message_text(
             "Аккаунты не найдены.",
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
             reply_markup=get_main_keyboard()
         )
         return
-    set_user_state(call.from_user.id, "viewing_accounts", {"accounts": accounts, "page": 0})
-    send_accounts_page(call.message.chat.id, accounts, 0, call.message.message_id)
+    await send_accounts_page(call.message.chat.id, 0, message_id=call.message.message_id)
+
+@bot.message_handler(commands=["accounts"])
+async def accounts_command(message):
+    if message.from_user.id not in whitelisted_users:
+        await bot.send_message(message.chat.id, "У вас нет доступа к этой функции")
+        return
+    if not db_bot.get_total_accounts():
+        await bot.send_message(message.chat.id, "Аккаунты не найдены.")
+        return
+    await send_accounts_page(message.chat.id, 0)
+
+COMPONENT_STATES = {
+    "running": "🟢",
+    "restarting": "🟠",
+    "unhealthy": "🔴",
+    "pending": "⚪",
+    "stopped": "⚫",
+}
+
+@bot.message_handler(commands=["health"])
+async def health_command(message):
+    if message.from_user.id != ADMIN_ID:
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
+        return
+    metrics = supervisor.get_metrics()
+    lines = [
+        "🩺 <b>Состояние сервиса</b>\n",
+        f"⏱ Задержка цикла: {metrics['loop_lag']:.2f} с (макс. {metrics['max_loop_lag']:.2f} с)\n",
+    ]
+    for name, component in metrics["components"].items():
+        lines.append(
+            f"{COMPONENT_STATES.get(component['state'], '⚪')} <b>{name}</b>: "
+            f"работает {int(component['uptime'] // 60)} мин, запусков {component['starts']}"
+        )
+        lines.append(
+            f"   CPU {component['cpu_time']:.1f} с, задач {component['work_count']}, "
+            f"ср. {component['avg_work_time']:.2f} с, макс. {component['max_work_time']:.2f} с"
+        )
+        if component["last_error"]:
+            lines.append(f"   Последняя ошибка: <code>{html.escape(component['last_error'])}</code>")
+
+    steam_metrics = rotation_metrics.snapshot()
+    if steam_metrics["steps"]:
+        lines.append("\n🔑 <b>Смена паролей Steam</b>")
+        for step, stats in steam_metrics["steps"].items():
+            lines.append(
+                f"   {step}: {stats['count']} раз, ошибок {stats['errors']}, "
+                f"ср. {stats['avg']:.2f} с, p95 ≤ {stats['p95']:.2f} с, макс. {stats['max']:.2f} с"
+            )
+        requests_by_host = ", ".join(f"{host} {count}" for host, count in steam_metrics["requests"].items())
+        lines.append(f"   Запросы: {requests_by_host}")
+        if steam_metrics["retries"]:
+            retries = ", ".join(f"{step} {count}" for step, count in steam_metrics["retries"].items())
+            lines.append(f"   Повторы: {retries}")
+    await bot.send_message(message.chat.id, "\n".join(lines), parse_mode="HTML")
+
+@bot.message_handler(commands=["steam_metrics"])
+async def steam_metrics_command(message):
+    if message.from_user.id != ADMIN_ID:
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
+        return
+    dump = rotation_metrics.dump_histograms()
+    if not dump:
+        await bot.send_message(message.chat.id, "Смен паролей Steam ещё не было.")
+        return
+    document = io.BytesIO(dump.encode("utf-8"))
+    document.name = "steam_metrics.txt"
+    await bot.send_document(message.chat.id, document, caption="Метрики смены паролей Steam")
+
+def render_quarantine():
+    jobs = db_bot.get_quarantined_rotation_jobs()
+    if not jobs:
+        return "✅ Карантин пуст, все смены паролей прошли успешно.", None
+    lines = ["🚫 <b>Аккаунты в карантине</b>\n"]
+    keyboard = InlineKeyboardMarkup()
+    for account_id, account_name, owner, expires_at, attempts, last_error in jobs:
+        lines.append(
+            f"• <b>{html.escape(account_name or str(account_id))}</b> (ID {account_id}), "
+            f"владелец {html.escape(owner)}, истекла {expires_at}, попыток {attempts}\n"
+            f"   <code>{html.escape(last_error or '')}</code>"
+        )
+        keyboard.add(InlineKeyboardButton(
+            f"🔁 Повторить {account_name or account_id}", callback_data=f"retry_rotation_{account_id}"
+        ))
+    return "\n".join(lines), keyboard
+
+@bot.message_handler(commands=["quarantine"])
+async def quarantine_command(message):
+    if message.from_user.id != ADMIN_ID:
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
+        return
+    text, keyboard = render_quarantine()
+    await bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=keyboard)
 
-def send_accounts_page(chat_id, accounts, page, message_id=None):
-    start = page * ACCOUNTS_PER_PAGE
-    end = start + ACCOUNTS_PER_PAGE
-    accounts_page = accounts[start:end]
-    total_pages = (len(accounts) + ACCOUNTS_PER_PAGE - 1) // ACCOUNTS_PER_PAGE
+@bot.callback_query_handler(func=lambda call: call.data.startswith("retry_rotation_"))
+async def retry_rotation_callback(call):
+    if call.from_user.id != ADMIN_ID:
+        await bot.answer_callback_query(call.id, "Доступ запрещён.")
+        return
+    account_id = int(call.data[len("retry_rotation_"):])
+    if db_bot.retry_rotation_job(account_id, time.time()):
+        await bot.answer_callback_query(call.id, "Смена пароля поставлена в очередь")
+    else:
+        await bot.answer_callback_query(call.id, "Задача уже не в карантине")
+    text, keyboard = render_quarantine()
+    await bot.edit_message_text(
+        text,
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        parse_mode="HTML",
+        reply_markup=keyboard,
+    )
+
+def render_accounts_page(page, after_id=0, before_id=None):
+    """
+    Build the text and keyboard of one accounts page.
+
+    Pages are fetched with keyset queries (after_id for forward, before_id for
+    back), so a page turn reads ACCOUNTS_PER_PAGE rows whatever the table size.
+    Renders are cached until the inventory changes.
+    """
+    version = db_bot.get_inventory_version()
+    key = (page, after_id, before_id, version)
+    cached = accounts_page_cache.get(key)
+    if cached is not None:
+        return cached
+
+    accounts_page = db_bot.get_accounts_page(
+        after_id=after_id, before_id=before_id, limit=ACCOUNTS_PER_PAGE
+    )
+    total_pages = (db_bot.get_total_accounts() + ACCOUNTS_PER_PAGE - 1) // ACCOUNTS_PER_PAGE
 
     if not accounts_page:
         msg = "❗Нет больше аккаунтов для отображения."
+        first_id = last_id = after_id
     else:
-        grouped_accounts = {}
-        for account in accounts_page:
-            account_name = account["account_name"]
-            if account_name not in grouped_accounts:
-                grouped_accounts[account_name] = []
-            grouped_accounts[account_name].append(account)
-
         response = []
-        for account_name, account_list in grouped_accounts.items():
-            response.append(f"**📝 Название лота: `{account_name}`**")
-            for account in account_list:
-                account_id = account["id"]
-                login = account["login"]
-                password = account["password"]
-                owner = account["owner"]
-                account_info = (
-                    f"🆔 ID: `{account_id}`\n"
-                    f"🔑 Логин: `{login}`\n"
-                    f"🔒 Пароль: `{password}`\n"
-                )
-                if owner:
-                    account_info += f"👤 Владелец: `{owner}`"
-                response.append(account_info)
+        for account in accounts_page:
+            response.append(f"**📝 Название лота: `{account['account_name']}`**")
+            account_info = (
+                f"🆔 ID: `{account['id']}`\n"
+                f"🔑 Логин: `{account['login']}`\n"
+                f"🔒 Пароль: `{account['password']}`\n"
+            )
+            if account["owner"]:
+                account_info += f"👤 Владелец: `{account['owner']}`"
+            response.append(account_info)
         msg = "\n\n".join(response)
+        first_id, last_id = accounts_page[0]["id"], accounts_page[-1]["id"]
+
+    cached = (msg, get_accounts_pagination_keyboard(page, total_pages, first_id, last_id))
+    accounts_page_cache[key] = cached
+    return cached
 
-    keyboard = get_accounts_pagination_keyboard(page, total_pages)
+async def send_accounts_page(chat_id, page, after_id=0, before_id=None, message_id=None):
+    msg, keyboard = render_accounts_page(page, after_id, before_id)
     if message_id:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             msg,
             chat_id=chat_id,
             message_id=message_id,
@@ -161,27 +318,26 @@ def send_accounts_page(chat_id, accounts, page, message_id=None):
             reply_markup=keyboard,
         )
     else:
-        bot.send_message(
+        await bot.send_message(
             chat_id,
             msg,
             parse_mode="Markdown",
             reply_markup=keyboard,
         )
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("accounts_page_"))
-def handle_accounts_pagination(call):
-    page = int(call.data.split("_")[-1])
-    state = get_user_state(call.from_user.id)
-    if state["state"] == "viewing_accounts":
-        accounts = state["data"]["accounts"]
-        send_accounts_page(
-            call.message.chat.id, accounts, page, message_id=call.message.message_id
+@bot.callback_query_handler(func=lambda call: call.data.startswith(("accounts_page_", "accounts_back_")))
+async def handle_accounts_pagination(call):
+    _, direction, page, cursor = call.data.split("_")
+    page, cursor = int(page), int(cursor)
+    if direction == "back":
+        await send_accounts_page(
+            call.message.chat.id, page, before_id=cursor, message_id=call.message.message_id
         )
-        set_user_state(
-            call.from_user.id, "viewing_accounts", {"accounts": accounts, "page": page}
+    else:
+        await send_accounts_page(
+            call.message.chat.id, page, after_id=cursor, message_id=call.message.message_id
         )
-    bot.answer_callback_query(call.id)
-
+    await bot.answer_callback_query(call.id)
 
 def get_settings_keyboard():
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -245,277 +401,165 @@ def get_notification_settings_keyboard():
     )
     return keyboard
 
-def get_accounts_pagination_keyboard(page, total_pages):
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    if page > 0:
-        keyboard.add(InlineKeyboardButton("⬅️ Назад", callback_data=f"accounts_page_{page - 1}"))
-    if page < total_pages - 1:
-        keyboard.add(InlineKeyboardButton("➡️ Вперёд", callback_data=f"accounts_page_{page + 1}"))
-    keyboard.add(InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_main"))
-    return keyboard
-
 # --- МЕНЮ НАСТРОЕК ---
 @bot.callback_query_handler(func=lambda call: call.data == "settings_menu")
-def settings_menu_callback(call):
-    bot.edit_message_text(
+async def settings_menu_callback(call):
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="🛠️ <b>Настройки</b>",
         reply_markup=get_settings_keyboard(),
         parse_mode="HTML"
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 # --- ГОЛД КЕЙ НАСТРОЙКИ ---
 @bot.callback_query_handler(func=lambda call: call.data == "gold_key_settings")
-def gold_key_settings_callback(call):
+async def gold_key_settings_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
     keyboard = get_gold_key_keyboard()
-    current_key = get_gold_key_from_config()
+    current_key = config_service.get("FUNPAY_GOLDEN_KEY", "")
     display_key = current_key if current_key else "Не задан"
-    bot.edit_message_text(
+    text = f"👑 <b>Голд кей</b>\n\nТекущий Голд кей: <code>{display_key}</code>"
+    checked = credential_validator.cached("golden_key", current_key)
+    if checked is not None:
+        text += "\nСтатус: " + ("валидный ✅" if checked[0] else f"невалидный ❌ ({checked[1]})")
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        text=f"👑 <b>Голд кей</b>\n\nТекущий Голд кей: <code>{display_key}</code>",
+        text=text,
         reply_markup=keyboard,
         parse_mode="HTML"
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "gold_key_change")
-def gold_key_change_callback(call):
+async def gold_key_change_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
     set_user_state(call.from_user.id, "waiting_for_gold_key")
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="✏️ Введите новый Голд кей:",
         reply_markup=get_gold_key_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "gold_key_check")
-def gold_key_check_callback(call):
+async def gold_key_check_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
-    key = get_gold_key_from_config()
-    check_result, error_msg = check_funpay_golden_key(key)
+    key = config_service.get("FUNPAY_GOLDEN_KEY", "")
+    check_result, error_msg = await credential_validator.check_golden_key(key)
     if check_result:
-        bot.answer_callback_query(call.id, "Голд кей валидный ✅", show_alert=True)
+        await bot.answer_callback_query(call.id, "Голд кей валидный ✅", show_alert=True)
     else:
-        bot.answer_callback_query(call.id, f"Голд кей невалидный ❌\n{error_msg}", show_alert=True)
+        await bot.answer_callback_query(call.id, f"Голд кей невалидный ❌\n{error_msg}", show_alert=True)
 
-@bot.message_handler(func=lambda message: get_user_state(message.from_user.id)["state"] == "waiting_for_gold_key")
-def process_gold_key(message):
+@state_handler("waiting_for_gold_key")
+async def process_gold_key(message):
     if message.from_user.id != ADMIN_ID:
-        bot.send_message(message.chat.id, "Доступ запрещён.")
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
         return
     new_key = message.text.strip()
-    res = update_gold_key_in_config(new_key)
+    res = config_service.update(FUNPAY_GOLDEN_KEY=new_key)
     if res:
-        bot.send_message(message.chat.id, f"🤑Голд кей успешно изменён!\nНовый ключ: <code>{new_key}</code>", parse_mode="HTML")
+        await bot.send_message(message.chat.id, f"🤑Голд кей успешно изменён!\nНовый ключ: <code>{new_key}</code>", parse_mode="HTML")
     else:
-        bot.send_message(message.chat.id, "❌Ошибка при сохранении ключа в config.py. Проверьте права доступа.")
+        await bot.send_message(message.chat.id, "❌Ошибка при сохранении ключа в config.py. Проверьте права доступа.")
     clear_user_state(message.from_user.id)
 
-def get_gold_key_from_config():
-    try:
-        import importlib.util
-        import sys
-        config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.py'))
-        spec = importlib.util.spec_from_file_location("config", config_path)
-        config = importlib.util.module_from_spec(spec)
-        sys.modules["config"] = config
-        spec.loader.exec_module(config)
-        return getattr(config, "FUNPAY_GOLDEN_KEY", "")
-    except Exception as e:
-        print(f"[get_gold_key_from_config] {e}")
-        return ""
-
-def update_gold_key_in_config(new_key):
-    config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.py'))
-    try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        found = False
-        for idx, line in enumerate(lines):
-            if line.strip().startswith("FUNPAY_GOLDEN_KEY"):
-                lines[idx] = f'FUNPAY_GOLDEN_KEY = "{new_key}"\n'
-                found = True
-                break
-        if not found:
-            lines.append(f'\nFUNPAY_GOLDEN_KEY = "{new_key}"\n')
-        with open(config_path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-        return True
-    except Exception as e:
-        print(f"Ошибка при записи FUNPAY_GOLDEN_KEY: {e}")
-        return False
-
-def check_funpay_golden_key(key):
-    try:
-        headers = {
-            "cookie": f"golden_key={key}",
-            "user-agent": "Mozilla/5.0"
-        }
-        resp = requests.get("https://funpay.com/", headers=headers, timeout=7)
-        if resp.status_code == 200:
-            if "Профиль" in resp.text or "profile" in resp.text.lower():
-                return True, ""
-            if "Войти" in resp.text or "login" in resp.text.lower():
-                return False, "Ключ не авторизован (вы не вошли в профиль)"
-            return False, "Не удалось однозначно определить валидность ключа"
-        else:
-            return False, f"Сайт ответил с кодом {resp.status_code}"
-    except Exception as e:
-        return False, f"Ошибка проверки: {e}"
-
-# --- ПРОКСИ СОХРАНЕНИЕ В CONFIG.PY ---
-def update_proxy_in_config(proxy_url, proxy_login, proxy_password):
-    config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.py'))
-    try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        params = {
-            "PROXY_URL": proxy_url,
-            "PROXY_LOGIN": proxy_login,
-            "PROXY_PASSWORD": proxy_password
-        }
-        for key, value in params.items():
-            found = False
-            for idx, line in enumerate(lines):
-                if line.strip().startswith(f"{key}"):
-                    lines[idx] = f'{key} = "{value}"\n'
-                    found = True
-                    break
-            if not found:
-                lines.append(f'\n{key} = "{value}"\n')
-        with open(config_path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-        return True
-    except Exception as e:
-        print(f"Ошибка при записи прокси: {e}")
-        return False
-# --- КОНЕЦ ПРОКСИ СОХРАНЕНИЯ ---
-
 # --- ПРОКСИ КНОПКИ ---
 @bot.callback_query_handler(func=lambda call: call.data == "proxy_settings")
-def proxy_settings_callback(call):
+async def proxy_settings_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
     keyboard = get_proxy_keyboard()
-    current_proxy = PROXY_URL if PROXY_URL else "Не задан"
-    bot.edit_message_text(
+    current_proxy = config_service.settings.PROXY_URL or "Не задан"
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"🛡️ <b>Прокси</b>\n\nПрокси сейчас: <code>{current_proxy}</code>",
         reply_markup=keyboard,
         parse_mode="HTML"
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "proxy_set")
-def proxy_set_callback(call):
+async def proxy_set_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
     set_user_state(call.from_user.id, "waiting_for_proxy_url")
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="🔌 <b>Установка прокси</b>\n\nОтправьте прокси в формате:\n<code>http(s)://[login:password@]host:port</code>",
         parse_mode="HTML",
         reply_markup=get_proxy_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "proxy_unset")
-def proxy_unset_callback(call):
+async def proxy_unset_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
-    import telebot.apihelper
-    telebot.apihelper.proxy = None
     os.environ.pop("PROXY_URL", None)
     os.environ.pop("PROXY_LOGIN", None)
     os.environ.pop("PROXY_PASSWORD", None)
-    global PROXY_URL, PROXY_LOGIN, PROXY_PASSWORD
-    PROXY_URL = ""
-    PROXY_LOGIN = ""
-    PROXY_PASSWORD = ""
-    update_proxy_in_config("", "", "")
-    bot.edit_message_text(
+    config_service.update(PROXY_URL="", PROXY_LOGIN="", PROXY_PASSWORD="")
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        text="❌ Прокси сброшен! Рекомендуется перезапустить бота.",
+        text="❌ Прокси сброшен!",
         reply_markup=get_proxy_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "proxy_check")
-def proxy_check_callback(call):
+async def proxy_check_callback(call):
     if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
-        return
-    proxy_url = PROXY_URL
-    if not proxy_url:
-        bot.answer_callback_query(call.id, "Прокси не задан.", show_alert=True)
+        await bot.answer_callback_query(call.id, "Доступ запрещён.", show_alert=True)
         return
-    if "://" not in proxy_url:
-        bot.answer_callback_query(call.id, "Прокси некорректный.", show_alert=True)
-        return
-    proxies = { "http": proxy_url, "https": proxy_url }
-    try:
-        r = requests.get("https://api.telegram.org", proxies=proxies, timeout=7)
-        if r.status_code == 200:
-            bot.answer_callback_query(call.id, "Прокси рабочий ✅", show_alert=True)
-        else:
-            bot.answer_callback_query(call.id, f"Ошибка прокси: {r.status_code}", show_alert=True)
-    except Exception as e:
-        bot.answer_callback_query(call.id, f"Прокси не работает: {e}", show_alert=True)
+    ok, error_msg = await credential_validator.check_proxy(config_service.settings.PROXY_URL)
+    await bot.answer_callback_query(call.id, "Прокси рабочий ✅" if ok else error_msg, show_alert=True)
 
 # --- ПРОКСИ КОМАНДЫ ---
 @bot.message_handler(commands=["setproxy"])
-def set_proxy_command(message):
+async def set_proxy_command(message):
     if message.from_user.id != ADMIN_ID:
-        bot.send_message(message.chat.id, "Доступ запрещён.")
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
         return
     set_user_state(message.from_user.id, "waiting_for_proxy_url")
-    bot.send_message(message.chat.id, "🔌 <b>Установка прокси</b>\n\nОтправьте прокси в формате:\n<code>http(s)://[login:password@]host:port</code>", parse_mode="HTML")
+    await bot.send_message(message.chat.id, "🔌 <b>Установка прокси</b>\n\nОтправьте прокси в формате:\n<code>http(s)://[login:password@]host:port</code>", parse_mode="HTML")
 
 @bot.message_handler(commands=["unsetproxy"])
-def unset_proxy_command(message):
+async def unset_proxy_command(message):
     if message.from_user.id != ADMIN_ID:
-        bot.send_message(message.chat.id, "Доступ запрещён.")
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
         return
-    import telebot.apihelper
-    telebot.apihelper.proxy = None
     os.environ.pop("PROXY_URL", None)
     os.environ.pop("PROXY_LOGIN", None)
     os.environ.pop("PROXY_PASSWORD", None)
-    global PROXY_URL, PROXY_LOGIN, PROXY_PASSWORD
-    PROXY_URL = ""
-    PROXY_LOGIN = ""
-    PROXY_PASSWORD = ""
-    update_proxy_in_config("", "", "")
-    bot.send_message(message.chat.id, "❌ Прокси сброшен! Рекомендуется перезапустить бота.")
-
-@bot.message_handler(func=lambda message: get_user_state(message.from_user.id)["state"] == "waiting_for_proxy_url")
-def process_proxy_url(message):
+    config_service.update(PROXY_URL="", PROXY_LOGIN="", PROXY_PASSWORD="")
+    await bot.send_message(message.chat.id, "❌ Прокси сброшен!")
+
+@state_handler("waiting_for_proxy_url")
+async def process_proxy_url(message):
     if message.from_user.id != ADMIN_ID:
-        bot.send_message(message.chat.id, "Доступ запрещён.")
+        await bot.send_message(message.chat.id, "Доступ запрещён.")
         return
-    import telebot.apihelper
     url = message.text.strip()
     try:
         if "://" not in url:
-            bot.send_message(message.chat.id, "Ошибка: укажите протокол (http:// или https://) в начале строки прокси!")
+            await bot.send_message(message.chat.id, "Ошибка: укажите протокол (http:// или https://) в начале строки прокси!")
             return
         os.environ["PROXY_URL"] = url
         scheme, rest = url.split("://", 1)
@@ -533,38 +577,31 @@ def process_proxy_url(message):
             os.environ["PROXY_LOGIN"] = ""
             os.environ["PROXY_PASSWORD"] = ""
             proxy_url_auth = url
-        telebot.apihelper.proxy = {
-            "http": proxy_url_auth,
-            "https": proxy_url_auth,
-        }
-        global PROXY_URL, PROXY_LOGIN, PROXY_PASSWORD
-        PROXY_URL = url
-        PROXY_LOGIN = os.environ.get("PROXY_LOGIN")
-        PROXY_PASSWORD = os.environ.get("PROXY_PASSWORD")
-        update_proxy_in_config(PROXY_URL, PROXY_LOGIN, PROXY_PASSWORD)
-        proxies = {"http": proxy_url_auth, "https": proxy_url_auth}
-        try:
-            r = requests.get("https://api.telegram.org", proxies=proxies, timeout=7)
-            if r.status_code == 200:
-                bot.send_message(message.chat.id, f"Прокси установлен и рабочий ✅\n{proxy_url_auth}\nРекомендуется перезапустить бота для применения прокси во всех потоках.")
-            else:
-                bot.send_message(message.chat.id, f"Прокси установлен (но не рабочий, код {r.status_code}): {proxy_url_auth}")
-        except Exception as e:
-            bot.send_message(message.chat.id, f"Прокси установлен, но не рабочий: {e}")
+        # Applied to the running bot by configure_proxy() on reload
+        config_service.update(
+            PROXY_URL=url,
+            PROXY_LOGIN=os.environ["PROXY_LOGIN"],
+            PROXY_PASSWORD=os.environ["PROXY_PASSWORD"],
+        )
+        ok, error_msg = await credential_validator.check_proxy(proxy_url_auth)
+        if ok:
+            await bot.send_message(message.chat.id, f"Прокси установлен и рабочий ✅\n{proxy_url_auth}")
+        else:
+            await bot.send_message(message.chat.id, f"Прокси установлен, но не рабочий: {error_msg}\n{proxy_url_auth}")
         clear_user_state(message.from_user.id)
     except Exception as e:
-        bot.send_message(message.chat.id, f"Ошибка установки прокси: {e}")
+        await bot.send_message(message.chat.id, f"Ошибка установки прокси: {e}")
 
 # --- КОНЕЦ ПРОКСИ ---
 
 @bot.callback_query_handler(func=lambda call: call.data == "statistics")
-def statistics_callback(call):
+async def statistics_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
     try:
-        stats = db_bot.get_rental_statistics()
+        stats = stats_service.get()
         
         if stats:
             message = (
@@ -574,8 +611,24 @@ def statistics_callback(call):
                 f"🆓 **Свободных аккаунтов:** `{stats['available_accounts']}`\n"
                 f"⏰ **Общее время аренды:** `{stats['total_hours']}` часов\n"
                 f"🆕 **Новых аренд (24ч):** `{stats['recent_rentals']}`\n\n"
-                f"📈 **Загруженность:** `{(stats['active_rentals'] / stats['total_accounts'] * 100):.1f}%`"
+                f"📈 **Загруженность:** `{stats['utilization']:.1f}%`\n"
+                f"💰 **Выручка (24ч):** `{stats['revenue']:.2f}` ₽"
             )
+            if stats["lots"]:
+                message += "\n\n🏷 **Загрузка лотов (24ч):**\n" + "\n".join(
+                    f"• `{name}`: {rentals} аренд, {hours} ч ({min(hours / 24 * 100, 100):.0f}%), {revenue or 0:.2f} ₽"
+                    for name, rentals, hours, revenue in stats["lots"][:5]
+                )
+            if stats["hourly_revenue"]:
+                message += "\n\n🕐 **Выручка по часам:**\n" + "\n".join(
+                    f"• `{hour[11:]}` — {revenue or 0:.2f} ₽"
+                    for hour, revenue in stats["hourly_revenue"][-6:]
+                )
+            if stats["turnover"]:
+                message += "\n\n🔁 **Оборот аккаунтов (24ч, от окончания аренды до освобождения):**\n" + "\n".join(
+                    f"• `{name}`: {rotations} смен, ср. {max(avg, 0):.0f} с, макс. {max(longest, 0):.0f} с"
+                    for name, rotations, avg, longest in stats["turnover"][:5]
+                )
         else:
             message = "❌ Не удалось получить статистику"
         
@@ -583,7 +636,7 @@ def statistics_callback(call):
         keyboard.add(InlineKeyboardButton("🔄 Обновить", callback_data="statistics"))
         keyboard.add(InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main"))
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             message,
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
@@ -591,16 +644,17 @@ def statistics_callback(call):
             reply_markup=keyboard
         )
     except Exception as e:
-        bot.answer_callback_query(call.id, f"Ошибка: {str(e)}")
+        await bot.answer_callback_query(call.id, f"Ошибка: {str(e)}")
     
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "help_menu")
-def help_menu_callback(call):
+async def help_menu_callback(call):
     help_text = (
         "❓ **Справка по использованию бота:**\n\n"
         "📋 **Мои аккаунты** - просмотр всех ваших арендованных аккаунтов\n"
         "➕ **Добавить аккаунты** - добавление новых аккаунтов в систему\n"
+        "📦 **Массовый импорт** - загрузка zip-архива с maFile и манифестом\n"
         "🔄 **Сменить пароль** - смена пароля для конкретного аккаунта\n"
         "⏹ **Остановить аренду** - досрочное прекращение аренды\n"
         "🤝 **Ручная аренда** - ручное назначение аккаунта пользователю\n"
@@ -623,7 +677,7 @@ def help_menu_callback(call):
     keyboard = InlineKeyboardMarkup()
     keyboard.add(InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main"))
     
-    bot.edit_message_text(
+    await bot.edit_message_text(
         help_text,
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
@@ -631,11 +685,11 @@ def help_menu_callback(call):
         reply_markup=keyboard
     )
     
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "back_to_main")
-def back_to_main_callback(call):
-    bot.edit_message_text(
+async def back_to_main_callback(call):
+    await bot.edit_message_text(
         "🎮 **Steam Rental by Kylichonok**\n\n"
         "Выберите нужную функцию:",
         chat_id=call.message.chat.id,
@@ -643,14 +697,14 @@ def back_to_main_callback(call):
         parse_mode="Markdown",
         reply_markup=get_main_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 
 @bot.message_handler(commands=["start"])
-def start(message):
+async def start(message):
     if message.from_user.id not in whitelisted_users:
         set_user_state(message.from_user.id, "waiting_for_secret_phrase", {})
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "🔐 **Добро пожаловать в Steam Rental by Kylichonok!**\n\n"
             "Для доступа к системе введите секретную фразу:",
@@ -660,14 +714,14 @@ def start(message):
 
     # Получаем статистику для приветствия
     try:
-        stats = db_bot.get_rental_statistics()
+        stats = stats_service.get()
         welcome_stats = ""
         if stats:
             welcome_stats = (
                 f"\n📊 **Статистика системы:**\n"
                 f"• Активных аренд: `{stats['active_rentals']}`\n"
                 f"• Свободных аккаунтов: `{stats['available_accounts']}`\n"
-                f"• Загруженность: `{(stats['active_rentals'] / stats['total_accounts'] * 100):.1f}%`"
+                f"• Загруженность: `{stats['utilization']:.1f}%`"
             )
     except:
         welcome_stats = ""
@@ -688,43 +742,40 @@ def start(message):
         "Выберите нужную функцию:" + welcome_stats
     )
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         welcome_message,
         parse_mode="Markdown",
         reply_markup=get_main_keyboard()
     )
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"] == "waiting_for_secret_phrase"
-)
-def process_secret_phrase(message):
-    if message.text == SECRET_PHRASE:
+@state_handler("waiting_for_secret_phrase")
+async def process_secret_phrase(message):
+    if message.text == config_service.settings.SECRET_PHRASE:
         whitelisted_users.add(message.from_user.id)
+        db_bot.add_authorized_user(message.from_user.id)
         clear_user_state(message.from_user.id)
-        all_accounts = len(db_bot.get_all_accounts())
-        owned_accounts = all_accounts - len(db_bot.get_unowned_accounts())
-        bot.send_message(
+        stats = stats_service.get()
+        all_accounts = stats.get("total_accounts", 0)
+        owned_accounts = stats.get("active_rentals", 0)
+        await bot.send_message(
             message.chat.id,
             f"Добро пожаловать!\nВот статистика на данный момент: {owned_accounts}/{all_accounts}",
             reply_markup=get_main_keyboard(),
         )
     else:
-        bot.send_message(message.chat.id, "Неверная фраза. Попробуйте снова.")
+        await bot.send_message(message.chat.id, "Неверная фраза. Попробуйте снова.")
 
 @bot.callback_query_handler(func=lambda call: call.data == "add_account")
-def process_add_account(call):
+async def process_add_account(call):
     set_user_state(call.from_user.id, "waiting_for_lot_count", {})
-    bot.send_message(call.message.chat.id, "Сколько лотов вы хотите добавить?")
-    bot.answer_callback_query(call.id)
-
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_lot_count"
-)
-def process_lot_count(message):
+    await bot.send_message(call.message.chat.id, "Сколько лотов вы хотите добавить?")
+    await bot.answer_callback_query(call.id)
+
+@state_handler("waiting_for_lot_count")
+async def process_lot_count(message):
     if not message.text.isdigit() or int(message.text) <= 0:
-        bot.send_message(message.chat.id, "Пожалуйста, введите положительное число.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите положительное число.")
         return
 
     lot_count = int(message.text)
@@ -733,20 +784,17 @@ def process_lot_count(message):
         "waiting_for_lot_names",
         {"lot_count": lot_count, "current_lot": 0, "lot_names": []},
     )
-    bot.send_message(message.chat.id, "Введите название для лота 1.")
-
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_lot_names"
-)
-def process_lot_names(message):
-    state_data = get_user_state(message.from_user.id)["data"]
+    await bot.send_message(message.chat.id, "Введите название для лота 1.")
+
+@state_handler("waiting_for_lot_names")
+async def process_lot_names(message):
+    state_data = get_user_state(message.from_user.id).data
     state_data["lot_names"].append(message.text)
     state_data["current_lot"] += 1
 
     if state_data["current_lot"] < state_data["lot_count"]:
         set_user_state(message.from_user.id, "waiting_for_lot_names", state_data)
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Введите название для лота {state_data['current_lot'] + 1}.",
         )
@@ -756,85 +804,125 @@ def process_lot_names(message):
             "waiting_for_count",
             {"lot_names": state_data["lot_names"]},
         )
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, "Сколько аккаунтов вы хотите добавить для каждого лота?"
         )
 
+@bot.callback_query_handler(func=lambda call: call.data == "bulk_import")
+async def bulk_import_callback(call):
+    if call.from_user.id not in whitelisted_users:
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        return
+    set_user_state(call.from_user.id, "waiting_for_import_archive", {})
+    await bot.send_message(
+        call.message.chat.id,
+        "📦 <b>Массовый импорт</b>\n\n"
+        "Отправьте zip-архив с файлами .maFile и манифестом "
+        "<code>manifest.csv</code> или <code>manifest.json</code>.\n\n"
+        "Колонки манифеста: <code>account_name, login, password, duration</code> "
+        "и необязательная <code>mafile</code> (имя файла в архиве). "
+        "Без неё maFile ищется по логину.",
+        parse_mode="HTML",
+    )
+    await bot.answer_callback_query(call.id)
+
+async def process_import_archive(message):
+    if not message.document.file_name.lower().endswith(".zip"):
+        await bot.send_message(message.chat.id, "Пожалуйста, загрузите zip-архив.")
+        return
+    clear_user_state(message.from_user.id)
+    status = await bot.send_message(message.chat.id, "⏳ Загрузка архива...")
+    run_in_background(import_archive_job(status, message.document.file_id))
+
+def import_archive(archive):
+    # Own connection: the import transaction must not share commits and
+    # rollbacks with handler writes on db_bot
+    db = SQLiteDB()
+    try:
+        return import_accounts(io.BytesIO(archive), db, SAVE_DIR)
+    finally:
+        db.close()
+
+async def import_archive_job(status, file_id):
+    try:
+        file_info = await bot.get_file(file_id)
+        archive = await bot.download_file(file_info.file_path)
+        await edit_progress(status, "⏳ Проверка и импорт аккаунтов...")
+        summary = await asyncio.to_thread(import_archive, archive)
+        await edit_progress(status, summary.to_message())
+    except Exception as e:
+        logger.error(f"Bulk import failed: {str(e)}")
+        await edit_progress(status, f"❌ Ошибка импорта: {str(e)}")
+
 @bot.callback_query_handler(func=lambda call: call.data == "delete_account")
-def process_delete_account(call):
+async def process_delete_account(call):
     set_user_state(call.from_user.id, "waiting_for_account_id", {})
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id, "Введите ID аккаунта, который вы хотите удалить."
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "change_password")
-def process_change_password(call):
+async def process_change_password(call):
     set_user_state(call.from_user.id, "waiting_for_change_password_id", {})
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id,
         "Введите ID аккаунта, для которого вы хотите сменить пароль.",
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "stop_rent")
-def process_stop_rent(call):
+async def process_stop_rent(call):
     set_user_state(call.from_user.id, "waiting_for_stop_rent_id", {})
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id,
         "Введите ID аккаунта, аренду которого вы хотите остановить.",
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "manual_rent")
-def manual_rent_callback(call):
+async def manual_rent_callback(call):
     set_user_state(call.from_user.id, "waiting_for_manual_rent_id", {})
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id, "Введите ID аккаунта, который вы хотите арендовать."
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "extend_rental")
-def extend_rental_callback(call):
+async def extend_rental_callback(call):
     set_user_state(call.from_user.id, "waiting_for_extend_rental_id", {})
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id, "Введите ID аккаунта, аренду которого вы хотите продлить."
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_owner_name"
-)
-def process_owner_name(message):
+@state_handler("waiting_for_owner_name")
+async def process_owner_name(message):
     owner_name = message.text
     state_data = {"owner_name": owner_name}
     set_user_state(message.from_user.id, "waiting_for_hours_to_add", state_data)
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         f"Введите количество часов, которые вы хотите добавить для {owner_name}.",
     )
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_hours_to_add"
-)
-def process_hours_to_add(message):
+@state_handler("waiting_for_hours_to_add")
+async def process_hours_to_add(message):
     if not message.text.isdigit() or int(message.text) <= 0:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, "Пожалуйста, введите положительное число часов."
         )
         return
 
     hours_to_add = int(message.text)
-    state_data = get_user_state(message.from_user.id)["data"]
+    state_data = get_user_state(message.from_user.id).data
     owner_name = state_data["owner_name"]
 
     try:
         if db_bot.add_time_to_owner_accounts(
             owner_name, -hours_to_add
         ):
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Успешно добавлено {hours_to_add} часов для всех аккаунтов владельца '{owner_name}'.",
             )
@@ -847,46 +935,40 @@ def process_hours_to_add(message):
                 ),
             )
         else:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Не удалось найти аккаунты для владельца '{owner_name}' или добавить часы.",
             )
     except Exception as e:
-        bot.send_message(message.chat.id, f"Ошибка при добавлении часов: {str(e)}")
+        await bot.send_message(message.chat.id, f"Ошибка при добавлении часов: {str(e)}")
     finally:
         clear_user_state(message.from_user.id)
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_count"
-)
-def process_count(message):
+@state_handler("waiting_for_count")
+async def process_count(message):
     if not message.text.isdigit() or int(message.text) <= 0:
-        bot.send_message(message.chat.id, "Пожалуйста, введите положительное число.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите положительное число.")
         return
 
     count = int(message.text)
-    state_data = get_user_state(message.from_user.id)["data"]
+    state_data = get_user_state(message.from_user.id).data
     state_data.update({"total_count": count, "current_lot": 0, "lot_durations": {}})
     set_user_state(message.from_user.id, "waiting_for_lot_duration", state_data)
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         f"На сколько часов будет сдаваться лот \n```{state_data['lot_names'][0]}```",
         parse_mode="Markdown",
     )
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_lot_duration"
-)
-def process_lot_duration(message):
+@state_handler("waiting_for_lot_duration")
+async def process_lot_duration(message):
     if not message.text.isdigit() or int(message.text) <= 0:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, "Пожалуйста, введите положительное число часов."
         )
         return
 
-    state_data = get_user_state(message.from_user.id)["data"]
+    state_data = get_user_state(message.from_user.id).data
     current_lot = state_data["current_lot"]
     lot_name = state_data["lot_names"][current_lot]
     state_data["lot_durations"][lot_name] = int(message.text)
@@ -894,7 +976,7 @@ def process_lot_duration(message):
     if current_lot + 1 < len(state_data["lot_names"]):
         state_data["current_lot"] += 1
         set_user_state(message.from_user.id, "waiting_for_lot_duration", state_data)
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"На сколько часов будет сдаваться лот \n```{state_data['lot_names'][current_lot + 1]}```",
             parse_mode="Markdown",
@@ -902,23 +984,26 @@ def process_lot_duration(message):
     else:
         state_data["current_count"] = 0
         set_user_state(message.from_user.id, "waiting_for_mafile", state_data)
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, "Пожалуйста, загрузите .maFile для аккаунта 1."
         )
 
 @bot.message_handler(content_types=["document"])
-def process_mafile(message):
+async def process_mafile(message):
     state = get_user_state(message.from_user.id)
-    if state["state"] != "waiting_for_mafile":
+    if state.state == "waiting_for_import_archive":
+        await process_import_archive(message)
+        return
+    if state.state != "waiting_for_mafile":
         return
 
     if not message.document.file_name.endswith(".maFile"):
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, "Пожалуйста, загрузите валидный .maFile файл."
         )
         return
 
-    state_data = state["data"]
+    state_data = state.data
     current_count = state_data["current_count"]
 
     try:
@@ -928,8 +1013,8 @@ def process_mafile(message):
         if os.path.exists(file_path):
             os.remove(file_path)
 
-        file_info = bot.get_file(message.document.file_id)
-        downloaded_file = bot.download_file(file_info.file_path)
+        file_info = await bot.get_file(message.document.file_id)
+        downloaded_file = await bot.download_file(file_info.file_path)
         with open(file_path, "wb") as f:
             f.write(downloaded_file)
 
@@ -937,93 +1022,91 @@ def process_mafile(message):
         state_data["mafile_path"] = relative_path
 
         set_user_state(message.from_user.id, "waiting_for_login", state_data)
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, "Ваш .maFile сохранен. Теперь отправьте логин."
         )
     except Exception as e:
-        bot.send_message(message.chat.id, f"Ошибка при сохранении файла: {str(e)}")
-
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_login"
-)
-def process_login(message):
-    state_data = get_user_state(message.from_user.id)["data"]
+        await bot.send_message(message.chat.id, f"Ошибка при сохранении файла: {str(e)}")
+
+@state_handler("waiting_for_login")
+async def process_login(message):
+    state_data = get_user_state(message.from_user.id).data
     state_data["login"] = message.text
     set_user_state(message.from_user.id, "waiting_for_password", state_data)
-    bot.send_message(message.chat.id, "Логин сохранен. Теперь отправьте пароль.")
-
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_password"
-)
-def process_password(message):
-    state_data = get_user_state(message.from_user.id)["data"]
+    await bot.send_message(message.chat.id, "Логин сохранен. Теперь отправьте пароль.")
+
+@state_handler("waiting_for_password")
+async def process_password(message):
+    state_data = get_user_state(message.from_user.id).data
     current_count = state_data.get("current_count", 0)
 
-    for lot_name in state_data["lot_names"]:
-        db_bot.add_account(
-            account_name=lot_name,
-            path_to_maFile=state_data["mafile_path"],
-            login=state_data["login"],
-            password=message.text,
-            duration=state_data["lot_durations"][lot_name],
-        )
+    db_bot.add_accounts_bulk(
+        [
+            (
+                lot_name,
+                state_data["mafile_path"],
+                state_data["login"],
+                message.text,
+                state_data["lot_durations"][lot_name],
+            )
+            for lot_name in state_data["lot_names"]
+        ]
+    )
 
     current_count += 1
     if current_count < state_data["total_count"]:
         state_data["current_count"] = current_count
         set_user_state(message.from_user.id, "waiting_for_mafile", state_data)
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Пожалуйста, загрузите .maFile для аккаунта {current_count + 1}.",
         )
     else:
         clear_user_state(message.from_user.id)
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Все {state_data['total_count']} аккаунтов успешно добавлены! Настройка завершена.",
         )
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_account_id"
-)
-def delete_account_by_id_handler(message):
+@state_handler("waiting_for_account_id")
+async def delete_account_by_id_handler(message):
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
         return
 
     account_id = int(message.text)
     if db_bot.delete_account_by_id(account_id):
-        bot.send_message(message.chat.id, f"Аккаунт с ID {account_id} успешно удален.")
+        await bot.send_message(message.chat.id, f"Аккаунт с ID {account_id} успешно удален.")
     else:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id, f"Не удалось найти или удалить аккаунт с ID {account_id}."
         )
 
     clear_user_state(message.from_user.id)
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_change_password_id"
-)
-def change_password_by_id_handler(message):
+@state_handler("waiting_for_change_password_id")
+async def change_password_by_id_handler(message):
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
         return
 
     account_id = int(message.text)
-    bot.send_message(
+    clear_user_state(message.from_user.id)
+    status = await bot.send_message(
         message.chat.id, f"🔐 Изменение пароля для аккаунта с ID {account_id}..."
     )
+    # The Steam flow takes a while, don't hold up other updates
+    # Protected, shutdown waits for a started password change to finish
+    supervisor.protect(change_password_job(status, account_id))
+
+async def change_password_job(status, account_id):
     conn = sqlite3.connect("database.db")
     cursor = conn.cursor()
 
     try:
         cursor.execute(
             """
-            SELECT path_to_maFile, password
+            SELECT login, path_to_maFile, password
             FROM accounts
             WHERE ID = ?
             """,
@@ -1031,53 +1114,41 @@ def change_password_by_id_handler(message):
         )
         account = cursor.fetchone()
 
-        if not account:
-            bot.send_message(message.chat.id, f"Аккаунт с ID {account_id} не найден.")
+        if account is None:
+            await edit_progress(status, f"Аккаунт с ID {account_id} не найден.")
             return
 
+        login, path_to_maFile, current_password = account
+        await edit_progress(
+            status, f"⏳ Смена пароля в Steam для аккаунта '{login}' (ID {account_id})..."
+        )
+        new_password = await changeSteamPassword(path_to_maFile, current_password)
+
+        await edit_progress(status, f"💾 Сохранение нового пароля для '{login}'...")
         cursor.execute(
             """
-            SELECT login, path_to_maFile, password
-            FROM accounts
-            WHERE ID = ?
+            UPDATE accounts
+            SET password = ?
+            WHERE login = ?
             """,
-            (account_id,),
+            (new_password, login),
         )
-        account = cursor.fetchone()
+        conn.commit()
 
-        if account is None:
-            bot.send_message(message.chat.id, f"Аккаунт с ID {account_id} не найден.")
-        else:
-            login, path_to_maFile, current_password = account
-            new_password = asyncio.run(
-                changeSteamPassword(path_to_maFile, current_password)
-            )
-
-            cursor.execute(
-                """
-                UPDATE accounts
-                SET password = ?
-                WHERE login = ?
-                """,
-                (new_password, login),
-            )
-            conn.commit()
-
-            bot.send_message(
-                message.chat.id,
-                f"Пароль для всех аккаунтов с логином '{login}' успешно изменен на {new_password}.",
-            )
+        await edit_progress(
+            status,
+            f"Пароль для всех аккаунтов с логином '{login}' успешно изменен на {new_password}.",
+        )
+    except Exception as e:
+        logger.error(f"Error changing password for account {account_id}: {str(e)}")
+        await edit_progress(status, f"❌ Ошибка при смене пароля: {str(e)}")
     finally:
         conn.close()
-        clear_user_state(message.from_user.id)
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_stop_rent_id"
-)
-def stop_rent_by_id_handler(message):
+@state_handler("waiting_for_stop_rent_id")
+async def stop_rent_by_id_handler(message):
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
         return
 
     account_id = int(message.text)
@@ -1096,7 +1167,7 @@ def stop_rent_by_id_handler(message):
         result = cursor.fetchone()
 
         if not result:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Аккаунт с ID {account_id} не найден.",
             )
@@ -1115,48 +1186,42 @@ def stop_rent_by_id_handler(message):
 
         if cursor.rowcount > 0:
             conn.commit()
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Аренда всех аккаунтов с логином '{login}' успешно остановлена.",
             )
         else:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Аккаунты с логином '{login}' не найдены или аренда уже остановлена.",
             )
     except Exception as e:
-        bot.send_message(message.chat.id, f"Ошибка при остановке аренды: {str(e)}")
+        await bot.send_message(message.chat.id, f"Ошибка при остановке аренды: {str(e)}")
     finally:
         conn.close()
         clear_user_state(message.from_user.id)
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_manual_rent_id"
-)
-def process_manual_rent_id(message):
+@state_handler("waiting_for_manual_rent_id")
+async def process_manual_rent_id(message):
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
         return
 
     account_id = int(message.text)
     state_data = {"account_id": account_id}
     set_user_state(message.from_user.id, "waiting_for_manual_rent_owner", state_data)
-    bot.send_message(message.chat.id, "Введите никнейм владельца для аренды.")
-
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_manual_rent_owner"
-)
-def process_manual_rent_owner(message):
-    state_data = get_user_state(message.from_user.id)["data"]
+    await bot.send_message(message.chat.id, "Введите никнейм владельца для аренды.")
+
+@state_handler("waiting_for_manual_rent_owner")
+async def process_manual_rent_owner(message):
+    state_data = get_user_state(message.from_user.id).data
     account_id = state_data["account_id"]
     owner_nickname = message.text
 
     try:
         if db_bot.set_account_owner(account_id, owner_nickname):
             account = db_bot.get_account_by_id(account_id)
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Аккаунт с ID {account_id} успешно передан в аренду пользователю '{owner_nickname}'.",
             )
@@ -1171,52 +1236,46 @@ def process_manual_rent_owner(message):
                     f"Пароль: {account['password']}\n\n"
                     f"Что-бы запросить код подтверждения, отправьте /code\n"
                     f"Чтобы задать вопрос, отправьте /question\n\n"
-                    f"‼️За отзыв - вы получите дополнительные {HOURS_FOR_REVIEW} час/часа аренды.\n"
+                    f"‼️За отзыв - вы получите дополнительные {config_service.settings.HOURS_FOR_REVIEW} час/часа аренды.\n"
                     f"‼️ВАЖНО! Отзыв надо оставить до окончания вашей аренды.‼️\n\n"
                     f"------------------------------------------------------------------------------"
                 ),
             )
         else:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Не удалось найти аккаунт с ID {account_id} или установить владельца.",
             )
     except Exception as e:
-        bot.send_message(message.chat.id, f"Ошибка при установке владельца: {str(e)}")
+        await bot.send_message(message.chat.id, f"Ошибка при установке владельца: {str(e)}")
     finally:
         clear_user_state(message.from_user.id)
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_extend_rental_id"
-)
-def process_extend_rental_id(message):
+@state_handler("waiting_for_extend_rental_id")
+async def process_extend_rental_id(message):
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите валидный числовой ID.")
         return
 
     account_id = int(message.text)
     state_data = {"account_id": account_id}
     set_user_state(message.from_user.id, "waiting_for_extend_rental_duration", state_data)
-    bot.send_message(message.chat.id, "На сколько часов вы хотите продлить аренду?")
+    await bot.send_message(message.chat.id, "На сколько часов вы хотите продлить аренду?")
 
-@bot.message_handler(
-    func=lambda message: get_user_state(message.from_user.id)["state"]
-    == "waiting_for_extend_rental_duration"
-)
-def process_extend_rental_duration(message):
+@state_handler("waiting_for_extend_rental_duration")
+async def process_extend_rental_duration(message):
     if not message.text.isdigit() or int(message.text) <= 0:
-        bot.send_message(message.chat.id, "Пожалуйста, введите положительное число часов.")
+        await bot.send_message(message.chat.id, "Пожалуйста, введите положительное число часов.")
         return
 
-    state_data = get_user_state(message.from_user.id)["data"]
+    state_data = get_user_state(message.from_user.id).data
     account_id = state_data["account_id"]
     duration_to_add = int(message.text)
 
     try:
         if db_bot.extend_rental_duration(account_id, duration_to_add):
             account = db_bot.get_account_by_id(account_id)
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"‼️Аренда аккаунта с ID {account_id} успешно продлена на {duration_to_add} часов.\n"
                 f"‼️Новый срок аренды: {account['rental_duration']} часов.\n"
@@ -1231,25 +1290,31 @@ def process_extend_rental_duration(message):
                 )
             )
         else:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"Не удалось найти аккаунт с ID {account_id} или продлить аренду.",
             )
     except Exception as e:
-        bot.send_message(message.chat.id, f"Ошибка при продлении аренды: {str(e)}")
+        await bot.send_message(message.chat.id, f"Ошибка при продлении аренды: {str(e)}")
     finally:
         clear_user_state(message.from_user.id)
 
-def send_message_to_admin(message):
-    bot.send_message(ADMIN_ID, message)
+def send_message_to_admin(message, kind=None):
+    """
+    Queue a message for the admin. Thread-safe and non-blocking.
+
+    Messages of the same kind (see notifications.DIGEST_TITLES) sent in a burst
+    are delivered as one digest.
+    """
+    admin_notifications.notify(message, kind)
 
 @bot.callback_query_handler(func=lambda call: call.data == "system_settings")
-def system_settings_callback(call):
+async def system_settings_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
-    bot.edit_message_text(
+    await bot.edit_message_text(
         "⚙️ **Настройки системы:**\n\n"
         "Выберите параметр для настройки:",
         chat_id=call.message.chat.id,
@@ -1257,15 +1322,15 @@ def system_settings_callback(call):
         parse_mode="Markdown",
         reply_markup=get_system_settings_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "notification_settings")
-def notification_settings_callback(call):
+async def notification_settings_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
-    bot.edit_message_text(
+    await bot.edit_message_text(
         "📱 **Настройки уведомлений:**\n\n"
         "Выберите тип уведомлений для настройки:",
         chat_id=call.message.chat.id,
@@ -1273,39 +1338,40 @@ def notification_settings_callback(call):
         parse_mode="Markdown",
         reply_markup=get_notification_settings_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "proxy_status")
-def proxy_status_callback(call):
+async def proxy_status_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
-    proxy_status = "✅ **Активен**" if PROXY_URL else "❌ **Не настроен**"
+    settings = config_service.settings
+    proxy_status = "✅ **Активен**" if settings.PROXY_URL else "❌ **Не настроен**"
     proxy_info = f"🔌 **Прокси:** {proxy_status}\n"
     
-    if PROXY_URL:
-        proxy_info += f"🌐 **URL:** `{PROXY_URL}`\n"
-        if PROXY_LOGIN:
-            proxy_info += f"👤 **Логин:** `{PROXY_LOGIN}`\n"
+    if settings.PROXY_URL:
+        proxy_info += f"🌐 **URL:** `{settings.PROXY_URL}`\n"
+        if settings.PROXY_LOGIN:
+            proxy_info += f"👤 **Логин:** `{settings.PROXY_LOGIN}`\n"
     
-    bot.edit_message_text(
+    await bot.edit_message_text(
         f"📊 **Статус прокси:**\n\n{proxy_info}",
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         parse_mode="Markdown",
         reply_markup=get_proxy_keyboard()
     )
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "database_settings")
-def database_settings_callback(call):
+async def database_settings_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
     try:
-        stats = db_bot.get_rental_statistics()
+        stats = stats_service.get()
         db_info = (
             "🗄️ **Информация о базе данных:**\n\n"
             f"📊 **Размер:** `{stats.get('total_accounts', 0)}` записей\n"
@@ -1322,7 +1388,7 @@ def database_settings_callback(call):
         keyboard.add(InlineKeyboardButton("🧹 Очистка", callback_data="db_cleanup"))
         keyboard.add(InlineKeyboardButton("⬅️ Назад", callback_data="system_settings"))
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             db_info,
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
@@ -1330,28 +1396,36 @@ def database_settings_callback(call):
             reply_markup=keyboard
         )
     except Exception as e:
-        bot.answer_callback_query(call.id, f"Ошибка: {str(e)}")
+        await bot.answer_callback_query(call.id, f"Ошибка: {str(e)}")
     
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
 @bot.callback_query_handler(func=lambda call: call.data == "auto_refresh_toggle")
-def auto_refresh_toggle_callback(call):
+async def auto_refresh_toggle_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
-    bot.answer_callback_query(call.id, "Функция в разработке")
+    await bot.answer_callback_query(call.id, "Функция в разработке")
 
 @bot.callback_query_handler(func=lambda call: call.data == "timeout_settings")
-def timeout_settings_callback(call):
+async def timeout_settings_callback(call):
     if call.from_user.id not in whitelisted_users:
-        bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
+        await bot.answer_callback_query(call.id, "У вас нет доступа к этой функции")
         return
     
-    bot.answer_callback_query(call.id, "Функция в разработке")
+    await bot.answer_callback_query(call.id, "Функция в разработке")
+
+# Registered last so that commands take precedence over flow input
+@bot.message_handler(func=lambda message: get_user_state(message.from_user.id).state in STATE_HANDLERS)
+async def dispatch_user_state(message):
+    handler = STATE_HANDLERS[get_user_state(message.from_user.id).state]
+    await handler(message)
 
-def main():
-    bot.infinity_polling(none_stop=True, timeout=5)
+async def run_bot():
+    """Telegram polling, runs as a supervisor component (see main.py)."""
+    await bot.set_my_commands(BOT_COMMANDS)
+    await bot.infinity_polling(timeout=5)
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+async def close_bot():
+    await bot.close_session()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+import os
+import zipfile
+
+from logger import logger
+
+
+# Keys of a maFile the rental flow relies on (Steam Guard codes, password change)
+REQUIRED_MAFILE_KEYS = ("account_name", "shared_secret", "identity_secret", "device_id")
+MANIFEST_NAMES = ("manifest.csv", "manifest.json")
+# Errors listed in the summary message, the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportSummary:
+    __slots__ = ("added", "errors")
+
+    def __init__(self):
+        self.added = 0
+        # (manifest row number, account name, reason)
+        self.errors = []
+
+    def to_message(self):
+        lines = [
+            "📦 Импорт завершён\n",
+            f"✅ Добавлено: {self.added}",
+            f"⏭ Пропущено: {len(self.errors)}",
+        ]
+        if self.errors:
+            lines.append("")
+            for row, name, reason in self.errors[:MAX_REPORTED_ERRORS]:
+                if row is None:
+                    lines.append(f"• {reason}")
+                else:
+                    lines.append(f"• строка {row} ({name or '—'}): {reason}")
+            if len(self.errors) > MAX_REPORTED_ERRORS:
+                lines.append(f"… и ещё {len(self.errors) - MAX_REPORTED_ERRORS}")
+        return "\n".join(lines)
+
+
+def iter_manifest(archive):
+    """
+    Yield manifest rows of the archive as dicts, streaming CSV line by line.
+
+    The manifest is manifest.csv or manifest.json (a list of objects) with the
+    columns account_name, login, password, duration and optional mafile.
+    """
+    members = {os.path.basename(name).lower(): name for name in archive.namelist()}
+    for manifest_name in MANIFEST_NAMES:
+        if manifest_name in members:
+            break
+    else:
+        raise ValueError("В архиве нет manifest.csv или manifest.json")
+
+    with archive.open(members[manifest_name]) as f:
+        if manifest_name.endswith(".csv"):
+            yield from csv.DictReader(io.TextIOWrapper(f, encoding="utf-8-sig"))
+        else:
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError("manifest.json должен содержать список аккаунтов")
+            yield from rows
+
+
+def validate_mafile(data, login):
+    """Return the reason a maFile can't be used for the login, or None."""
+    if not isinstance(data, dict):
+        return "maFile не является JSON-объектом"
+    missing = [key for key in REQUIRED_MAFILE_KEYS if not data.get(key)]
+    if missing:
+        return f"в maFile нет полей: {', '.join(missing)}"
+    try:
+        int(data["Session"]["SteamID"])
+    except (KeyError, TypeError, ValueError):
+        return "в maFile нет Session.SteamID"
+    if data["account_name"].lower() != login.lower():
+        return f"maFile принадлежит {data['account_name']}"
+    return None
+
+
+class MaFileIndex:
+    """Finds maFiles of an archive by file name or by the account name inside."""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.by_name = {
+            os.path.basename(name).lower(): name
+            for name in archive.namelist()
+            if name.lower().endswith(".mafile")
+        }
+        self._by_account = None
+
+    def load(self, member):
+        """
+        Raw bytes and parsed content of a maFile (None if it is not valid JSON).
+        Not cached to keep memory flat on large archives.
+        """
+        raw = self.archive.read(member)
+        try:
+            return raw, json.loads(raw)
+        except ValueError:
+            return raw, None
+
+    def find(self, login, file_name=None):
+        """Member name of the maFile for a manifest row, None if not found."""
+        if file_name:
+            return self.by_name.get(os.path.basename(file_name).lower())
+        member = self.by_name.get(f"{login.lower()}.mafile")
+        if member:
+            return member
+        # SDA names maFiles by SteamID, fall back to the account name inside
+        if self._by_account is None:
+            self._by_account = {}
+            for member in self.by_name.values():
+                data = self.load(member)[1]
+                if isinstance(data, dict) and data.get("account_name"):
+                    self._by_account[data["account_name"].lower()] = member
+        return self._by_account.get(login.lower())
+
+
+def import_accounts(archive_file, db, save_dir):
+    """
+    Import accounts from a zip of maFiles plus a manifest.
+
+    Rows are validated as they are read (required fields, maFile schema,
+    duplicate account names and logins against the manifest and the database),
+    referenced maFiles are saved to save_dir and all valid rows are inserted
+    with one executemany transaction.
+
+    Args:
+        archive_file: Path or binary file object of the zip archive
+        db (SQLiteDB): Database to insert into
+        save_dir (str): Directory the maFiles are saved to
+
+    Returns:
+        ImportSummary: Number of added accounts and the skipped rows with reasons
+    """
+    summary = ImportSummary()
+    existing_names = set(db.get_all_account_names())
+    existing_logins = {login.lower() for login in db.get_all_logins()}
+    # login -> (password, maFile member) of rows accepted from this manifest
+    manifest_logins = {}
+    saved_mafiles = {}
+    rows = []
+    relative_dir = os.path.relpath(save_dir, start=os.getcwd())
+
+    with zipfile.ZipFile(archive_file) as archive:
+        mafiles = MaFileIndex(archive)
+        for row_number, row in enumerate(iter_manifest(archive), start=1):
+            if not isinstance(row, dict):
+                summary.errors.append((row_number, None, "строка манифеста не является объектом"))
+                continue
+            name = str(row.get("account_name") or "").strip()
+            login = str(row.get("login") or "").strip()
+            password = str(row.get("password") or "").strip()
+            duration = str(row.get("duration") or "").strip()
+
+            if not (name and login and password and duration):
+                summary.errors.append((row_number, name, "не заполнены account_name, login, password или duration"))
+                continue
+            if not duration.isdigit() or int(duration) <= 0:
+                summary.errors.append((row_number, name, "duration должен быть положительным числом"))
+                continue
+            if name in existing_names:
+                summary.errors.append((row_number, name, "аккаунт с таким названием уже есть"))
+                continue
+            if login.lower() in existing_logins:
+                summary.errors.append((row_number, name, f"логин {login} уже есть в базе"))
+                continue
+
+            member = mafiles.find(login, row.get("mafile"))
+            if member is None:
+                summary.errors.append((row_number, name, "maFile не найден в архиве"))
+                continue
+            previous = manifest_logins.get(login.lower())
+            if previous is not None and previous != (password, member):
+                summary.errors.append((row_number, name, f"логин {login} повторяется с другим паролем или maFile"))
+                continue
+            if previous is None:
+                raw, data = mafiles.load(member)
+                reason = validate_mafile(data, login)
+                if reason:
+                    summary.errors.append((row_number, name, reason))
+                    continue
+                manifest_logins[login.lower()] = (password, member)
+
+            if member not in saved_mafiles:
+                file_name = os.path.basename(member)
+                with open(os.path.join(save_dir, file_name), "wb") as f:
+                    f.write(raw)
+                saved_mafiles[member] = os.path.join(relative_dir, file_name)
+
+            existing_names.add(name)
+            rows.append((name, saved_mafiles[member], login, password, int(duration)))
+
+    summary.added = db.add_accounts_bulk(rows)
+    if summary.added < len(rows):
+        summary.errors.append((None, None, f"{len(rows) - summary.added} строк не добавлено базой данных"))
+    logger.info(f"Bulk import: {summary.added} accounts added, {len(summary.errors)} rows skipped.")
+    return summary
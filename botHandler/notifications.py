@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from logger import logger
+
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+# Digest headers for notification kinds that are coalesced during bursts
+DIGEST_TITLES = {
+    "expiry_warning": "⚠️ Предупреждений об истечении",
+    "rental_expired": "⏰ Аренд истекло",
+    "rental_extended": "⏳ Аренд продлено",
+    "account_issued": "🆕 Аккаунтов выдано",
+}
+
+
+class Notification:
+    __slots__ = ("text", "kind", "created")
+
+    def __init__(self, text, kind=None):
+        self.text = text
+        self.kind = kind
+        self.created = time.monotonic()
+
+
+class NotificationQueue:
+    """
+    Queue of outgoing admin notifications delivered by a background sender.
+
+    notify() is thread-safe and never blocks, so the FunPay thread does not
+    wait on Telegram. The sender collects a burst for batch_window seconds,
+    merges notifications of the same kind into one digest message and keeps
+    at least min_interval seconds between sends, backing off on HTTP 429.
+    """
+
+    def __init__(self, send, chat_id, min_interval=1.0, batch_window=2.0, max_retries=3):
+        """
+        Args:
+            send: Coroutine function with the signature of bot.send_message
+            chat_id: Chat the notifications are delivered to
+            min_interval (float): Minimum pause between two sent messages, seconds
+            batch_window (float): How long to collect a burst before sending, seconds
+            max_retries (int): Attempts per message before it is dropped
+        """
+        self.send = send
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._last_sent = 0.0
+
+        self.delivered = 0
+        self.dropped = 0
+        self.messages_sent = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def notify(self, text, kind=None):
+        """Enqueue a notification. Safe to call from any thread."""
+        with self._lock:
+            self._pending.append(Notification(text, kind))
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def get_metrics(self):
+        """Delivery counters and latency (enqueue to send) in seconds."""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "messages_sent": self.messages_sent,
+            "avg_latency": self.total_latency / self.delivered if self.delivered else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+    async def run(self):
+        """Sender loop, runs on the bot event loop until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        # Deliver whatever was queued before the bot started
+        if self._pending:
+            self._wakeup.set()
+
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(self.batch_window)
+
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                continue
+
+            for text, notifications in self._coalesce(batch):
+                await self._deliver(text, notifications)
+
+            metrics = self.get_metrics()
+            logger.debug(
+                f"Admin notifications: {len(batch)} delivered in batch, "
+                f"avg latency {metrics['avg_latency']:.2f}s, max {metrics['max_latency']:.2f}s"
+            )
+
+    def _coalesce(self, batch):
+        """Group a batch into (text, notifications) messages, merging same-kind bursts."""
+        groups = {}
+        messages = []
+        for notification in batch:
+            if notification.kind in DIGEST_TITLES:
+                if notification.kind not in groups:
+                    groups[notification.kind] = []
+                    # Keep the position of the first notification of the kind
+                    messages.append(groups[notification.kind])
+                groups[notification.kind].append(notification)
+            else:
+                messages.append([notification])
+
+        for notifications in messages:
+            if len(notifications) == 1:
+                yield notifications[0].text[:MAX_MESSAGE_LENGTH], notifications
+                continue
+            header = f"{DIGEST_TITLES[notifications[0].kind]}: {len(notifications)}"
+            for chunk in self._split_digest(header, [n.text for n in notifications]):
+                yield chunk, notifications
+
+    @staticmethod
+    def _split_digest(header, texts):
+        """Join texts under a header, splitting into several messages over the length limit."""
+        separator = "\n\n━━━━━━━━━━━━━━━━━━━━\n\n"
+        # A single text longer than that is cut, so every chunk fits
+        max_text_length = MAX_MESSAGE_LENGTH - len(header) - len(separator)
+        chunk = header
+        for text in texts:
+            text = text[:max_text_length]
+            if len(chunk) + len(separator) + len(text) > MAX_MESSAGE_LENGTH:
+                yield chunk
+                chunk = header
+            chunk += separator + text
+        yield chunk
+
+    async def _deliver(self, text, notifications):
+        for attempt in range(self.max_retries):
+            delay = self._last_sent + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.send(self.chat_id, text)
+            except Exception as e:
+                self._last_sent = time.monotonic()
+                retry_after = self._retry_after(e)
+                logger.error(
+                    f"Failed to send admin notification (attempt {attempt + 1}): {str(e)}"
+                )
+                if retry_after:
+                    await asyncio.sleep(retry_after)
+                continue
+
+            self._last_sent = time.monotonic()
+            self.messages_sent += 1
+            # A digest split in several chunks counts its notifications once
+            for notification in notifications:
+                if notification.created is None:
+                    continue
+                latency = self._last_sent - notification.created
+                notification.created = None
+                self.delivered += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+            return
+
+        self.dropped += sum(1 for n in notifications if n.created is not None)
+
+    @staticmethod
+    def _retry_after(error):
+        """Seconds Telegram asked to wait for a 429 response, or None."""
+        if getattr(error, "error_code", None) != 429:
+            return None
+        result = getattr(error, "result_json", None) or {}
+        return result.get("parameters", {}).get("retry_after", 1)
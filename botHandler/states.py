@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from types import MappingProxyType
+
+from FunPayAPI.common.utils import LRUDict
+from logger import logger
+
+
+class UserState:
+    __slots__ = ("state", "data")
+
+    def __init__(self, state=None, data=None):
+        self.state = state
+        self.data = data if data is not None else {}
+
+
+# Returned for users without a flow, so lookups don't build a default per message
+NO_STATE = UserState(data=MappingProxyType({}))
+
+
+class StateStore:
+    """
+    Per-user state of multi-step bot flows.
+
+    States live in an LRUDict with an idle TTL, so abandoned flows are evicted
+    instead of being held forever. If a database is given, states are written
+    through to it and reloaded on start, so flows survive a restart.
+    """
+
+    def __init__(self, ttl=3600, maxsize=10000, db=None):
+        """
+        Args:
+            ttl (int): Seconds of inactivity after which a flow is dropped
+            maxsize (int): Maximum number of users kept in memory
+            db (SQLiteDB): Optional database to persist states to
+        """
+        self.ttl = ttl
+        self.db = db
+        self._states = LRUDict(maxsize, ttl)
+        self._lock = threading.Lock()
+        if db is not None:
+            self._load()
+
+    def get(self, user_id):
+        """Current state of the user, NO_STATE if there is none."""
+        return self._states.get(user_id, NO_STATE)
+
+    def set(self, user_id, state, data=None):
+        user_state = UserState(state, data)
+        self._states[user_id] = user_state
+        if self.db is not None:
+            with self._lock:
+                self.db.save_bot_state(user_id, state, json.dumps(user_state.data), time.time())
+
+    def clear(self, user_id):
+        self._states.pop(user_id, None)
+        if self.db is not None:
+            with self._lock:
+                self.db.delete_bot_state(user_id)
+
+    def __len__(self):
+        self._states.purge()
+        return len(self._states)
+
+    def _load(self):
+        with self._lock:
+            self.db.delete_bot_states_before(time.time() - self.ttl)
+            rows = self.db.get_bot_states()
+        for user_id, state, data in rows:
+            try:
+                self._states[user_id] = UserState(state, json.loads(data))
+            except ValueError:
+                logger.error(f"Dropping corrupted bot state of user {user_id}")
+        if rows:
+            logger.info(f"Restored {len(rows)} bot user states.")
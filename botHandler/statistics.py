@@ -0,0 +1,66 @@
+import threading
+import time
+
+from logger import logger
+
+
+class StatisticsService:
+    """
+    In-memory snapshot of rental statistics for the bot screens.
+
+    The snapshot is recomputed only when accounts or the rentals log changed
+    (see SQLiteDB.get_inventory_version) or it is older than max_age seconds, the
+    latter keeps the time-window figures (last 24 hours) current. Button
+    presses and "Обновить" taps in between are served from memory.
+    """
+
+    def __init__(self, db, max_age=60, window_hours=24):
+        """
+        Args:
+            db (SQLiteDB): Database to read from
+            max_age (int): Maximum age of the snapshot, seconds
+            window_hours (int): Window of the per-lot and revenue figures, hours
+        """
+        self.db = db
+        self.max_age = max_age
+        self.window_hours = window_hours
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._computed_at = 0.0
+
+    def get(self):
+        """
+        Current statistics snapshot.
+
+        Returns:
+            dict: get_rental_statistics() counters plus utilization (%),
+            lots [(account_name, rentals, hours, revenue)], hourly_revenue
+            [(hour, revenue)], revenue (over the window), turnover
+            [(account_name, rotations, avg_seconds, max_seconds)] and computed_at
+        """
+        version = self.db.get_inventory_version()
+        with self._lock:
+            if (
+                self._snapshot is None
+                or version != self._version
+                or time.monotonic() - self._computed_at > self.max_age
+            ):
+                self._snapshot = self._compute()
+                self._version = version
+                self._computed_at = time.monotonic()
+            return self._snapshot
+
+    def _compute(self):
+        stats = self.db.get_rental_statistics()
+        if not stats:
+            return {}
+        total = stats["total_accounts"]
+        stats["utilization"] = stats["active_rentals"] / total * 100 if total else 0.0
+        stats["lots"] = self.db.get_lot_statistics(self.window_hours)
+        stats["hourly_revenue"] = self.db.get_hourly_revenue(self.window_hours)
+        stats["revenue"] = sum(revenue or 0 for _, revenue in stats["hourly_revenue"])
+        stats["turnover"] = self.db.get_turnover_statistics(self.window_hours)
+        stats["computed_at"] = time.time()
+        logger.debug("Rental statistics snapshot recomputed.")
+        return stats
@@ -29,10 +29,18 @@ MAX_EXTENSION_HOURS = 24  # Максимальное количество час
 PROXY_URL = ""
 PROXY_LOGIN = ""
 PROXY_PASSWORD = ""
+# Прокси для запросов к Steam (смена паролей, коды Steam Guard), пусто - без прокси
+STEAM_PROXY_URL = ""
 
 # ⚙️ Системные настройки
+# Изменения голд кея, прокси, HOURS_FOR_REVIEW и настроек ниже применяются без перезапуска
 REFRESH_INTERVAL = 1300  # Интервал обновления сессии FunPay (в секундах)
 RENTAL_CHECK_INTERVAL = 30  # Интервал проверки истечения аренды (в секундах)
+# За сколько секунд до окончания аренды начинать смену пароля, чтобы аккаунт
+# освобождался сразу к окончанию (0 - менять пароль после окончания)
+ROTATION_LEAD_SECONDS = 0
+FUNPAY_REQUESTS_DELAY = 8  # Пауза между запросами обновлений FunPay (в секундах)
+OUTBOX_MAX_WORKERS = 4  # Сколько чатов покупателей обслуживается одновременно
 MAX_RETRY_ATTEMPTS = 3  # Максимальное количество попыток для операций
 
 # 📊 Настройки логирования
@@ -29,6 +29,148 @@ class SQLiteDB:
             )
             """
         )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_accounts_owner ON accounts (owner)"
+        )
+        # Inventory version is bumped by triggers on every change to accounts,
+        # including writes from other connections, so readers can cache by it
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            """
+        )
+        cursor.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('inventory_version', 0)"
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS accounts_version_{event.lower()}
+                AFTER {event} ON accounts
+                BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'inventory_version';
+                END
+                """
+            )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_name TEXT DEFAULT NULL,
+                chat_id INTEGER DEFAULT NULL,
+                text TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        # Log of issued and extended rentals, source of revenue and per-lot statistics.
+        # Times are Moscow time like accounts.rental_start
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rentals (
+                ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id INTEGER NOT NULL,
+                account_name TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                hours INTEGER NOT NULL,
+                price REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT (DATETIME(CURRENT_TIMESTAMP, '+3 hours'))
+            )
+            """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rentals_created_at ON rentals (created_at)"
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS rentals_version_insert
+            AFTER INSERT ON rentals
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'inventory_version';
+            END
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bot_states (
+                user_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Steam web session cookies ({domain: {name: value}} as JSON) by SteamID
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS steam_sessions (
+                steamid INTEGER PRIMARY KEY,
+                login TEXT NOT NULL,
+                cookies TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # New passwords reserved for the next rotation of a login, written before
+        # Steam is asked to change it, so the password is known even if the rotation fails
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_passwords (
+                login TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        # Log of password rotations, turnover is seconds from the rental expiry until
+        # the account was free again (negative when rotated ahead of the expiry)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rotations (
+                ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id INTEGER NOT NULL,
+                account_name TEXT NOT NULL,
+                expired_at TIMESTAMP NOT NULL,
+                turnover REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT (DATETIME(CURRENT_TIMESTAMP, '+3 hours'))
+            )
+            """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rotations_created_at ON rotations (created_at)"
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS rotations_version_insert
+            AFTER INSERT ON rotations
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'inventory_version';
+            END
+            """
+        )
+        # Password rotations of ended rentals, one job per account. Jobs are
+        # 'pending' until next_attempt_at, 'running' while claimed by a worker and
+        # 'quarantined' after too many failed attempts, until the admin retries them
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rotation_jobs (
+                account_id INTEGER PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT DEFAULT NULL,
+                claimed_at REAL DEFAULT NULL
+            )
+            """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rotation_jobs_due ON rotation_jobs (state, next_attempt_at)"
+        )
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS authorized_users (
@@ -296,6 +438,73 @@ class SQLiteDB:
         finally:
             cursor.close()
 
+    def get_inventory_version(self) -> int:
+        """Retrieve a counter that changes whenever the accounts table changes."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT value FROM meta WHERE key = 'inventory_version'")
+            return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error retrieving inventory version: {str(e)}")
+            return 0
+        finally:
+            cursor.close()
+
+    def get_accounts_page(self, after_id: int = 0, before_id: int = None, limit: int = 5) -> list:
+        """
+        Retrieve one page of accounts ordered by ID using keyset pagination.
+
+        Args:
+            after_id (int): Return accounts with ID greater than this (next page)
+            before_id (int): If set, return accounts with ID less than this (previous page)
+            limit (int): Page size
+
+        Returns:
+            list: Accounts of the page in ascending ID order
+        """
+        try:
+            cursor = self.conn.cursor()
+            if before_id is not None:
+                cursor.execute(
+                    """
+                    SELECT ID, account_name, login, password, rental_duration, owner
+                    FROM accounts
+                    WHERE ID < ?
+                    ORDER BY ID DESC
+                    LIMIT ?
+                    """,
+                    (before_id, limit),
+                )
+                rows = cursor.fetchall()[::-1]
+            else:
+                cursor.execute(
+                    """
+                    SELECT ID, account_name, login, password, rental_duration, owner
+                    FROM accounts
+                    WHERE ID > ?
+                    ORDER BY ID
+                    LIMIT ?
+                    """,
+                    (after_id, limit),
+                )
+                rows = cursor.fetchall()
+            return [
+                {
+                    "id": row[0],
+                    "account_name": row[1],
+                    "login": row[2],
+                    "password": row[3],
+                    "rental_duration": row[4],
+                    "owner": row[5],
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            logger.error(f"Error retrieving accounts page: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
     def get_all_account_names(self) -> list:
         """Retrieve all distinct account names."""
         try:
@@ -309,6 +518,50 @@ class SQLiteDB:
         finally:
             cursor.close()
 
+    def get_all_logins(self) -> list:
+        """Retrieve all distinct account logins."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT DISTINCT login FROM accounts")
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error retrieving logins: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def add_accounts_bulk(self, accounts: list) -> int:
+        """
+        Add many accounts in a single transaction.
+
+        Args:
+            accounts (list): Tuples of (account_name, path_to_maFile, login, password, duration)
+
+        Returns:
+            int: Number of inserted accounts (rows with an existing account_name are skipped)
+        """
+        if not accounts:
+            return 0
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(
+                """
+                INSERT OR IGNORE INTO accounts (account_name, path_to_maFile, login, password, rental_duration)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                accounts,
+            )
+            inserted = cursor.rowcount
+            self.conn.commit()
+            logger.info(f"{inserted} accounts added in bulk")
+            return inserted
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error adding accounts in bulk: {str(e)}")
+            return 0
+        finally:
+            cursor.close()
+
     def get_unowned_account_names(self) -> list:
         """Retrieve account names for accounts with no owner."""
         try:
@@ -402,39 +655,26 @@ class SQLiteDB:
         """
         try:
             cursor = self.conn.cursor()
-            
-            # Total accounts
-            cursor.execute("SELECT COUNT(*) FROM accounts")
-            total_accounts = cursor.fetchone()[0]
-            
-            # Active rentals
-            cursor.execute("SELECT COUNT(*) FROM accounts WHERE owner IS NOT NULL")
-            active_rentals = cursor.fetchone()[0]
-            
-            # Available accounts
-            cursor.execute("SELECT COUNT(*) FROM accounts WHERE owner IS NULL")
-            available_accounts = cursor.fetchone()[0]
-            
-            # Total rental hours
-            cursor.execute("SELECT SUM(rental_duration) FROM accounts WHERE owner IS NOT NULL")
-            total_hours = cursor.fetchone()[0] or 0
-            
-            # Recent rentals (last 24 hours)
+
+            # All counters in a single pass over the table
             cursor.execute(
                 """
-                SELECT COUNT(*) FROM accounts 
-                WHERE owner IS NOT NULL 
-                AND rental_start >= datetime('now', '-1 day')
+                SELECT
+                    COUNT(*),
+                    COUNT(owner),
+                    SUM(CASE WHEN owner IS NOT NULL THEN rental_duration ELSE 0 END),
+                    SUM(owner IS NOT NULL AND rental_start >= datetime('now', '-1 day'))
+                FROM accounts
                 """
             )
-            recent_rentals = cursor.fetchone()[0]
-            
+            total_accounts, active_rentals, total_hours, recent_rentals = cursor.fetchone()
+
             return {
                 "total_accounts": total_accounts,
                 "active_rentals": active_rentals,
-                "available_accounts": available_accounts,
-                "total_hours": total_hours,
-                "recent_rentals": recent_rentals
+                "available_accounts": total_accounts - active_rentals,
+                "total_hours": total_hours or 0,
+                "recent_rentals": recent_rentals or 0
             }
         except Exception as e:
             logger.error(f"Error getting rental statistics: {str(e)}")
@@ -723,3 +963,529 @@ class SQLiteDB:
             return False
         finally:
             cursor.close()
+
+    def extend_owner_rentals(self, owner: str, hours: int) -> int:
+        """
+        Extend all active rentals of an owner in a single indexed UPDATE.
+
+        Args:
+            owner (str): The owner (FunPay username)
+            hours (int): Number of hours to add to the rental duration
+
+        Returns:
+            int: Number of extended accounts (0 if the owner has no active rentals)
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                UPDATE accounts
+                SET rental_duration = rental_duration + ?
+                WHERE owner = ? AND rental_start IS NOT NULL
+                """,
+                (hours, owner),
+            )
+            extended = cursor.rowcount
+            self.conn.commit()
+            return extended
+        except Exception as e:
+            logger.error(f"Error extending rentals for owner {owner}: {str(e)}")
+            return 0
+        finally:
+            cursor.close()
+
+    def add_outbox_message(self, chat_name, chat_id, text):
+        """
+        Persist an outgoing buyer message.
+
+        Returns:
+            int: ID of the outbox record, None on error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO outbox (chat_name, chat_id, text)
+                VALUES (?, ?, ?)
+                """,
+                (chat_name, chat_id, text),
+            )
+            self.conn.commit()
+            return cursor.lastrowid
+        except Exception as e:
+            logger.error(f"Error adding outbox message: {str(e)}")
+            return None
+        finally:
+            cursor.close()
+
+    def get_outbox_messages(self) -> list:
+        """Retrieve unsent buyer messages in the order they were queued."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                SELECT ID, chat_name, chat_id, text
+                FROM outbox
+                ORDER BY ID
+                """
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting outbox messages: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def delete_outbox_messages(self, message_ids: list) -> bool:
+        """Remove delivered buyer messages from the outbox."""
+        if not message_ids:
+            return True
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(
+                "DELETE FROM outbox WHERE ID = ?",
+                [(message_id,) for message_id in message_ids],
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting outbox messages: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def save_bot_state(self, user_id: int, state: str, data: str, updated_at: float) -> bool:
+        """Save the Telegram bot flow state of a user (data is JSON)."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO bot_states (user_id, state, data, updated_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (user_id, state, data, updated_at),
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving bot state: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def delete_bot_state(self, user_id: int) -> bool:
+        """Remove the Telegram bot flow state of a user."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM bot_states WHERE user_id = ?", (user_id,))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting bot state: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def delete_bot_states_before(self, timestamp: float) -> int:
+        """Remove flow states not updated since the given UNIX time."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM bot_states WHERE updated_at < ?", (timestamp,))
+            self.conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error deleting expired bot states: {str(e)}")
+            return 0
+        finally:
+            cursor.close()
+
+    def get_bot_states(self) -> list:
+        """Retrieve all saved flow states as (user_id, state, data) tuples."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT user_id, state, data FROM bot_states")
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error retrieving bot states: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def log_rental(self, account_id: int, account_name: str, owner: str, hours: int, price: float = 0) -> bool:
+        """Record an issued or extended rental for statistics."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO rentals (account_id, account_name, owner, hours, price)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (account_id, account_name, owner, hours, price),
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error logging rental: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def get_lot_statistics(self, hours: int = 24) -> list:
+        """
+        Rentals per lot over the last hours.
+
+        Returns:
+            list: Tuples of (account_name, rentals, rented_hours, revenue), busiest lots first
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                SELECT account_name, COUNT(*), SUM(hours), SUM(price)
+                FROM rentals
+                WHERE created_at >= DATETIME(CURRENT_TIMESTAMP, '+3 hours', ?)
+                GROUP BY account_name
+                ORDER BY SUM(hours) DESC
+                """,
+                (f"-{int(hours)} hours",),
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting lot statistics: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def get_hourly_revenue(self, hours: int = 24) -> list:
+        """
+        Revenue per hour over the last hours (Moscow time).
+
+        Returns:
+            list: Tuples of ("YYYY-MM-DD HH:00", revenue), oldest first
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                SELECT strftime('%Y-%m-%d %H:00', created_at) AS hour, SUM(price)
+                FROM rentals
+                WHERE created_at >= DATETIME(CURRENT_TIMESTAMP, '+3 hours', ?)
+                GROUP BY hour
+                ORDER BY hour
+                """,
+                (f"-{int(hours)} hours",),
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting hourly revenue: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def save_steam_session(self, steamid: int, login: str, cookies: str, updated_at: float) -> bool:
+        """Save the Steam web session cookies of an account (cookies is JSON)."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO steam_sessions (steamid, login, cookies, updated_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (steamid, login, cookies, updated_at),
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving Steam session: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def get_steam_session(self, steamid: int):
+        """Retrieve the saved Steam session cookies (JSON) of an account, None if there are none."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT cookies FROM steam_sessions WHERE steamid = ?", (steamid,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error retrieving Steam session: {str(e)}")
+            return None
+        finally:
+            cursor.close()
+
+    def delete_steam_session(self, steamid: int) -> bool:
+        """Forget the saved Steam session of an account."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM steam_sessions WHERE steamid = ?", (steamid,))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting Steam session: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def get_pending_password(self, login: str):
+        """Retrieve the password reserved for the next rotation of a login, None if there is none."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT password FROM pending_passwords WHERE login = ?", (login,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error retrieving pending password: {str(e)}")
+            return None
+        finally:
+            cursor.close()
+
+    def save_pending_password(self, login: str, password: str, created_at: float) -> bool:
+        """Reserve a password for the next rotation of a login, keeping an already reserved one."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO pending_passwords (login, password, created_at)
+                VALUES (?, ?, ?)
+                """,
+                (login, password, created_at),
+            )
+            self.conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error saving pending password: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def delete_pending_password(self, login: str) -> bool:
+        """Drop the reserved password of a login once the rotation used it."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM pending_passwords WHERE login = ?", (login,))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting pending password: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def log_rotation(self, account_id: int, account_name: str, expired_at: str, turnover: float) -> bool:
+        """Record a finished password rotation for the turnover statistics."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO rotations (account_id, account_name, expired_at, turnover)
+                VALUES (?, ?, ?, ?)
+                """,
+                (account_id, account_name, expired_at, turnover),
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error logging rotation: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def get_turnover_statistics(self, hours: int = 24) -> list:
+        """
+        Account turnover per lot over the last hours.
+
+        Returns:
+            list: Tuples of (account_name, rotations, avg_turnover, max_turnover) in seconds,
+            slowest lots first
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                SELECT account_name, COUNT(*), AVG(turnover), MAX(turnover)
+                FROM rotations
+                WHERE created_at >= DATETIME(CURRENT_TIMESTAMP, '+3 hours', ?)
+                GROUP BY account_name
+                ORDER BY AVG(turnover) DESC
+                """,
+                (f"-{int(hours)} hours",),
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting turnover statistics: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def enqueue_rotation_job(self, account_id: int, owner: str, expires_at: str, next_attempt_at: float) -> bool:
+        """
+        Queue the password rotation of an ended rental, due at next_attempt_at (unix time).
+
+        Returns:
+            bool: False if the account already has a job (pending, running or quarantined)
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO rotation_jobs (account_id, owner, expires_at, next_attempt_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (account_id, owner, expires_at, next_attempt_at),
+            )
+            self.conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error queueing rotation job: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def claim_rotation_job(self, now: float):
+        """
+        Atomically take the most overdue pending rotation job.
+
+        Returns:
+            tuple: (account_id, owner, expires_at, attempts, last_error) or None if no job is due
+        """
+        try:
+            cursor = self.conn.cursor()
+            # Select and update under one write lock; UPDATE ... RETURNING would
+            # need SQLite 3.35, older than what some supported Pythons bundle
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                """
+                SELECT account_id, owner, expires_at, attempts, last_error
+                FROM rotation_jobs
+                WHERE state = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT 1
+                """,
+                (now,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                self.conn.commit()
+                return None
+            cursor.execute(
+                """
+                UPDATE rotation_jobs
+                SET state = 'running', attempts = attempts + 1, claimed_at = ?
+                WHERE account_id = ?
+                """,
+                (now, row[0]),
+            )
+            self.conn.commit()
+            account_id, owner, expires_at, attempts, last_error = row
+            return account_id, owner, expires_at, attempts + 1, last_error
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error claiming rotation job: {str(e)}")
+            return None
+        finally:
+            cursor.close()
+
+    def complete_rotation_job(self, account_id: int) -> bool:
+        """Remove a finished (or no longer needed) rotation job."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM rotation_jobs WHERE account_id = ?", (account_id,))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error completing rotation job: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def fail_rotation_job(self, account_id: int, error: str, next_attempt_at: float, quarantine: bool) -> bool:
+        """Record a failed attempt and schedule the next one, or quarantine the job."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                UPDATE rotation_jobs
+                SET state = ?, last_error = ?, next_attempt_at = ?, claimed_at = NULL
+                WHERE account_id = ?
+                """,
+                ("quarantined" if quarantine else "pending", error, next_attempt_at, account_id),
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error failing rotation job: {str(e)}")
+            return False
+        finally:
+            cursor.close()
+
+    def requeue_running_rotation_jobs(self) -> int:
+        """
+        Return jobs left 'running' by a crash or a restart to the queue. The
+        interrupted attempt may have changed the password already, the job
+        keeps an error so its next attempt is handled as a retry.
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                UPDATE rotation_jobs
+                SET state = 'pending', claimed_at = NULL,
+                    last_error = COALESCE(last_error, 'Interrupted by a restart')
+                WHERE state = 'running'
+                """
+            )
+            self.conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error requeueing rotation jobs: {str(e)}")
+            return 0
+        finally:
+            cursor.close()
+
+    def get_quarantined_rotation_jobs(self) -> list:
+        """
+        Returns:
+            list: Tuples of (account_id, account_name, owner, expires_at, attempts, last_error)
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                SELECT j.account_id, a.account_name, j.owner, j.expires_at, j.attempts, j.last_error
+                FROM rotation_jobs j
+                LEFT JOIN accounts a ON a.ID = j.account_id
+                WHERE j.state = 'quarantined'
+                ORDER BY j.expires_at
+                """
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting quarantined rotation jobs: {str(e)}")
+            return []
+        finally:
+            cursor.close()
+
+    def retry_rotation_job(self, account_id: int, now: float) -> bool:
+        """Give a quarantined rotation job a fresh set of attempts, starting now."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                UPDATE rotation_jobs
+                SET state = 'pending', attempts = 0, next_attempt_at = ?
+                WHERE account_id = ? AND state = 'quarantined'
+                """,
+                (now, account_id),
+            )
+            self.conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error retrying rotation job: {str(e)}")
+            return False
+        finally:
+            cursor.close()
@@ -3,7 +3,6 @@ import random
 import time
 import asyncio
 import sqlite3
-import threading
 import re
 from datetime import datetime, timedelta
 
@@ -11,581 +10,768 @@ from datetime import datetime, timedelta
 from FunPayAPI import Account, Runner, types, enums, events
 
 # Project-specific imports
-from config import FUNPAY_GOLDEN_KEY, ADMIN_ID, HOURS_FOR_REVIEW
+from configHandler.configService import config_service
 
 from databaseHandler.databaseSetup import SQLiteDB
-from steamHandler.SteamGuard import get_steam_guard_code
-from steamHandler.changePassword import changeSteamPassword
+from funpayHandler.outbox import MessageOutbox
+from steamHandler.SteamGuard import get_steam_guard_codes
+from steamHandler.changePassword import changeSteamPassword, checkSteamPassword, generate_password
+from supervisorHandler.supervisor import supervisor
 from logger import logger
 from pytz import timezone
 
 
-TOKEN = FUNPAY_GOLDEN_KEY
-REFRESH_INTERVAL = 1300  # 30 minutes in seconds
+# Raw HTML of chats/messages/orders is never used here, don't keep it in memory
+types.KEEP_HTML = False
 
-feedbackGiven = []
+feedbackGiven = set()
 
 moscow_tz = timezone("Europe/Moscow")
 
 db = SQLiteDB()
 
+# Buyer messages are queued and sent in the background, see outbox.py
+outbox = MessageOutbox(lambda: acc, max_workers=config_service.settings.OUTBOX_MAX_WORKERS)
+# How often messages the outbox gave up on are queued again, seconds
+OUTBOX_RESEND_INTERVAL = 300
+
+# Set by run_funpay() once logged in
+acc = None
+runner = None
+
+# Password rotations are jobs in the rotation_jobs table, see run_rotation_worker().
+# A failed attempt is retried after ROTATION_RETRY_DELAY doubled per attempt (up to
+# ROTATION_MAX_RETRY_DELAY), after ROTATION_MAX_ATTEMPTS the job is quarantined
+ROTATION_MAX_ATTEMPTS = 5
+ROTATION_RETRY_DELAY = 60
+ROTATION_MAX_RETRY_DELAY = 3600
+# How often idle workers look for due jobs, seconds
+ROTATION_POLL_INTERVAL = 5
+# Set when jobs are queued, wakes the idle workers up. Created on first use
+# from the supervisor loop: before 3.10 an Event is bound to the loop current
+# at creation, at import that is not the loop asyncio.run() starts
+_rotation_wakeup = None
+
+
+def rotation_wakeup():
+    global _rotation_wakeup
+    if _rotation_wakeup is None:
+        _rotation_wakeup = asyncio.Event()
+    return _rotation_wakeup
+
 
 def refresh_session():
-    global acc, runner
+    # In place, the runner and the outbox keep using the same Account object
     logger.info("Refreshing FunPay session...")
-    acc = Account(TOKEN).get()
-    runner = Runner(acc)
+    acc.get()
     logger.info("FunPay session refreshed successfully.")
 
 
-def check_rental_expiration():
-    """Checks for expired rentals and changes passwords every minute"""
-    logger.info("Starting rental expiration checker...")
-    invalid_accs = []
-    while True:
-        try:
-            conn = sqlite3.connect("database.db")
-            cursor = conn.cursor()
-
-            current_time = datetime.now(tz=moscow_tz)
-
-            # Get all active rentals with their maFile paths
-            cursor.execute(
-                """
-                SELECT a.ID, a.owner, a.rental_start, a.rental_duration, a.path_to_maFile, a.password
-                FROM accounts a
-                WHERE a.owner IS NOT NULL 
-                AND a.rental_start IS NOT NULL
-                """
-            )
+def apply_golden_key(settings):
+    """Switch the running account to a new golden key with a single login."""
+    if acc is None:
+        # Not logged in yet, run_funpay() reads the key itself
+        return
+    previous = acc.golden_key
+    if settings.FUNPAY_GOLDEN_KEY == previous:
+        return
+    logger.info("FunPay golden key changed, logging in with the new key...")
+    acc.golden_key = settings.FUNPAY_GOLDEN_KEY
+    try:
+        acc.get()
+    except Exception as e:
+        acc.golden_key = previous
+        logger.error(f"New golden key rejected, keeping the previous one: {str(e)}")
+        return
+    logger.info("FunPay account switched to the new golden key.")
 
-            accounts_data = cursor.fetchall()
 
-            for row in accounts_data:
-                account_id, owner, start_time, duration, mafile_path, password = row
-                logger.debug(f"Processing account ID: {account_id}, Owner: {owner}")
+def apply_outbox_workers(settings):
+    outbox.set_max_workers(settings.OUTBOX_MAX_WORKERS)
 
-                start_datetime = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                start_datetime = moscow_tz.localize(start_datetime)
-                expiry_time = start_datetime + timedelta(hours=int(duration))
-                
-                # Calculate time remaining
-                time_remaining = expiry_time - current_time
-                hours_remaining = time_remaining.total_seconds() / 3600
 
-                logger.debug(
-                    f"Start time: {start_datetime}, Expiry time: {expiry_time}, Current time: {current_time}, Hours remaining: {hours_remaining:.2f}"
-                )
+config_service.subscribe(apply_golden_key, "FUNPAY_GOLDEN_KEY")
+config_service.subscribe(apply_outbox_workers, "OUTBOX_MAX_WORKERS")
 
-                # Send warning notifications
-                # Предупреждаем за 10 минут до истечения (6-12 минут, чтобы захватить точно 10 минут)
-                # Проверка происходит каждую минуту
-                if 0.1 <= hours_remaining <= 0.2:  # 6-12 minutes remaining (10 minutes ±2)
-                    try:
-                        send_message_to_admin(
-                            f"ПРЕДУПРЕЖДЕНИЕ ОБ ИСТЕЧЕНИИ!\n\n"
-                            f"ID аккаунта: {account_id}\n"
-                            f"Владелец: {owner}\n"
-                            f"Осталось времени: {hours_remaining:.1f} часа (~{int(hours_remaining * 60)} минут)\n"
-                            f"Совет: Пользователь скоро потеряет доступ!"
-                        )
-                        
-                        send_message_by_owner(
-                            owner,
-                            f"ВНИМАНИЕ! Время аренды истекает через ~10 минут!\n\n"
-                            f"Аккаунт ID: {account_id}\n"
-                            f"Осталось времени: ~{int(hours_remaining * 60)} минут\n"
-                            f"СРОЧНО: Оставьте отзыв, чтобы продлить аренду на +{HOURS_FOR_REVIEW} час!\n\n"
-                            f"Как продлить:\n"
-                            f"• Оставьте отзыв на FunPay\n"
-                            f"• Или купите продление\n\n"
-                            f"Время истечения: {expiry_time.strftime('%H:%M:%S')}"
-                        )
-                        logger.info(f"Warning notification sent to {owner} for account {account_id} - {hours_remaining:.1f} hours remaining")
-                    except Exception as e:
-                        logger.error(f"Failed to send warning notification: {str(e)}")
-
-                # Check if expired
-                if current_time >= expiry_time and account_id not in invalid_accs:
-                    logger.info(
-                        f"Account {account_id} rental expired. Time difference: {current_time - expiry_time}"
-                    )
-                    try:
-                        new_password = asyncio.run(
-                            changeSteamPassword(
-                                path_to_maFile=mafile_path,
-                                password=password,
-                            )
-                        )
-                        logger.info(
-                            f"Password changed successfully for account {account_id}. New password: {new_password}"
-                        )
-                        from botHandler.bot import send_message_to_admin
-
-                        send_message_to_admin(
-                            f"АРЕНДА ИСТЕКЛА\n\n"
-                            f"ID аккаунта: {account_id}\n"
-                            f"Владелец: {owner}\n"
-                            f"Новый пароль: {new_password}\n"
-                            f"Время истечения: {expiry_time.strftime('%Y-%m-%d %H:%M:%S')}"
-                        )
 
-                        # Update password and nullify all accounts with the same login
-                        logger.debug(f"Updating database for account {account_id}...")
-                        cursor.execute(
-                            """
-                            UPDATE accounts
-                            SET password = ?, owner = NULL, rental_start = NULL, rental_duration = 1
-                            WHERE login = (
-                                SELECT login
-                                FROM accounts
-                                WHERE ID = ?
-                            )
-                            """,
-                            (new_password, account_id),
-                        )
-                        logger.info(f"Database updated for account {account_id}.")
+def rental_expiry(rental_start, rental_duration):
+    """Moscow time the rental started at rental_start ("%Y-%m-%d %H:%M:%S") ends."""
+    start_datetime = moscow_tz.localize(datetime.strptime(rental_start, "%Y-%m-%d %H:%M:%S"))
+    return start_datetime + timedelta(hours=int(rental_duration))
 
-                        try:
-                            send_message_by_owner(
-                                owner,
-                                f"Срок аренды истек!\n\n"
-                                f"Аккаунт ID: {account_id}\n"
-                                f"Доступ прекращен\n\n"
-                                f"Не забудьте подтвердить заказ на FunPay!\n"
-                                f"Оставьте отзыв для будущих покупок!\n\n"
-                                f"Спасибо за использование нашего сервиса!"
-                            )
-                            logger.info(
-                                f"Expiration notification sent to user {owner}."
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"Failed to send expiration notification: {str(e)}"
-                            )
 
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to change password for account {account_id}: {str(e)}"
-                        )
-                        invalid_accs.append(account_id)
+def rotation_start(expiry_time):
+    """When the rotation of a rental expiring at expiry_time should start."""
+    return expiry_time - timedelta(seconds=config_service.settings.ROTATION_LEAD_SECONDS)
 
-                        continue
 
-            conn.commit()
+def reserve_new_password(login):
+    """The password the next rotation of login sets, generated and stored once in advance."""
+    db.save_pending_password(login, generate_password(12), time.time())
+    return db.get_pending_password(login)
 
-            conn.close()
 
-        except Exception as e:
-            logger.error(f"Error in rental expiration checker: {str(e)}")
+def check_rentals():
+    """
+    One pass of the expiry scheduler: warns buyers who lose access in about
+    10 minutes and returns the rentals whose password must be rotated.
 
-        time.sleep(60)  # Check every 60 seconds (1 minute)
+    With ROTATION_LEAD_SECONDS set, rentals whose rotation starts before the
+    next pass are returned too, run_rental_checker() queues them on time.
+    Buyers are warned ahead of the rotation start, rentals that already have
+    a rotation job are warned but not returned again.
 
+    Returns:
+        list: (account_id, owner, path_to_maFile, password, expiry_time) tuples
+    """
+    from botHandler.bot import send_message_to_admin
 
-def startFunpay():
-    global acc, runner
-
-    logger.info("Starting FunPay bot...")
-    acc = Account(TOKEN).get()
-    runner = Runner(acc)
-    logger.info("FunPay account and runner initialized.")
-    last_refresh = time.time()
-
-    logger.info("Starting rental expiration checker thread...")
+    conn = sqlite3.connect("database.db")
+    try:
+        cursor = conn.cursor()
+
+        current_time = datetime.now(tz=moscow_tz)
+
+        # Get all active rentals with their maFile paths
+        cursor.execute(
+            """
+            SELECT a.ID, a.owner, a.rental_start, a.rental_duration, a.path_to_maFile, a.password,
+                   a.ID IN (SELECT account_id FROM rotation_jobs)
+            FROM accounts a
+            WHERE a.owner IS NOT NULL 
+            AND a.rental_start IS NOT NULL
+            """
+        )
+        accounts_data = cursor.fetchall()
+    finally:
+        conn.close()
+
+    settings = config_service.settings
+    lookahead = timedelta(seconds=settings.RENTAL_CHECK_INTERVAL if settings.ROTATION_LEAD_SECONDS else 0)
+    due = []
+    for row in accounts_data:
+        account_id, owner, start_time, duration, mafile_path, password, queued = row
+        logger.debug(f"Processing account ID: {account_id}, Owner: {owner}")
+
+        expiry_time = rental_expiry(start_time, duration)
+        # With ROTATION_LEAD_SECONDS the password changes, and access ends, before the expiry
+        access_end = rotation_start(expiry_time)
+
+        # Calculate time remaining
+        time_remaining = access_end - current_time
+        hours_remaining = time_remaining.total_seconds() / 3600
+
+        logger.debug(
+            f"Start time: {start_time}, Expiry time: {expiry_time}, Current time: {current_time}, Hours remaining: {hours_remaining:.2f}"
+        )
+
+        # Send warning notifications
+        # Предупреждаем за 10 минут до истечения (6-12 минут, чтобы захватить точно 10 минут)
+        if 0.1 <= hours_remaining <= 0.2:  # 6-12 minutes remaining (10 minutes ±2)
+            try:
+                send_message_to_admin(
+                    f"ПРЕДУПРЕЖДЕНИЕ ОБ ИСТЕЧЕНИИ!\n\n"
+                    f"ID аккаунта: {account_id}\n"
+                    f"Владелец: {owner}\n"
+                    f"Осталось времени: {hours_remaining:.1f} часа (~{int(hours_remaining * 60)} минут)\n"
+                    f"Совет: Пользователь скоро потеряет доступ!",
+                    kind="expiry_warning",
+                )
 
-    timerChecker_thread = threading.Thread(target=check_rental_expiration).start()
+                send_message_by_owner(
+                    owner,
+                    f"ВНИМАНИЕ! Время аренды истекает через ~10 минут!\n\n"
+                    f"Аккаунт ID: {account_id}\n"
+                    f"Осталось времени: ~{int(hours_remaining * 60)} минут\n"
+                    f"СРОЧНО: Оставьте отзыв, чтобы продлить аренду на +{config_service.settings.HOURS_FOR_REVIEW} час!\n\n"
+                    f"Как продлить:\n"
+                    f"• Оставьте отзыв на FunPay\n"
+                    f"• Или купите продление\n\n"
+                    f"Время истечения: {access_end.strftime('%H:%M:%S')}"
+                )
+                logger.info(f"Warning notification sent to {owner} for account {account_id} - {hours_remaining:.1f} hours remaining")
+            except Exception as e:
+                logger.error(f"Failed to send warning notification: {str(e)}")
+
+        # Check if expired, or due for a rotation ahead of the expiry before the next pass
+        if not queued and current_time + lookahead >= access_end:
+            logger.info(
+                f"Account {account_id} rental is due for rotation. Time difference: {current_time - expiry_time}"
+            )
+            due.append((account_id, owner, mafile_path, password, expiry_time))
 
-    for event in runner.listen(requests_delay=8):
-        try:
-            global send_message_by_owner
-            current_time = time.time()
-            if current_time - last_refresh >= REFRESH_INTERVAL:
-                logger.info("Refreshing session due to interval timeout...")
-                refresh_session()
-                last_refresh = current_time
+    return due
 
-            def send_message_by_owner(owner, message):
-                try:
-                    chat = acc.get_chat_by_name(owner, True)
-                    acc.send_message(chat.id, message)
-                except Exception as e:
-                    logger.error(f"Failed to send message to {owner}: {str(e)}")
 
-            if event.type is events.EventTypes.NEW_ORDER:
-                logger.info("Processing new order event...")
+async def run_rental_checker():
+    """Expiry scheduler, queues rotation jobs of due rentals every RENTAL_CHECK_INTERVAL seconds."""
+    logger.info("Starting rental expiration checker...")
+    while True:
+        with supervisor.measure("rentals"):
+            try:
+                queued = False
+                for account_id, owner, _, _, expiry_time in check_rentals():
+                    start = rotation_start(expiry_time)
+                    if start > datetime.now(tz=moscow_tz):
+                        # Proactive rotation: the new password is ready before the start
+                        account = db.get_account_by_id(account_id)
+                        if account is not None:
+                            reserve_new_password(account["login"])
+                    queued |= db.enqueue_rotation_job(
+                        account_id, owner, expiry_time.strftime("%Y-%m-%d %H:%M:%S"), start.timestamp()
+                    )
+                if queued:
+                    rotation_wakeup().set()
+            except Exception as e:
+                logger.error(f"Error in rental expiration checker: {str(e)}")
 
-                accounts = db.get_unowned_accounts()
+        await asyncio.sleep(config_service.settings.RENTAL_CHECK_INTERVAL)
 
-                acc = Account(TOKEN).get()
-                chat = acc.get_chat_by_name(event.order.buyer_username, True)
 
-                all_accounts = db.get_all_account_names()
+async def run_rotation_worker(name):
+    """
+    Rotation worker, claims due jobs from the rotation_jobs table and changes
+    the passwords. Failed jobs are retried with exponential backoff, and
+    quarantined for the admin (see /quarantine) after ROTATION_MAX_ATTEMPTS.
+    """
+    while True:
+        job = db.claim_rotation_job(time.time())
+        if job is None:
+            rotation_wakeup().clear()
+            try:
+                await asyncio.wait_for(rotation_wakeup().wait(), ROTATION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            supervisor.heartbeat(name)
+            continue
+
+        account_id, owner, expires_at, attempts, last_error = job
+        # Every failed or interrupted attempt leaves an error (see recover_rotation_jobs()),
+        # /quarantine resets attempts but keeps it
+        retry = last_error is not None
+        with supervisor.measure(name):
+            try:
+                expiry_time = moscow_tz.localize(datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S"))
+                # Not cancelled with the worker, a rotation must not stop halfway
+                await supervisor.protect(rotate_account(account_id, owner, expiry_time, retry))
+            except Exception as e:
+                fail_rotation(account_id, attempts, f"{type(e).__name__}: {e}")
+            else:
+                db.complete_rotation_job(account_id)
+
+
+def recover_rotation_jobs():
+    """Requeue jobs a previous run left claimed. Call once at startup, before the workers run."""
+    count = db.requeue_running_rotation_jobs()
+    if count:
+        logger.info(f"Requeued {count} interrupted rotation jobs.")
+
+
+def fail_rotation(account_id, attempts, error):
+    """Schedule the next attempt of a failed rotation job, or quarantine it."""
+    from botHandler.bot import send_message_to_admin
+
+    quarantine = attempts >= ROTATION_MAX_ATTEMPTS
+    delay = min(ROTATION_RETRY_DELAY * 2 ** (attempts - 1), ROTATION_MAX_RETRY_DELAY)
+    db.fail_rotation_job(account_id, error, time.time() + delay, quarantine)
+    logger.error(f"Failed to change password for account {account_id} (attempt {attempts}): {error}")
+
+    account = db.get_account_by_id(account_id)
+    if account is not None:
+        # Steam may have applied it before the failure
+        logger.error(
+            f"Reserved password of account {account_id}: {db.get_pending_password(account['login'])}"
+        )
+    if quarantine:
+        send_message_to_admin(
+            f"🚫 Смена пароля не удалась {attempts} раз, аккаунт в карантине\n\n"
+            f"ID аккаунта: {account_id}\n"
+            f"Ошибка: {error}\n\n"
+            f"Повторить: /quarantine"
+        )
+    else:
+        logger.info(f"Rotation of account {account_id} will be retried in {delay}s.")
+
+
+async def applied_pending_password(account):
+    """
+    The reserved password of an account if a previous rotation attempt already
+    set it on Steam (and failed later, e.g. on the database update), else None.
+    """
+    pending = db.get_pending_password(account["login"])
+    if pending is None or pending == account["password"]:
+        return None
+    if not await checkSteamPassword(account["path_to_maFile"], pending):
+        return None
+    logger.info(f"Reserved password of account {account['id']} is already set on Steam.")
+    return pending
+
+
+async def rotate_account(account_id, owner, expiry_time, retry=False):
+    """
+    Change the Steam password of an expired (or about to expire) rental and free the account.
+    Raises on failure, run_rotation_worker() schedules the retry.
+
+    Args:
+        retry (bool): A previous attempt failed or was interrupted. Steam may
+            have the reserved password already, then only the database is updated
+    """
+    from botHandler.bot import send_message_to_admin
+
+    account = db.get_account_by_id(account_id)
+    if (
+        account is None
+        or account["owner"] != owner
+        or account["rental_start"] is None
+        or rental_expiry(account["rental_start"], account["rental_duration"]) != expiry_time
+    ):
+        # Extended (e.g. for a review) or freed while the rotation was waiting for its start
+        logger.info(f"Rental of account {account_id} changed since scheduling, rotation skipped.")
+        return
+
+    new_password = await applied_pending_password(account) if retry else None
+    if new_password is None:
+        new_password = await changeSteamPassword(
+            path_to_maFile=account["path_to_maFile"],
+            password=account["password"],
+            new_password=reserve_new_password(account["login"]),
+        )
+    logger.info(
+        f"Password changed successfully for account {account_id}. New password: {new_password}"
+    )
+
+    send_message_to_admin(
+        f"АРЕНДА ИСТЕКЛА\n\n"
+        f"ID аккаунта: {account_id}\n"
+        f"Владелец: {owner}\n"
+        f"Новый пароль: {new_password}\n"
+        f"Время истечения: {expiry_time.strftime('%Y-%m-%d %H:%M:%S')}",
+        kind="rental_expired",
+    )
+
+    # Update password and nullify all accounts with the same login
+    logger.debug(f"Updating database for account {account_id}...")
+    conn = sqlite3.connect("database.db")
+    try:
+        conn.execute(
+            """
+            UPDATE accounts
+            SET password = ?, owner = NULL, rental_start = NULL, rental_duration = 1
+            WHERE login = (
+                SELECT login
+                FROM accounts
+                WHERE ID = ?
+            )
+            """,
+            (new_password, account_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    db.delete_pending_password(account["login"])
+    turnover = (datetime.now(tz=moscow_tz) - expiry_time).total_seconds()
+    db.log_rotation(account_id, account["account_name"], expiry_time.strftime("%Y-%m-%d %H:%M:%S"), turnover)
+    logger.info(f"Database updated for account {account_id}, turnover {turnover:.0f}s.")
 
-                order_name = event.order.description
-                number_of_orders = event.order.amount
+    try:
+        send_message_by_owner(
+            owner,
+            f"Срок аренды истек!\n\n"
+            f"Аккаунт ID: {account_id}\n"
+            f"Доступ прекращен\n\n"
+            f"Не забудьте подтвердить заказ на FunPay!\n"
+            f"Оставьте отзыв для будущих покупок!\n\n"
+            f"Спасибо за использование нашего сервиса!"
+        )
+        logger.info(
+            f"Expiration notification sent to user {owner}."
+        )
+    except Exception as e:
+        logger.error(
+            f"Failed to send expiration notification: {str(e)}"
+        )
 
-                logger.info(f"Original order name: {order_name}")
 
-                cleaned_order_name = re.sub(r"[^\w\s]", " ", order_name)
-                cleaned_order_name = " ".join(cleaned_order_name.split())
-                logger.info(f"Cleaned order name: {cleaned_order_name}")
+async def run_outbox():
+    """Resends buyer messages the outbox gave up on, every OUTBOX_RESEND_INTERVAL seconds."""
+    while True:
+        with supervisor.measure("outbox"):
+            outbox.restore()
+        await asyncio.sleep(OUTBOX_RESEND_INTERVAL)
 
-                matched_account = None
-                max_similarity = 0
 
-                for account in all_accounts:
-                    cleaned_account = re.sub(r"[^\w\s]", " ", account)
-                    cleaned_account = " ".join(cleaned_account.split())
+def next_poll_delay():
+    # Called by the runner before every pause, doubles as the FunPay heartbeat
+    supervisor.heartbeat("funpay")
+    return config_service.settings.FUNPAY_REQUESTS_DELAY
 
-                    if cleaned_account.lower() in cleaned_order_name.lower():
-                        similarity = len(cleaned_account)
-                        if similarity > max_similarity:
-                            max_similarity = similarity
-                            matched_account = account
 
-                if matched_account:
-                    order_name = matched_account
-                    logger.info(f"Matched order name: {order_name}")
-                else:
-                    logger.warning(f"No matching account found for order: {order_name}")
-                    continue
+def run_funpay(stop_event):
+    """FunPay event loop. Blocking, runs in its own thread until stop_event is set."""
+    global acc, runner
 
-                if order_name in all_accounts:
-                    logger.info(f"New order: {order_name}")
+    logger.info("Starting FunPay bot...")
+    acc = Account(config_service.settings.FUNPAY_GOLDEN_KEY).get()
+    runner = Runner(acc)
+    logger.info("FunPay account and runner initialized.")
+    last_refresh = time.time()
 
-                    # Предупреждаем пользователя, если он заказывает больше 1 аккаунта
-                    # Система выдает 1 аккаунт, но время аренды = количество заказанных часов
-                    if number_of_orders > 1:
-                        acc.send_message(
-                            chat.id,
-                            f"ВНИМАНИЕ!\n\n"
-                            f"Вы заказали {number_of_orders} аккаунтов типа '{order_name}', но система выдает максимум 1 аккаунт каждому пользователю.\n\n"
-                            f"Вам будет выдан 1 аккаунт на {number_of_orders} часа (время аренды = количество заказанных).\n"
-                            f"Если хотите продлить время аренды, оставьте отзыв или купите продление.\n\n"
-                            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-                        )
-                        logger.info(f"User {event.order.buyer_username} ordered {number_of_orders} accounts but will receive only 1 for {number_of_orders} hours")
+    for event in runner.listen(requests_delay=next_poll_delay, stop_event=stop_event):
+        with supervisor.measure("funpay"):
+            try:
+                current_time = time.time()
+                if current_time - last_refresh >= config_service.settings.REFRESH_INTERVAL:
+                    logger.info("Refreshing session due to interval timeout...")
+                    logger.info(f"FunPay cache sizes: {runner.get_cache_sizes()}")
+                    refresh_session()
+                    last_refresh = current_time
+
+                handle_event(event)
+            except Exception as e:
+                logger.error(f"An error occurred while processing event: {str(e)}")
+    logger.info("FunPay bot stopped.")
+
+
+def handle_event(event):
+    """Handle one FunPay event: issue accounts for new orders, answer buyer commands and reviews."""
+    if event.type is events.EventTypes.NEW_ORDER:
+        logger.info("Processing new order event...")
+
+        accounts = db.get_unowned_accounts()
+
+        buyer = event.order.buyer_username
+
+        all_accounts = db.get_all_account_names()
+
+        order_name = event.order.description
+        number_of_orders = event.order.amount
+
+        logger.info(f"Original order name: {order_name}")
+
+        cleaned_order_name = re.sub(r"[^\w\s]", " ", order_name)
+        cleaned_order_name = " ".join(cleaned_order_name.split())
+        logger.info(f"Cleaned order name: {cleaned_order_name}")
+
+        matched_account = None
+        max_similarity = 0
+
+        for account in all_accounts:
+            cleaned_account = re.sub(r"[^\w\s]", " ", account)
+            cleaned_account = " ".join(cleaned_account.split())
+
+            if cleaned_account.lower() in cleaned_order_name.lower():
+                similarity = len(cleaned_account)
+                if similarity > max_similarity:
+                    max_similarity = similarity
+                    matched_account = account
+
+        if matched_account:
+            order_name = matched_account
+            logger.info(f"Matched order name: {order_name}")
+        else:
+            logger.warning(f"No matching account found for order: {order_name}")
+            return
+
+        if order_name in all_accounts:
+            logger.info(f"New order: {order_name}")
+
+            # Предупреждаем пользователя, если он заказывает больше 1 аккаунта
+            # Система выдает 1 аккаунт, но время аренды = количество заказанных часов
+            if number_of_orders > 1:
+                outbox.send(
+                    buyer,
+                    f"ВНИМАНИЕ!\n\n"
+                    f"Вы заказали {number_of_orders} аккаунтов типа '{order_name}', но система выдает максимум 1 аккаунт каждому пользователю.\n\n"
+                    f"Вам будет выдан 1 аккаунт на {number_of_orders} часа (время аренды = количество заказанных).\n"
+                    f"Если хотите продлить время аренды, оставьте отзыв или купите продление.\n\n"
+                    f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+                )
+                logger.info(f"User {event.order.buyer_username} ordered {number_of_orders} accounts but will receive only 1 for {number_of_orders} hours")
 
-                    # Ищем конкретный аккаунт по названию
-                    specific_account = db.get_account_by_name(order_name)
+            # Ищем конкретный аккаунт по названию
+            specific_account = db.get_account_by_name(order_name)
                     
-                    if not specific_account:
-                        # Аккаунт не найден - возврат
-                        logger.error(f"Account with name '{order_name}' not found in database")
-                        acc.send_message(
-                            chat.id,
-                            f"Ошибка: Аккаунт '{order_name}' не найден в базе данных.\n"
-                            f"Обратитесь к администратору."
-                        )
-                        acc.refund(event.order.id)
-                        continue
+            if not specific_account:
+                # Аккаунт не найден - возврат
+                logger.error(f"Account with name '{order_name}' not found in database")
+                outbox.send(
+                    buyer,
+                    f"Ошибка: Аккаунт '{order_name}' не найден в базе данных.\n"
+                    f"Обратитесь к администратору."
+                )
+                acc.refund(event.order.id)
+                return
                     
-                    # Проверяем, занят ли аккаунт
-                    if specific_account['owner'] is not None:
-                        # Аккаунт уже занят другим пользователем - возврат
-                        logger.warning(f"Account '{order_name}' is already rented by {specific_account['owner']}")
-                        acc.send_message(
-                            chat.id,
-                            f"К сожалению, аккаунт '{order_name}' уже занят другим пользователем.\n"
-                            f"Попробуйте позже или выберите другой аккаунт."
-                        )
-                        acc.refund(event.order.id)
-                        continue
+            # Проверяем, занят ли аккаунт
+            if specific_account['owner'] is not None:
+                # Аккаунт уже занят другим пользователем - возврат
+                logger.warning(f"Account '{order_name}' is already rented by {specific_account['owner']}")
+                outbox.send(
+                    buyer,
+                    f"К сожалению, аккаунт '{order_name}' уже занят другим пользователем.\n"
+                    f"Попробуйте позже или выберите другой аккаунт."
+                )
+                acc.refund(event.order.id)
+                return
                     
-                    # Сначала проверяем, есть ли у пользователя уже активная аренда этого типа аккаунта
-                    existing_rentals = db.get_user_accounts_by_name(event.order.buyer_username, order_name)
+            # Сначала проверяем, есть ли у пользователя уже активная аренда этого типа аккаунта
+            existing_rentals = db.get_user_accounts_by_name(event.order.buyer_username, order_name)
                     
-                    if existing_rentals:
-                        # У пользователя уже есть активная аренда - продлеваем её на количество заказанных часов
-                        logger.info(f"User {event.order.buyer_username} already has active rental for {order_name}, extending by {number_of_orders} hours...")
+            if existing_rentals:
+                # У пользователя уже есть активная аренда - продлеваем её на количество заказанных часов
+                logger.info(f"User {event.order.buyer_username} already has active rental for {order_name}, extending by {number_of_orders} hours...")
                         
-                        # Продлеваем существующий аккаунт на количество заказанных часов
-                        rental = existing_rentals[0]  # Берем первый (единственный) аккаунт
-                        db.extend_rental_duration(rental['id'], number_of_orders)
+                # Продлеваем существующий аккаунт на количество заказанных часов
+                rental = existing_rentals[0]  # Берем первый (единственный) аккаунт
+                db.extend_rental_duration(rental['id'], number_of_orders)
+                db.log_rental(
+                    rental['id'], order_name, buyer, number_of_orders, event.order.price
+                )
                         
-                        # Уведомляем пользователя о продлении
-                        acc.send_message(
-                            chat.id,
-                            f"Аренда продлена!\n\n"
-                            f"Тип аккаунта: {order_name}\n"
-                            f"Продление: +{number_of_orders} часа\n"
-                            f"Аккаунт ID: {rental['id']}\n\n"
-                            f"Детали аккаунта:\n"
-                        )
+                # Уведомляем пользователя о продлении
+                outbox.send(
+                    buyer,
+                    f"Аренда продлена!\n\n"
+                    f"Тип аккаунта: {order_name}\n"
+                    f"Продление: +{number_of_orders} часа\n"
+                    f"Аккаунт ID: {rental['id']}\n\n"
+                    f"Детали аккаунта:\n"
+                )
                         
-                        # Показываем детали продленного аккаунта
-                        account = db.get_account_by_id(rental['id'])
-                        if account:
-                            expiry_time = datetime.strptime(account['rental_start'], "%Y-%m-%d %H:%M:%S") + timedelta(hours=int(account['rental_duration']))
-                            acc.send_message(
-                                chat.id,
-                                f"ID: {rental['id']}\n"
-                                f"Логин: {rental['login']}\n"
-                                f"Истекает: {expiry_time.strftime('%H:%M:%S')}\n"
-                                f"Пароль: {rental['password']}\n"
-                                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-                            )
+                # Показываем детали продленного аккаунта
+                account = db.get_account_by_id(rental['id'])
+                if account:
+                    expiry_time = datetime.strptime(account['rental_start'], "%Y-%m-%d %H:%M:%S") + timedelta(hours=int(account['rental_duration']))
+                    outbox.send(
+                        buyer,
+                        f"ID: {rental['id']}\n"
+                        f"Логин: {rental['login']}\n"
+                        f"Истекает: {expiry_time.strftime('%H:%M:%S')}\n"
+                        f"Пароль: {rental['password']}\n"
+                        f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+                    )
                         
-                        # Уведомляем админа
-                        from botHandler.bot import send_message_to_admin
-                        send_message_to_admin(
-                            f"АРЕНДА ПРОДЛЕНА\n\n"
-                            f"Пользователь: {event.order.buyer_username}\n"
-                            f"Тип аккаунта: {order_name}\n"
-                            f"Продление: +{number_of_orders} часа\n"
-                            f"Цена: {event.order.price} ₽\n"
-                            f"Аккаунт ID: {rental['id']}\n"
-                            f"Примечание: Пользователь уже имел активную аренду"
-                        )
+                # Уведомляем админа
+                from botHandler.bot import send_message_to_admin
+                send_message_to_admin(
+                    f"АРЕНДА ПРОДЛЕНА\n\n"
+                    f"Пользователь: {event.order.buyer_username}\n"
+                    f"Тип аккаунта: {order_name}\n"
+                    f"Продление: +{number_of_orders} часа\n"
+                    f"Цена: {event.order.price} ₽\n"
+                    f"Аккаунт ID: {rental['id']}\n"
+                    f"Примечание: Пользователь уже имел активную аренду",
+                    kind="rental_extended",
+                )
                         
-                        # Подтверждаем заказ
-                        acc.confirm(event.order.id)
+                # Подтверждаем заказ
+                acc.confirm(event.order.id)
                         
-                    else:
-                        # У пользователя нет активной аренды - выдаём конкретный аккаунт на количество заказанных часов
-                        logger.info(f"Assigning specific account '{order_name}' to user {event.order.buyer_username}")
+            else:
+                # У пользователя нет активной аренды - выдаём конкретный аккаунт на количество заказанных часов
+                logger.info(f"Assigning specific account '{order_name}' to user {event.order.buyer_username}")
                         
-                        # Устанавливаем владельца и время аренды на количество заказанных часов
-                        db.set_account_owner(
-                            specific_account["id"], event.order.buyer_username
-                        )
+                # Устанавливаем владельца и время аренды на количество заказанных часов
+                db.set_account_owner(
+                    specific_account["id"], event.order.buyer_username
+                )
                         
-                        # Обновляем время аренды на количество заказанных часов
-                        conn = sqlite3.connect("database.db")
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            """
-                            UPDATE accounts
-                            SET rental_duration = ?
-                            WHERE ID = ?
-                            """,
-                            (number_of_orders, specific_account["id"]),
-                        )
-                        conn.commit()
-                        conn.close()
+                # Обновляем время аренды на количество заказанных часов
+                conn = sqlite3.connect("database.db")
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    UPDATE accounts
+                    SET rental_duration = ?
+                    WHERE ID = ?
+                    """,
+                    (number_of_orders, specific_account["id"]),
+                )
+                conn.commit()
+                conn.close()
+                db.log_rental(
+                    specific_account["id"],
+                    specific_account["account_name"],
+                    buyer,
+                    number_of_orders,
+                    event.order.price,
+                )
                         
-                        from botHandler.bot import send_message_to_admin
-
-                        send_message_to_admin(
-                            f"НОВЫЙ АККАУНТ ВЫДАН\n\n"
-                            f"Покупатель: {event.order.buyer_username}\n"
-                            f"ID: {specific_account['id']}\n"
-                            f"Имя аккаунта: {specific_account['account_name']}\n"
-                            f"Логин: {specific_account['login']}\n"
-                            f"Пароль: {specific_account['password']}\n"
-                            f"Цена: {event.order.price} ₽\n"
-                            f"Заказано: {number_of_orders} шт.\n"
-                            f"Время аренды: {number_of_orders} часа\n"
-                            f"Примечание: Конкретный аккаунт '{order_name}' выдан на {number_of_orders} часа"
-                        )
+                from botHandler.bot import send_message_to_admin
+
+                send_message_to_admin(
+                    f"НОВЫЙ АККАУНТ ВЫДАН\n\n"
+                    f"Покупатель: {event.order.buyer_username}\n"
+                    f"ID: {specific_account['id']}\n"
+                    f"Имя аккаунта: {specific_account['account_name']}\n"
+                    f"Логин: {specific_account['login']}\n"
+                    f"Пароль: {specific_account['password']}\n"
+                    f"Цена: {event.order.price} ₽\n"
+                    f"Заказано: {number_of_orders} шт.\n"
+                    f"Время аренды: {number_of_orders} часа\n"
+                    f"Примечание: Конкретный аккаунт '{order_name}' выдан на {number_of_orders} часа",
+                    kind="account_issued",
+                )
 
-                        acc.send_message(
-                            chat.id,
-                            text=f"Ваш аккаунт:\n"
-                            f"Уникальный ID: {specific_account['id']}\n"
-                            f"Название: {specific_account['account_name']}\n\n"
-                            f"Срок аренды: {number_of_orders} часа \n\n"
-                            f"Логин: {specific_account['login']}\n"
-                            f"Пароль: {specific_account['password']}\n\n"
-                            f"Что-бы запросить код подтверждения, отправьте /code\n\n"
-                            f"За отзыв - вы получите дополнительные {HOURS_FOR_REVIEW} час/часа аренды.\n"
-                            f"ВНИМАНИЕ: Система предупредит вас за 10 минут до истечения!\n\n"
-                            f"------------------------------------------------------------------------------\n\n"
-                            "Если вы еще не прочитали инструкцию по входу в аккаунт, сделайте это прямо сейчас!\n"
-                            "При возникновении проблем или вопросов позовите меня командой /question",
-                        )
+                outbox.send(
+                    buyer,
+                    text=f"Ваш аккаунт:\n"
+                    f"Уникальный ID: {specific_account['id']}\n"
+                    f"Название: {specific_account['account_name']}\n\n"
+                    f"Срок аренды: {number_of_orders} часа \n\n"
+                    f"Логин: {specific_account['login']}\n"
+                    f"Пароль: {specific_account['password']}\n\n"
+                    f"Что-бы запросить код подтверждения, отправьте /code\n\n"
+                    f"За отзыв - вы получите дополнительные {config_service.settings.HOURS_FOR_REVIEW} час/часа аренды.\n"
+                    f"ВНИМАНИЕ: Система предупредит вас за 10 минут до истечения!\n\n"
+                    f"------------------------------------------------------------------------------\n\n"
+                    "Если вы еще не прочитали инструкцию по входу в аккаунт, сделайте это прямо сейчас!\n"
+                    "При возникновении проблем или вопросов позовите меня командой /question",
+                )
                         
-                        # Подтверждаем заказ
-                        acc.confirm(event.order.id)
+                # Подтверждаем заказ
+                acc.confirm(event.order.id)
                         
-                else:
-                    # Товар не найден в базе - это не аккаунт для аренды, пропускаем
-                    logger.info(f"Товар '{order_name}' не найден в базе данных - это не аккаунт для аренды, пропускаем")
-                    continue
+        else:
+            # Товар не найден в базе - это не аккаунт для аренды, пропускаем
+            logger.info(f"Товар '{order_name}' не найден в базе данных - это не аккаунт для аренды, пропускаем")
+            return
                 
-                logger.info(f"New order processed successfully.")
-
-            if event.type is events.EventTypes.NEW_MESSAGE:
-                logger.info("Processing new message event...")
-
-                chat = acc.get_chat_by_name(event.message.author, True)
-
-                if event.message.author_id != acc.id:
-
-                    logger.info(f"{event.message.author} : {event.message.text}")
-
-                    if "/code" == event.message.text.strip():
-                        try:
-                            owner_data = db.get_owner_mafile(event.message.author)
-
-                            logger.info(owner_data)
-
-                            if owner_data:
-                                # Iterate through all accounts associated with the owner
-                                for account in owner_data:
-                                    (
-                                        account_id,
-                                        account_name,
-                                        mafile_path,
-                                        login,
-                                        rental_duration,
-                                    ) = account
-                                    guard_code = get_steam_guard_code(mafile_path)
-                                    acc.send_message(
-                                        chat.id,
-                                        f"ID {account_id} -> {guard_code}",
-                                    )
-                            else:
-                                acc.send_message(chat.id, "Ошибка: аккаунт не найден")
-                        except Exception as e:
-                            acc.send_message(
-                                chat.id, f"Ошибка при генерации кода: {str(e)}"
+        logger.info(f"New order processed successfully.")
+
+    if event.type is events.EventTypes.NEW_MESSAGE:
+        logger.info("Processing new message event...")
+
+        chat = acc.get_chat_by_name(event.message.author, True)
+
+        if event.message.author_id != acc.id:
+
+            logger.info(f"{event.message.author} : {event.message.text}")
+
+            if "/code" == event.message.text.strip():
+                try:
+                    owner_data = db.get_owner_mafile(event.message.author)
+
+                    logger.info(owner_data)
+
+                    if owner_data:
+                        # Codes of all the owner's accounts in one pass, one Steam time query at most
+                        guard_codes = get_steam_guard_codes([account[2] for account in owner_data])
+                        for account in owner_data:
+                            (
+                                account_id,
+                                account_name,
+                                mafile_path,
+                                login,
+                                rental_duration,
+                            ) = account
+                            guard_code = guard_codes[mafile_path]
+                            outbox.send(
+                                event.message.author,
+                                f"ID {account_id} -> {guard_code}",
                             )
+                    else:
+                        outbox.send(event.message.author, "Ошибка: аккаунт не найден")
+                except Exception as e:
+                    outbox.send(
+                        event.message.author, f"Ошибка при генерации кода: {str(e)}"
+                    )
 
-                    elif event.message.text == "/question":
+            elif event.message.text == "/question":
 
-                        acc.send_message(chat.id, "Оператор скоро ответит вам.")
+                outbox.send(event.message.author, "Оператор скоро ответит вам.")
 
-                    elif "/stock" == event.message.text:
+            elif "/stock" == event.message.text:
 
-                        chatData = acc.get_chat(chat.id)
+                chatData = acc.get_chat(chat.id)
 
-                        logger.info(chatData.looking_text)
+                logger.info(chatData.looking_text)
 
-                        lookingAccountName = [
-                            p.strip() for p in chatData.looking_text.split(",")
-                        ]
+                lookingAccountName = [
+                    p.strip() for p in chatData.looking_text.split(",")
+                ]
 
-                        lookingAccountName = max(
-                            lookingAccountName,
-                            key=lambda x: (len(x), bool(re.search(r"[\W_]", x))),
-                        )
+                lookingAccountName = max(
+                    lookingAccountName,
+                    key=lambda x: (len(x), bool(re.search(r"[\W_]", x))),
+                )
 
-                        logger.info(lookingAccountName)
+                logger.info(lookingAccountName)
 
-                        # Get all account names from the database
-                        accounts = db.get_all_account_names()
+                # Get all account names from the database
+                accounts = db.get_all_account_names()
 
-                        matching_accounts = [
-                            account_name
-                            for account_name in accounts
-                            if account_name in lookingAccountName
-                        ]
+                matching_accounts = [
+                    account_name
+                    for account_name in accounts
+                    if account_name in lookingAccountName
+                ]
 
-                        total_accounts = len(matching_accounts)
+                total_accounts = len(matching_accounts)
 
-                        unowned_accounts = db.get_unowned_account_names()
+                unowned_accounts = db.get_unowned_account_names()
 
-                        matching_accounts = [
-                            account_name
-                            for account_name in unowned_accounts
-                            if account_name in lookingAccountName
-                        ]
+                matching_accounts = [
+                    account_name
+                    for account_name in unowned_accounts
+                    if account_name in lookingAccountName
+                ]
 
-                        logger.info(matching_accounts)
+                logger.info(matching_accounts)
 
-                        total_unwoned_accounts = len(matching_accounts)
+                total_unwoned_accounts = len(matching_accounts)
 
-                        # Send the count to the user
-                        acc.send_message(
-                            chat.id,
-                            f"Вы смотрите аккаунт: {lookingAccountName}\n\n"
-                            f"Свободные аккаунты: {total_unwoned_accounts}/{total_accounts}",
+                # Send the count to the user
+                outbox.send(
+                    event.message.author,
+                    f"Вы смотрите аккаунт: {lookingAccountName}\n\n"
+                    f"Свободные аккаунты: {total_unwoned_accounts}/{total_accounts}",
+                )
+
+            elif event.message.type == types.MessageTypes.NEW_FEEDBACK:
+                try:
+                    # The buyer is parsed from the system message by FunPayAPI
+                    owner = event.message.initiator_username
+                    if not owner:
+                        logger.error(
+                            "Failed to extract owner from feedback message."
                         )
+                        return
+
+                    if owner not in feedbackGiven:
+                        feedbackGiven.add(owner)
+
+                        hours_for_review = config_service.settings.HOURS_FOR_REVIEW
+                        extended = db.extend_owner_rentals(owner, hours_for_review)
+                        if extended:
+                            # Notify the user
+                            outbox.send(
+                                owner,
+                                f"Спасибо за ваш отзыв!\n\n"
+                                f"Время аренды продлено на +{hours_for_review} час!\n\n"
+                                f"Ваши активные аккаунты:\n"
+                                f"• Количество: {extended}\n"
+                                f"• Новое время аренды: {hours_for_review + 1} часа\n\n"
+                                f"Совет: Оставляйте отзывы заранее, чтобы получить максимальное продление!\n"
+                                f"Напоминание: Система предупредит вас за 10 минут до истечения!",
+                            )
+
+                            logger.info(
+                                f"Rental duration extended for {extended} accounts of user {owner} by +{hours_for_review} hours."
+                            )
+
+                except Exception as e:
+                    logger.error(f"Error handling NEW_FEEDBACK event: {str(e)}")
 
-                    elif event.message.type == types.MessageTypes.NEW_FEEDBACK:
-                        try:
-                            conn = sqlite3.connect("database.db")
-                            cursor = conn.cursor()
-
-                            # Extract the owner's username from the feedback message
-                            feedback_text = event.message.text
-                            if "Покупатель" in feedback_text:
-                                owner = feedback_text.split("Покупатель")[1].split()[0]
-                            else:
-                                logger.error(
-                                    "Failed to extract owner from feedback message."
-                                )
-                                return
-
-                            if owner not in feedbackGiven:
-                                feedbackGiven.append(owner)
-
-                                if owner in db.get_active_owners():
-                                    # Check if the user has an active rental
-                                    cursor.execute(
-                                        """
-                                        SELECT ID, rental_start, rental_duration
-                                        FROM accounts
-                                        WHERE owner = ?
-                                        """,
-                                        (owner,),
-                                    )
-                                    accounts = cursor.fetchall()
-
-                                    for account in accounts:
-                                        account_id, rental_start, rental_duration = account
-                                        
-                                        # Calculate current expiry time
-                                        start_time = datetime.strptime(
-                                            rental_start, "%Y-%m-%d %H:%M:%S"
-                                        )
-                                        current_expiry = start_time + timedelta(hours=int(rental_duration))
-                                        
-                                        # Add extension hours to the duration (not to start time)
-                                        new_duration = int(rental_duration) + HOURS_FOR_REVIEW
-                                        
-                                        # Update the rental duration in the database
-                                        cursor.execute(
-                                            """
-                                            UPDATE accounts
-                                            SET rental_duration = ?
-                                            WHERE ID = ?
-                                            """,
-                                            (new_duration, account_id),
-                                        )
-                                        
-                                        logger.info(
-                                            f"Rental duration for account {account_id} extended from {rental_duration} to {new_duration} hours (+{HOURS_FOR_REVIEW})."
-                                        )
-
-                                    conn.commit()
-
-                                    # Notify the user
-                                    chat = acc.get_chat_by_name(owner, True)
-                                    acc.send_message(
-                                        chat.id,
-                                        f"Спасибо за ваш отзыв!\n\n"
-                                        f"Время аренды продлено на +{HOURS_FOR_REVIEW} час!\n\n"
-                                        f"Ваши активные аккаунты:\n"
-                                        f"• Количество: {len(accounts)}\n"
-                                        f"• Новое время аренды: {HOURS_FOR_REVIEW + 1} часа\n\n"
-                                        f"Совет: Оставляйте отзывы заранее, чтобы получить максимальное продление!\n"
-                                        f"Напоминание: Система предупредит вас за 10 минут до истечения!",
-                                    )
-
-                                    logger.info(
-                                        f"Rental duration extended for {len(accounts)} accounts of user {owner} by +{HOURS_FOR_REVIEW} hours."
-                                    )
-
-                        except Exception as e:
-                            logger.error(f"Error handling NEW_FEEDBACK event: {str(e)}")
-                        finally:
-                            conn.close()
-
-                logger.info("New message processed successfully.")
-
-        except Exception as e:
-            logger.error(f"An error occurred while processing event: {str(e)}")
+        logger.info("New message processed successfully.")
 
 
 def send_message_by_owner(owner, message):
-    """Send a message to the specified owner."""
+    """Queue a message to the specified owner. Does not wait for FunPay."""
     try:
-        chat = acc.get_chat_by_name(owner, True)
-        acc.send_message(chat.id, message)
+        outbox.send(owner, message)
     except Exception as e:
-        logger.error(f"Failed to send message to {owner}: {str(e)}")
+        logger.error(f"Failed to queue message to {owner}: {str(e)}")
 
 
 # Ensure the function is available for import
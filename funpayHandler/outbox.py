@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from FunPayAPI.common import exceptions
+from FunPayAPI.common.utils import LRUDict
+from databaseHandler.databaseSetup import SQLiteDB
+from logger import logger
+
+
+# Merged messages are kept under this length
+MAX_MESSAGE_LENGTH = 2000
+MESSAGE_SEPARATOR = "\n\n"
+
+
+class OutboxMessage:
+    __slots__ = ("id", "chat_name", "chat_id", "text")
+
+    def __init__(self, id, chat_name, chat_id, text):
+        self.id = id
+        self.chat_name = chat_name
+        self.chat_id = chat_id
+        self.text = text
+
+
+class MessageOutbox:
+    """
+    Outbox for messages to FunPay buyers.
+
+    send() persists the message and returns immediately. Each chat has its own
+    FIFO queue drained by one worker at a time, so messages to a buyer keep
+    their order while different chats are sent concurrently. Adjacent
+    messages to the same chat are merged into one FunPay message. Failed
+    sends are retried with exponential backoff; when they still fail the
+    chat is held with the messages at the head of its queue, and later ones
+    wait behind them until the next restore() resumes it.
+    """
+
+    def __init__(self, get_account, db=None, max_workers=4, merge_window=0.5,
+                 max_retries=5, base_delay=2.0):
+        """
+        Args:
+            get_account: Callable returning the current FunPayAPI Account
+                (the session is refreshed periodically, so it is looked up per send)
+            db (SQLiteDB): Database the outbox is persisted to
+            max_workers (int): Number of chats sent to concurrently
+            merge_window (float): How long a chat waits for more messages to merge, seconds
+            max_retries (int): Send attempts before a message is left for the next start
+            base_delay (float): First retry delay, doubled on every attempt, seconds
+        """
+        self.get_account = get_account
+        # Own connection, workers write to it from their threads
+        self.db = db or SQLiteDB()
+        self.merge_window = merge_window
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="outbox")
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._queues = {}
+        self._active = set()
+        # Chats whose head batch was given up on, resumed by restore()
+        self._held = set()
+        # IDs of persisted messages waiting in memory, restore() skips them
+        self._queued_ids = set()
+        self._chat_ids = LRUDict(1000)
+
+    def send(self, chat_name, text, chat_id=None):
+        """
+        Queue a message. Either the chat name (buyer username) or the chat ID is required.
+
+        Returns:
+            int: ID of the outbox record, None if it could not be persisted
+        """
+        if chat_name is None and chat_id is None:
+            raise ValueError("chat_name or chat_id is required")
+        with self._db_lock:
+            message_id = self.db.add_outbox_message(chat_name, chat_id, text)
+            self._enqueue(OutboxMessage(message_id, chat_name, chat_id, text))
+        return message_id
+
+    def restore(self):
+        """Queue messages left unsent by a previous run and resume held chats."""
+        # send() inserts and queues under _db_lock, so a row is either queued or not yet written
+        with self._db_lock:
+            rows = self.db.get_outbox_messages()
+            with self._lock:
+                rows = [row for row in rows if row[0] not in self._queued_ids]
+        for row in rows:
+            self._enqueue(OutboxMessage(*row))
+        if rows:
+            logger.info(f"Restored {len(rows)} unsent buyer messages from outbox.")
+        with self._lock:
+            held, self._held = self._held, set()
+            for key in held:
+                self._active.add(key)
+                self._executor.submit(self._drain, key)
+        if held:
+            logger.info(f"Resumed sending to {len(held)} held outbox chats.")
+
+    def close(self):
+        """Stop sending. Unsent messages stay in the database for the next start."""
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def pending(self):
+        """Number of messages waiting in memory."""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def set_max_workers(self, max_workers):
+        """
+        Change the number of chats sent to concurrently.
+        Chats being drained at the moment finish on the previous pool.
+        """
+        with self._lock:
+            previous = self._executor
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="outbox")
+        previous.shutdown(wait=False)
+        logger.info(f"Outbox concurrency set to {max_workers} chats.")
+
+    def _enqueue(self, message):
+        # Messages to a buyer are ordered by name when it is known
+        key = message.chat_name or str(message.chat_id)
+        with self._lock:
+            if message.id is not None:
+                self._queued_ids.add(message.id)
+            self._queues.setdefault(key, deque()).append(message)
+            # A held chat keeps the message behind the ones it failed to send
+            if key in self._active or key in self._held:
+                return
+            self._active.add(key)
+            # Under the lock, set_max_workers() may be swapping the pool
+            self._executor.submit(self._drain, key)
+
+    def _drain(self, key):
+        time.sleep(self.merge_window)
+        while True:
+            with self._lock:
+                queue = self._queues.get(key)
+                if not queue:
+                    self._queues.pop(key, None)
+                    self._active.discard(key)
+                    return
+                batch = [queue.popleft()]
+                length = len(batch[0].text)
+                while queue and length + len(MESSAGE_SEPARATOR) + len(queue[0].text) <= MAX_MESSAGE_LENGTH:
+                    length += len(MESSAGE_SEPARATOR) + len(queue[0].text)
+                    batch.append(queue.popleft())
+            try:
+                sent = self._send_batch(key, batch)
+            except Exception as e:
+                logger.error(f"Unexpected outbox error for chat {key}: {str(e)}")
+                continue
+            if not sent:
+                with self._lock:
+                    # Back to the head: nothing newer may overtake these messages
+                    self._queues.setdefault(key, deque()).extendleft(reversed(batch))
+                    self._active.discard(key)
+                    self._held.add(key)
+                return
+
+    def _send_batch(self, key, batch):
+        """
+        Returns:
+            bool: False if the batch could not be sent within max_retries attempts
+        """
+        text = MESSAGE_SEPARATOR.join(message.text for message in batch)
+        ids = [message.id for message in batch if message.id is not None]
+
+        for attempt in range(self.max_retries):
+            try:
+                acc = self.get_account()
+                chat_id = self._resolve_chat_id(acc, batch[0])
+                acc.send_message(chat_id, text)
+            except Exception as e:
+                delay = self.base_delay * 2 ** attempt
+                if isinstance(e, exceptions.RequestFailedError) and e.status_code == 429:
+                    logger.warning(f"FunPay rate limit for chat {key}, retrying in {delay:.0f}s")
+                else:
+                    logger.error(
+                        f"Failed to send message to {key} (attempt {attempt + 1}): {str(e)}"
+                    )
+                time.sleep(delay)
+                continue
+
+            with self._db_lock:
+                self.db.delete_outbox_messages(ids)
+            with self._lock:
+                self._queued_ids.difference_update(ids)
+            return True
+
+        logger.error(
+            f"Giving up on {len(batch)} messages to {key} for now, the chat is held until the next restore."
+        )
+        return False
+
+    def _resolve_chat_id(self, acc, message):
+        if message.chat_id is not None:
+            return message.chat_id
+        chat_id = self._chat_ids.get(message.chat_name)
+        if chat_id is None:
+            chat_id = acc.get_chat_by_name(message.chat_name, True).id
+            self._chat_ids[message.chat_name] = chat_id
+        return chat_id
@@ -1,11 +1,66 @@
-from botHandler.bot import main
-from funpayHandler.funpay import startFunpay
-
-import threading
 import asyncio
 
+from botHandler.bot import admin_notifications, close_bot, run_bot, send_message_to_admin
+from configHandler.configService import config_service
+from funpayHandler.funpay import (
+    outbox,
+    recover_rotation_jobs,
+    run_funpay,
+    run_outbox,
+    run_rental_checker,
+    run_rotation_worker,
+)
+from steamHandler.changePassword import steam_transport
+from supervisorHandler.supervisor import run_in_thread, supervisor
 
-if __name__ == "__main__":
-    funpay_thread = threading.Thread(target=startFunpay).start()
 
+# Rotation jobs processed concurrently
+ROTATION_WORKERS = 2
+
+
+def report_failure(name, error):
+    send_message_to_admin(f"⚠️ Компонент {name} упал: {error}\nПерезапуск...")
+
+
+async def stop_outbox():
+    outbox.close()
+
+
+async def close_steam_transport():
+    await steam_transport.close()
+
+
+async def run_supervisor():
+    # Steam requests of other threads (see SteamGuard.getQueryTime) run on this loop
+    steam_transport.bind()
+    await supervisor.run()
+
+
+def main():
+    # Edits of config.py are applied to the running bot without a restart
+    config_service.start_watching()
+    # Rotations interrupted by the previous shutdown are picked up again
+    recover_rotation_jobs()
+
+    # The FunPay runner is blocking (requests), it gets its own thread; the
+    # heartbeat comes from every poll, so a hung poll is restarted
+    supervisor.add(
+        "funpay",
+        lambda: run_in_thread(run_funpay, name="funpay"),
+        heartbeat_timeout=300,
+    )
+    # Steam connections are shared by all rotations, they are closed with the scheduler
+    supervisor.add("rentals", run_rental_checker, on_stop=close_steam_transport)
+    for number in range(1, ROTATION_WORKERS + 1):
+        name = f"rotation-{number}"
+        supervisor.add(name, lambda name=name: run_rotation_worker(name))
+    supervisor.add("outbox", run_outbox, on_stop=stop_outbox)
+    supervisor.add("notifications", admin_notifications.run)
+    supervisor.add("telegram", run_bot, on_stop=close_bot)
+    supervisor.on_failure = report_failure
+
+    asyncio.run(run_supervisor())
+
+
+if __name__ == "__main__":
     main()
@@ -1,53 +1,180 @@
 import os
+import sys
 import time
 import hmac
 import json
 import struct
 import base64
-import requests
+import threading
+from functools import lru_cache
 from hashlib import sha1
 import argparse
 
+import aiohttp
+
+# steampassword is imported by its short name, see changePassword.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steampassword.transport import steam_transport
+
+
+SYMBOLS = "23456789BCDFGHJKMNPQRTVWXY"
+# Steam Guard codes change every 30 seconds
+CODE_PERIOD = 30
+# How long the Steam time offset is reused, seconds. A failed query is retried sooner
+TIME_OFFSET_TTL = 3600
+TIME_OFFSET_RETRY = 60
+
+_time_offset = 0
+_time_offset_expires = 0.0
+_time_offset_lock = threading.Lock()
+# maFile path -> (mtime, shared_secret)
+_mafile_secrets = {}
+
+
+async def _query_server_time():
+    response = await steam_transport.request(
+        "https://api.steampowered.com/ITwoFactorService/QueryTime/v0001",
+        "POST",
+        # QueryTime needs no session, the cookies are thrown away
+        aiohttp.DummyCookieJar(),
+        os.getenv("STEAM_STANDIN_URL"),
+    )
+    json_data = await response.json(content_type=None)
+    return int(json_data["response"]["server_time"]) - time.time()
+
 
 def getQueryTime():
+    # Over the shared Steam connections, on the bot loop when it runs
     try:
-        request = requests.post(
-            "https://api.steampowered.com/ITwoFactorService/QueryTime/v0001", timeout=30
-        )
-        json_data = request.json()
-        server_time = int(json_data["response"]["server_time"]) - time.time()
-        return server_time
+        return steam_transport.request_sync(_query_server_time)
     except:
-        return 0
+        return None
 
 
-def getGuardCode(shared_secret):
-    symbols = "23456789BCDFGHJKMNPQRTVWXY"
+def get_time_offset():
+    """Offset of the Steam clock from the local one, queried at most once per TIME_OFFSET_TTL."""
+    global _time_offset, _time_offset_expires
+    with _time_offset_lock:
+        if time.monotonic() >= _time_offset_expires:
+            offset = getQueryTime()
+            if offset is None:
+                # Keep the last known offset (0 before the first success) and retry soon
+                _time_offset_expires = time.monotonic() + TIME_OFFSET_RETRY
+            else:
+                _time_offset = offset
+                _time_offset_expires = time.monotonic() + TIME_OFFSET_TTL
+        return _time_offset
+
+
+@lru_cache(maxsize=4096)
+def _hmac_template(shared_secret):
+    # Decoding the secret and preparing the HMAC key pads is done once per secret,
+    # every code copies the prepared object
+    return hmac.new(base64.b64decode(shared_secret), digestmod=sha1)
+
+
+def _code(shared_secret, interval):
+    _hmac = _hmac_template(shared_secret).copy()
+    _hmac.update(struct.pack(">Q", interval))
+    digest = _hmac.digest()
+    _ord = digest[19] & 0xF
+    value = struct.unpack(">I", digest[_ord : _ord + 4])[0] & 0x7FFFFFFF
     code = ""
-    timestamp = time.time() + getQueryTime()
-    _hmac = hmac.new(
-        base64.b64decode(shared_secret), struct.pack(">Q", int(timestamp / 30)), sha1
-    ).digest()
-    _ord = ord(_hmac[19:20]) & 0xF
-    value = struct.unpack(">I", _hmac[_ord : _ord + 4])[0] & 0x7FFFFFFF
     for i in range(5):
-        code += symbols[value % len(symbols)]
-        value = int(value / len(symbols))
+        code += SYMBOLS[value % len(SYMBOLS)]
+        value //= len(SYMBOLS)
     return code
 
 
+def getGuardCode(shared_secret):
+    timestamp = time.time() + get_time_offset()
+    return _code(shared_secret, int(timestamp / CODE_PERIOD))
+
+
+def generate_guard_codes(shared_secrets, timestamp=None):
+    """
+    Current and next Steam Guard codes for many accounts in one pass.
+
+    Args:
+        shared_secrets (list): Base64 shared secrets
+        timestamp (float): Steam time to generate the codes for, now by default
+
+    Returns:
+        list: (current code, next code, seconds the current code stays valid) per secret
+    """
+    if timestamp is None:
+        timestamp = time.time() + get_time_offset()
+    interval = int(timestamp / CODE_PERIOD)
+    valid_for = CODE_PERIOD - timestamp % CODE_PERIOD
+    return [
+        (_code(secret, interval), _code(secret, interval + 1), valid_for)
+        for secret in shared_secrets
+    ]
+
+
+def _read_shared_secret(mafile_path):
+    mtime = os.stat(mafile_path).st_mtime
+    cached = _mafile_secrets.get(mafile_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(mafile_path, "r") as file:
+        shared_secret = json.loads(file.read())["shared_secret"]
+    _mafile_secrets[mafile_path] = (mtime, shared_secret)
+    return shared_secret
+
+
+def get_steam_guard_codes(mafile_paths):
+    """
+    Steam Guard codes of many maFiles, with one time offset for all of them.
+    maFiles are read once and reread only when they change.
+
+    Returns:
+        dict: maFile path -> code, or {"success": False, "error": ...} like get_steam_guard_code()
+    """
+    results = {}
+    shared_secrets = {}
+    for mafile_path in mafile_paths:
+        try:
+            shared_secret = _read_shared_secret(mafile_path)
+            # Decoded here, a malformed secret (binascii.Error) fails only its own maFile
+            _hmac_template(shared_secret)
+            shared_secrets[mafile_path] = shared_secret
+        except FileNotFoundError:
+            results[mafile_path] = {"success": False, "error": "File not found"}
+        except json.JSONDecodeError:
+            results[mafile_path] = {"success": False, "error": "Invalid .maFile format"}
+        except KeyError:
+            results[mafile_path] = {"success": False, "error": "Missing required data in .maFile"}
+        except Exception as e:
+            results[mafile_path] = {"success": False, "error": str(e)}
+    codes = generate_guard_codes(list(shared_secrets.values()))
+    for mafile_path, (code, _, _) in zip(shared_secrets, codes):
+        results[mafile_path] = code
+    return results
+
+
 def get_steam_guard_code(mafile_path):
-    try:
-        with open(mafile_path, "r") as file:
-            data = json.loads(file.read())
-            code = getGuardCode(data["shared_secret"])
-            return code
-
-    except FileNotFoundError:
-        return {"success": False, "error": "File not found"}
-    except json.JSONDecodeError:
-        return {"success": False, "error": "Invalid .maFile format"}
-    except KeyError:
-        return {"success": False, "error": "Missing required data in .maFile"}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return get_steam_guard_codes([mafile_path])[mafile_path]
+
+
+def benchmark(accounts, rounds):
+    """Codes per second of generate_guard_codes() for the given number of accounts."""
+    shared_secrets = [base64.b64encode(os.urandom(20)).decode() for _ in range(accounts)]
+    timestamp = time.time()
+    generate_guard_codes(shared_secrets, timestamp)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        generate_guard_codes(shared_secrets, timestamp)
+    elapsed = time.perf_counter() - started
+    # Every call generates the current and the next code
+    return accounts * rounds * 2 / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Steam Guard code generation benchmark")
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    print(f"{benchmark(args.accounts, args.rounds):,.0f} codes per second")
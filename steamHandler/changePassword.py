@@ -8,9 +8,20 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from pysteamauth.base import BaseCookieStorage
+from pysteamauth.errors import SteamError
+
 from logger import logger
+from steamHandler.sessionStorage import cookie_storage
 from steampassword.chpassword import SteamPasswordChange
+# Re-exported: steampassword is imported by its short name, importing it as
+# steamHandler.steampassword elsewhere would create second metrics and transport instances
+from steampassword.metrics import rotation_metrics
 from steampassword.steam import CustomSteam
+from steampassword.transport import steam_transport
+
+# EResult Steam answers a login with a wrong password with
+ERESULT_INVALID_PASSWORD = 5
 
 
 def generate_password(length: int = 12) -> str:
@@ -33,13 +44,42 @@ def generate_password(length: int = 12) -> str:
     return password
 
 
-async def changeSteamPassword(path_to_maFile: str, password: str) -> str:
+def load_steam(path_to_maFile: str, password: str):
+    """
+    Build a CustomSteam for the account of a maFile. The Steam web session is
+    kept in the shared persistent cookie storage, so it is reused across
+    rotations and restarts instead of logging in every time.
+
+    Returns:
+        tuple: (CustomSteam, maFile data)
+    """
+    with open(path_to_maFile, "r") as f:
+        data = json.load(f)
+    steamid = int(data["Session"]["SteamID"])
+    cookie_storage.bind(data["account_name"], steamid)
+    steam = CustomSteam(
+        login=data["account_name"],
+        password=password,
+        shared_secret=data["shared_secret"],
+        identity_secret=data["identity_secret"],
+        device_id=data["device_id"],
+        steamid=steamid,
+        cookie_storage=cookie_storage,
+    )
+    return steam, data
 
-    logger.info("Started changing password")
 
+async def checkSteamPassword(path_to_maFile: str, password: str) -> bool:
+    """
+    Check whether Steam accepts a password of a maFile account by logging in
+    with it on a fresh session; the stored session is neither used nor replaced.
+
+    Returns:
+        bool: False if Steam rejects the password. Other failures raise, the
+            answer is unknown then
+    """
     with open(path_to_maFile, "r") as f:
         data = json.load(f)
-        logger.info(f"Started changing password for {data['account_name']}")
     steam = CustomSteam(
         login=data["account_name"],
         password=password,
@@ -47,12 +87,54 @@ async def changeSteamPassword(path_to_maFile: str, password: str) -> str:
         identity_secret=data["identity_secret"],
         device_id=data["device_id"],
         steamid=int(data["Session"]["SteamID"]),
+        cookie_storage=BaseCookieStorage(),
     )
+    try:
+        await steam.login_to_steam()
+    except SteamError as e:
+        if e.error_code == ERESULT_INVALID_PASSWORD:
+            return False
+        raise
+    return True
+
+
+async def changeSteamPassword(path_to_maFile: str, password: str, new_password: str = None) -> str:
+    """
+    Change the Steam password of a maFile account.
+
+    Args:
+        path_to_maFile (str): Path to the maFile of the account
+        password (str): Current password
+        new_password (str): Password to set, generated if not given
+
+    Returns:
+        str: The new password
+    """
+    logger.info("Started changing password")
+
+    steam, data = load_steam(path_to_maFile, password)
+    logger.info(f"Started changing password for {data['account_name']}")
 
-    new_password = generate_password(12)
+    if new_password is None:
+        new_password = generate_password(12)
 
-    await SteamPasswordChange(steam).change(new_password)
+    password_change = SteamPasswordChange(steam)
+    try:
+        await password_change.change(new_password)
+    finally:
+        timings = ", ".join(f"{step} {elapsed:.2f}s" for step, elapsed in password_change.timings.items())
+        logger.info(f"{data['account_name']} password change steps: {timings}")
 
     logger.info(f"{data['account_name']} new password -> {new_password}")
 
     return new_password
+
+
+__all__ = [
+    "changeSteamPassword",
+    "checkSteamPassword",
+    "generate_password",
+    "load_steam",
+    "rotation_metrics",
+    "steam_transport",
+]
@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+
+from pysteamauth.abstract import CookieStorageAbstract
+
+from databaseHandler.databaseSetup import SQLiteDB
+from logger import logger
+
+
+class SQLiteCookieStorage(CookieStorageAbstract):
+    """
+    Steam web session cookies persisted in the database, keyed by SteamID.
+
+    pysteamauth addresses the storage by login, so every account is bound to
+    its SteamID with bind() when its CustomSteam is created (see
+    changePassword.load_steam()). Cookies are cached in memory and read from
+    the database once per account; a session stored by one rotation is reused
+    by the next one and survives restarts.
+    """
+
+    def __init__(self, db=None):
+        """
+        Args:
+            db (SQLiteDB): Database the sessions are persisted to
+        """
+        # Own connection, Steam flows run on the supervisor loop and in bot jobs
+        self.db = db or SQLiteDB()
+        self._lock = threading.Lock()
+        self._steamids = {}
+        self._cookies = {}
+
+    def bind(self, login, steamid):
+        self._steamids[login] = steamid
+
+    async def set(self, login, cookies):
+        steamid = self._steamid(login)
+        with self._lock:
+            self._cookies[steamid] = cookies
+            if cookies:
+                self.db.save_steam_session(steamid, login, json.dumps(cookies), time.time())
+            else:
+                self.db.delete_steam_session(steamid)
+
+    async def get(self, login, domain):
+        steamid = self._steamid(login)
+        with self._lock:
+            cookies = self._cookies.get(steamid)
+            if cookies is None:
+                cookies = self._load(steamid)
+                self._cookies[steamid] = cookies
+        return cookies.get(domain, {})
+
+    def _steamid(self, login):
+        try:
+            return self._steamids[login]
+        except KeyError:
+            raise ValueError(f"Steam account {login} is not bound to a SteamID") from None
+
+    def _load(self, steamid):
+        data = self.db.get_steam_session(steamid)
+        if data is None:
+            return {}
+        try:
+            return json.loads(data)
+        except ValueError:
+            logger.error(f"Dropping corrupted Steam session of {steamid}")
+            return {}
+
+
+cookie_storage = SQLiteCookieStorage()
+
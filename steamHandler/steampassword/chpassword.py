@@ -1,22 +1,36 @@
 import asyncio
 import base64
-from typing import Dict
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
 
 import pydantic
 import rsa
 from lxml.html import document_fromstring
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from steamlib.api.trade import SteamTrade
 from steamlib.api.trade.exceptions import NotFoundMobileConfirmationError
 from yarl import URL
 
 from pysteamauth.errors import check_steam_error
+from steampassword.confirmations import confirmation_poller, poll_until
 from steampassword.exceptions import ErrorSteamPasswordChange
+from steampassword.metrics import rotation_metrics
 from steampassword.schemas import PasswordChangeParams, RSAKey
 from steampassword.steam import CustomSteam
 
 
+# Steam rotates the login RSA key about once an hour, the key is identified by
+# its timestamp. Reuse a fetched key for a shorter time to stay on the safe side.
+RSA_KEY_TTL = 600
+
+# login -> (fetched at, key timestamp, parsed public key)
+_rsa_keys: Dict[str, Tuple[float, int, rsa.PublicKey]] = {}
+
+# How long the flow waits for the mobile confirmation to appear and to be
+# registered by the wizard, seconds
+CONFIRMATION_TIMEOUT = 60
+
+
 class SteamPasswordChange:
 
     BROWSER = (
@@ -27,6 +41,17 @@ class SteamPasswordChange:
     def __init__(self, steam: CustomSteam):
         self._steam = steam
         self._steam_trade = SteamTrade(steam)
+        # step -> seconds spent in it by the last change()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def _step(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            with rotation_metrics.span(name):
+                yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.monotonic() - started
 
     async def _receive_password_change_params(self) -> PasswordChangeParams:
         response = await self._steam.raw_request(
@@ -72,30 +97,13 @@ class SteamPasswordChange:
             },
         )
 
-        # Configure Chrome options
-        chrome_options = Options()
-
-        chrome_options.add_argument(
-            "--headless"
-        )  # Run Chrome in headless mode (no GUI)
-        chrome_options.add_argument(
-            "--disable-gpu"
-        )  # Disable GPU acceleration (optional)
-        chrome_options.add_argument(
-            "--no-sandbox"
-        )  # Bypass OS security model (optional)
-
-        # Initialize the WebDriver with the configured options
-        driver = webdriver.Chrome(options=chrome_options)
+        response.release()
 
-        # Open a webpage
-        driver.get(f"{response.url}")
-
-        # Wait for 3 seconds
-        await asyncio.sleep(3)
-
-        # Close the browser
-        driver.quit()
+        # The wizard page requests the mobile confirmation from its JavaScript
+        # on load. Make that call directly with the session cookies instead of
+        # rendering the page in a headless browser.
+        if not await self._send_account_recovery_code(data):
+            raise ErrorSteamPasswordChange("Failed to request mobile confirmation")
 
     async def _send_account_recovery_code(self, data: PasswordChangeParams) -> bool:
         response = await self._steam.json_request(
@@ -126,7 +134,7 @@ class SteamPasswordChange:
 
     async def _poll_account_recovery_confirmation(
         self, data: PasswordChangeParams
-    ) -> Dict[str, bool]:
+    ) -> Optional[Dict[str, bool]]:
         response = await self._steam.json_request(
             method="POST",
             url="https://help.steampowered.com/en/wizard/AjaxPollAccountRecoveryConfirmation",
@@ -150,6 +158,9 @@ class SteamPasswordChange:
         )
         if response.get("errorMsg"):
             raise ErrorSteamPasswordChange(response["errorMsg"])
+        # Not confirmed yet
+        if not response.get("success"):
+            return None
         return response
 
     async def _verify_account_recovery_code(self, data: PasswordChangeParams):
@@ -220,10 +231,18 @@ class SteamPasswordChange:
             raise ErrorSteamPasswordChange(response["errorMsg"])
         return RSAKey.parse_obj(response)
 
-    def _encrypt_password(self, password: str, mod: str, exp: str) -> str:
-        publickey_exp = int(exp, 16)  # type: ignore
-        publickey_mod = int(mod, 16)  # type: ignore
-        public_key = rsa.PublicKey(n=publickey_mod, e=publickey_exp)
+    async def _get_public_key(self, refresh: bool = False) -> Tuple[int, rsa.PublicKey]:
+        """Cached RSA key of the account, fetched once per RSA_KEY_TTL."""
+        cached = _rsa_keys.get(self._steam.login)
+        if not refresh and cached is not None and time.monotonic() - cached[0] < RSA_KEY_TTL:
+            return cached[1], cached[2]
+        key = await self._get_rsa_key()
+        public_key = rsa.PublicKey(n=int(key.mod, 16), e=int(key.exp, 16))
+        _rsa_keys[self._steam.login] = (time.monotonic(), key.timestamp, public_key)
+        return key.timestamp, public_key
+
+    @staticmethod
+    def _encrypt_password(password: str, public_key: rsa.PublicKey) -> str:
         encrypted_password = rsa.encrypt(
             message=password.encode("ascii"),
             pub_key=public_key,
@@ -231,6 +250,12 @@ class SteamPasswordChange:
         encrypted_password64 = base64.b64encode(encrypted_password)
         return str(encrypted_password64, "utf8")
 
+    async def _encrypt_passwords(self, public_key: rsa.PublicKey, *passwords: str) -> Tuple[str, ...]:
+        # Off the event loop, it runs the Telegram bot and the FunPay poller too
+        return await asyncio.to_thread(
+            lambda: tuple(self._encrypt_password(password, public_key) for password in passwords)
+        )
+
     async def _recovery_verify_password(
         self, data: PasswordChangeParams, encrypted_password: str, rsatimestamp: int
     ):
@@ -304,47 +329,90 @@ class SteamPasswordChange:
         if new_password == self._steam.password:
             raise ValueError("New password is equal old password")
 
-        await self._steam.login_to_steam()
+        self.timings = {}
+        with self._step("total"):
+            await self._change(new_password)
 
-        params = await self._receive_password_change_params()
+    async def _change(self, new_password: str):
+        with self._step("login"):
+            await self._steam.login_to_steam()
 
-        await self._login_info_enter_code(params)
+        with self._step("wizard_params"):
+            try:
+                params = await self._receive_password_change_params()
+            except ErrorSteamPasswordChange:
+                # The wizard fails without a valid session; a stored one may have
+                # been revoked before its expiry, so log in once more and retry
+                await self._steam.relogin()
+                params = await self._receive_password_change_params()
+
+        with self._step("enter_code"):
+            await self._login_info_enter_code(params)
 
         # Confirm password change in mobile app
-        for _ in range(3):
+        with self._step("mobile_confirmation"):
             try:
-
-                success = await self._steam_trade.mobile_confirm_by_creator_id(params.s)
-                if not success:
-                    raise ErrorSteamPasswordChange("Error password change confirmation")
-                break
+                response = await confirmation_poller.confirm(
+                    self._steam_trade, params.s, timeout=CONFIRMATION_TIMEOUT
+                )
             except NotFoundMobileConfirmationError:
-                await asyncio.sleep(2)
+                raise
             except Exception as e:
-                print.error(e)
+                raise ErrorSteamPasswordChange("Error password change confirmation") from e
+            if not response.get("success"):
                 raise ErrorSteamPasswordChange("Error password change confirmation")
-        else:
-            raise NotFoundMobileConfirmationError("Not found mobile confirmation")
 
-        await self._poll_account_recovery_confirmation(params)
-        await self._verify_account_recovery_code(params)
-        await self._account_recovery_get_next_step(params)
+        with self._step("recovery_code"):
+            # The wizard sees the confirmation with a delay
+            attempts = 0
+
+            async def poll_recovery_confirmation():
+                nonlocal attempts
+                attempts += 1
+                if attempts > 1:
+                    rotation_metrics.count_retry("recovery_code")
+                return await self._poll_account_recovery_confirmation(params)
+
+            try:
+                await poll_until(poll_recovery_confirmation, timeout=CONFIRMATION_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ErrorSteamPasswordChange("Mobile confirmation was not registered") from None
+            await self._verify_account_recovery_code(params)
+            await self._account_recovery_get_next_step(params)
+
+        # One key serves both the old and the new password, both are encrypted at once
+        with self._step("rsa_key"):
+            rsatimestamp, public_key = await self._get_public_key()
+            encrypted_old, encrypted_new = await self._encrypt_passwords(
+                public_key, self._steam.password, new_password
+            )
 
         # Confirm old password
-        key = await self._get_rsa_key()
-        await self._recovery_verify_password(
-            data=params,
-            encrypted_password=self._encrypt_password(
-                self._steam.password, key.mod, key.exp
-            ),
-            rsatimestamp=key.timestamp,
-        )
+        with self._step("verify_password"):
+            try:
+                await self._recovery_verify_password(
+                    data=params,
+                    encrypted_password=encrypted_old,
+                    rsatimestamp=rsatimestamp,
+                )
+            except ErrorSteamPasswordChange:
+                # The cached key may have been rotated by Steam, retry with a fresh one
+                rotation_metrics.count_retry("rsa_key")
+                rsatimestamp, public_key = await self._get_public_key(refresh=True)
+                encrypted_old, encrypted_new = await self._encrypt_passwords(
+                    public_key, self._steam.password, new_password
+                )
+                await self._recovery_verify_password(
+                    data=params,
+                    encrypted_password=encrypted_old,
+                    rsatimestamp=rsatimestamp,
+                )
 
         # Set new password
-        key = await self._get_rsa_key()
-        await self._check_password_available(new_password)
-        await self._change_password_request(
-            data=params,
-            encrypted_password=self._encrypt_password(new_password, key.mod, key.exp),
-            rsatimestamp=key.timestamp,
-        )
+        with self._step("change_password"):
+            await self._check_password_available(new_password)
+            await self._change_password_request(
+                data=params,
+                encrypted_password=encrypted_new,
+                rsatimestamp=rsatimestamp,
+            )
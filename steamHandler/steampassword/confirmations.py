@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    TypeVar,
+)
+
+from steamlib.api.trade import SteamTrade
+from steamlib.api.trade.exceptions import (
+    GetConfirmationsError,
+    NotFoundMobileConfirmationError,
+)
+
+from steampassword.metrics import rotation_metrics
+
+T = TypeVar("T")
+
+
+def backoff_delays(
+    initial: float = 0.5, maximum: float = 8.0, jitter: float = 0.3
+) -> Iterator[float]:
+    """Exponentially growing pauses, each randomly spread by +-jitter."""
+    delay = initial
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(delay * 2, maximum)
+
+
+async def poll_until(
+    check: Callable[[], Awaitable[Optional[T]]],
+    timeout: float,
+    initial: float = 0.5,
+    maximum: float = 8.0,
+) -> T:
+    """
+    Call check() with jittered exponential backoff until it returns a value
+    other than None. Raises asyncio.TimeoutError after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays(initial, maximum):
+        result = await check()
+        if result is not None:
+            return result
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise asyncio.TimeoutError
+        await asyncio.sleep(min(delay, left))
+
+
+class _AccountPoll:
+    __slots__ = ("trade", "waiters", "wakeup", "task", "last_error")
+
+    def __init__(self, trade: SteamTrade):
+        self.trade = trade
+        # creator_id -> future resolved with the mobile_confirm() response
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.last_error: Optional[Exception] = None
+
+
+class ConfirmationPoller:
+    """
+    Waits for mobile confirmations and accepts them.
+
+    Every account has at most one polling task. All flows waiting for a
+    confirmation of the account share its getlist requests, and the task
+    stops once nobody waits. A new waiter wakes the task up at once; while
+    the confirmation is missing it backs off exponentially with jitter, so
+    concurrent rotations don't poll Steam in lockstep.
+    """
+
+    def __init__(self, initial_delay: float = 0.5, max_delay: float = 8.0):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._accounts: Dict[int, _AccountPoll] = {}
+
+    async def confirm(self, trade: SteamTrade, creator_id: int, timeout: float = 60.0) -> Dict:
+        """
+        Wait for the confirmation created by creator_id and accept it.
+
+        Raises NotFoundMobileConfirmationError if it doesn't appear within timeout seconds.
+        """
+        steamid = trade.steam.steamid
+        account = self._accounts.get(steamid)
+        if account is None or account.task is None or account.task.done():
+            account = _AccountPoll(trade)
+            account.task = asyncio.ensure_future(self._poll(steamid, account))
+            self._accounts[steamid] = account
+        future = account.waiters.get(creator_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            account.waiters[creator_id] = future
+        account.wakeup.set()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise NotFoundMobileConfirmationError(
+                f"Not found confirmation for creator_id={creator_id}"
+            ) from account.last_error
+        finally:
+            if account.waiters.get(creator_id) is future:
+                del account.waiters[creator_id]
+
+    async def _poll(self, steamid: int, account: _AccountPoll) -> None:
+        try:
+            delays = backoff_delays(self.initial_delay, self.max_delay)
+            fetches = 0
+            while account.waiters:
+                account.wakeup.clear()
+                fetches += 1
+                if fetches > 1:
+                    rotation_metrics.count_retry("mobile_confirmation")
+                try:
+                    found = await self._accept_pending(account)
+                except Exception as e:
+                    # Not fatal, the next request may succeed before the waiters' deadlines
+                    account.last_error = e
+                    found = False
+                if found:
+                    delays = backoff_delays(self.initial_delay, self.max_delay)
+                try:
+                    await asyncio.wait_for(account.wakeup.wait(), next(delays))
+                    delays = backoff_delays(self.initial_delay, self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._accounts.get(steamid) is account:
+                del self._accounts[steamid]
+
+    async def _accept_pending(self, account: _AccountPoll) -> bool:
+        confirmations = await account.trade.get_mobile_confirmations()
+        if confirmations.success is False:
+            raise GetConfirmationsError(
+                message=confirmations.message,
+                detail=confirmations.detail,
+            )
+        found = False
+        for confirmation in confirmations.conf:
+            future = account.waiters.get(confirmation.creator_id)
+            if future is None or future.done():
+                continue
+            found = True
+            try:
+                result = await account.trade.mobile_confirm(
+                    confirmation_id=confirmation.confirmation_id,
+                    confirmation_key=confirmation.confirmation_key,
+                )
+            except Exception as e:
+                result = e
+            if not future.done():
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        return found
+
+
+confirmation_poller = ConfirmationPoller()
@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+# Upper bounds of the step duration buckets, seconds
+BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "errors")
+
+    def __init__(self):
+        # One counter per bucket plus the overflow (+Inf) one
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, value: float) -> None:
+        for idx, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            idx = len(BUCKETS)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile, capped by the maximum."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKETS[idx], self.max) if idx < len(BUCKETS) else self.max
+        return self.max
+
+
+class RotationMetrics:
+    """
+    Process-wide metrics of the Steam password change pipeline.
+
+    Every step of SteamPasswordChange.change() is a span: its duration goes
+    to the step histogram and a failure is counted against it. Requests are
+    counted per host by MeteredRequestStrategy, retries (relogin, stale RSA
+    key) per step, so a regression in any part of the flow is visible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps: Dict[str, Histogram] = {}
+        self.requests: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.started_at = time.time()
+
+    @contextmanager
+    def span(self, step: str) -> Iterator[None]:
+        started = time.monotonic()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                histogram = self.steps.get(step)
+                if histogram is None:
+                    histogram = self.steps[step] = Histogram()
+                histogram.observe(elapsed)
+                if failed:
+                    histogram.errors += 1
+
+    def count_request(self, host: str) -> None:
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    def count_retry(self, step: str) -> None:
+        with self._lock:
+            self.retries[step] = self.retries.get(step, 0) + 1
+
+    def snapshot(self) -> Dict:
+        """
+        Returns:
+            dict: steps {step: {count, errors, avg, p50, p95, max}},
+            requests {host: count}, retries {step: count}, since (unix time)
+        """
+        with self._lock:
+            steps = {
+                step: {
+                    "count": histogram.count,
+                    "errors": histogram.errors,
+                    "avg": histogram.total / histogram.count if histogram.count else 0.0,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "max": histogram.max,
+                }
+                for step, histogram in self.steps.items()
+            }
+            return {
+                "steps": steps,
+                "requests": dict(self.requests),
+                "retries": dict(self.retries),
+                "since": self.started_at,
+            }
+
+    def dump_histograms(self) -> str:
+        """Cumulative step histograms in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for step, histogram in sorted(self.steps.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'steam_rotation_step_seconds_bucket{{step="{step}",le="{le}"}} {cumulative}')
+                lines.append(f'steam_rotation_step_seconds_sum{{step="{step}"}} {histogram.total:.3f}')
+                lines.append(f'steam_rotation_step_seconds_count{{step="{step}"}} {histogram.count}')
+                lines.append(f'steam_rotation_step_errors_total{{step="{step}"}} {histogram.errors}')
+            for host, count in sorted(self.requests.items()):
+                lines.append(f'steam_requests_total{{host="{host}"}} {count}')
+            for step, count in sorted(self.retries.items()):
+                lines.append(f'steam_rotation_retries_total{{step="{step}"}} {count}')
+        return "\n".join(lines)
+
+
+rotation_metrics = RotationMetrics()
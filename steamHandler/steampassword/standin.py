@@ -0,0 +1,488 @@
+import argparse
+import asyncio
+import base64
+import json
+import random
+import secrets
+import time
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import rsa
+from aiohttp import web
+
+from pysteamauth.pb2.steammessages_auth.steamclient_pb2 import (
+    CAuthentication_BeginAuthSessionViaCredentials_Request,
+    CAuthentication_BeginAuthSessionViaCredentials_Response,
+    CAuthentication_GetPasswordRSAPublicKey_Response,
+    CAuthentication_PollAuthSessionStatus_Request,
+    CAuthentication_PollAuthSessionStatus_Response,
+    CAuthentication_UpdateAuthSessionWithSteamGuardCode_Request,
+    EAuthSessionGuardType,
+)
+
+STEAMID_BASE = 76561198000000000
+
+# EResult codes returned in the X-eresult header
+ERESULT_INVALID_PASSWORD = 5
+ERESULT_SERVICE_UNAVAILABLE = 20
+
+
+class StandinAccount:
+    __slots__ = ("login", "password", "steamid", "sessions", "confirmations")
+
+    def __init__(self, login: str, password: str, steamid: int):
+        self.login = login
+        self.password = password
+        self.steamid = steamid
+        # steamLoginSecure values issued to the account
+        self.sessions: set = set()
+        # Pending mobile confirmations, see StandinSteam._send_recovery_code()
+        self.confirmations: List[Dict] = []
+
+
+class StandinSteam:
+    """
+    Offline stand-in for the Steam endpoints used by the password rotation.
+
+    Emulates the pysteamauth login (IAuthenticationService, finalizelogin,
+    settoken), ITwoFactorService/QueryTime, mobile confirmations and the
+    help.steampowered.com password change wizard, with configurable latency
+    and failure injection. Point CustomSteam at it with the STEAM_STANDIN_URL
+    environment variable or a MeteredRequestStrategy created with base_url.
+    Run it standalone with:
+
+        python steamHandler/steampassword/standin.py --port 8765 --latency 0.05 0.2
+
+    Requests are addressed as <base_url>/<steam host>/<path> and cookies are
+    scoped to the /<steam host> path, so hosts keep separate cookies as they
+    do on Steam. Unknown accounts are registered on their first login with
+    the password they log in with.
+
+    Attributes:
+        requests (Dict[str, int]): Served requests per "<host><path>", for benchmarks
+    """
+
+    def __init__(
+        self,
+        latency: Tuple[float, float] = (0.0, 0.0),
+        failure_rate: float = 0.0,
+        confirmation_delay: float = 0.0,
+        session_ttl: int = 86400,
+        rsa_key_ttl: int = 3600,
+        rsa_bits: int = 1024,
+        auto_register: bool = True,
+    ):
+        """
+        Args:
+            latency (tuple): Bounds of the random delay of every response, seconds
+            failure_rate (float): Share of requests answered with 503 and EResult ServiceUnavailable
+            confirmation_delay (float): Time until a requested mobile confirmation appears, seconds
+            session_ttl (int): Lifetime of the issued steamLoginSecure tokens, seconds
+            rsa_key_ttl (int): How often the login RSA key is rotated, seconds
+            rsa_bits (int): Size of the login RSA key
+            auto_register (bool): Register unknown accounts on their first login
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.confirmation_delay = confirmation_delay
+        self.session_ttl = session_ttl
+        self.rsa_key_ttl = rsa_key_ttl
+        self.rsa_bits = rsa_bits
+        self.auto_register = auto_register
+
+        self.accounts: Dict[str, StandinAccount] = {}
+        self.requests: Dict[str, int] = {}
+        # timestamp -> private key; old keys are kept, Steam accepts them for a while too
+        self._rsa_keys: Dict[int, rsa.PrivateKey] = {}
+        self._rsa_timestamp = 0
+        self._auth_sessions: Dict[int, Tuple[StandinAccount, bool]] = {}
+        self._refresh_tokens: Dict[str, StandinAccount] = {}
+        # wizard "s" -> state of a password change
+        self._wizards: Dict[int, Dict] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._routes = {
+            ("steamcommunity.com", "/"): self._root,
+            ("store.steampowered.com", "/"): self._root,
+            ("help.steampowered.com", "/"): self._root,
+            ("steamcommunity.com", "/chat/clientjstoken"): self._clientjstoken,
+            ("api.steampowered.com", "/IAuthenticationService/GetPasswordRSAPublicKey/v1"): self._get_password_rsa_key,
+            ("api.steampowered.com", "/IAuthenticationService/BeginAuthSessionViaCredentials/v1"): self._begin_auth_session,
+            ("api.steampowered.com", "/IAuthenticationService/UpdateAuthSessionWithSteamGuardCode/v1"): self._update_auth_session,
+            ("api.steampowered.com", "/IAuthenticationService/PollAuthSessionStatus/v1"): self._poll_auth_session,
+            ("api.steampowered.com", "/ITwoFactorService/QueryTime/v0001"): self._query_time,
+            ("login.steampowered.com", "/jwt/finalizelogin"): self._finalize_login,
+            ("steamcommunity.com", "/login/settoken"): self._set_token,
+            ("store.steampowered.com", "/login/settoken"): self._set_token,
+            ("help.steampowered.com", "/login/settoken"): self._set_token,
+            ("steamcommunity.com", "/mobileconf/getlist"): self._get_confirmations,
+            ("steamcommunity.com", "/mobileconf/ajaxop"): self._confirm,
+            ("help.steampowered.com", "/wizard/HelpChangePassword"): self._help_change_password,
+            ("help.steampowered.com", "/wizard/HelpWithLoginInfoEnterCode"): self._enter_code,
+            ("help.steampowered.com", "/wizard/AjaxSendAccountRecoveryCode"): self._send_recovery_code,
+            ("help.steampowered.com", "/wizard/AjaxPollAccountRecoveryConfirmation"): self._poll_recovery_confirmation,
+            ("help.steampowered.com", "/wizard/AjaxVerifyAccountRecoveryCode"): self._verify_recovery_code,
+            ("help.steampowered.com", "/wizard/AjaxAccountRecoveryGetNextStep"): self._next_step,
+            ("help.steampowered.com", "/login/getrsakey"): self._get_rsa_key,
+            ("help.steampowered.com", "/wizard/AjaxAccountRecoveryVerifyPassword"): self._verify_password,
+            ("help.steampowered.com", "/wizard/AjaxCheckPasswordAvailable"): self._check_password_available,
+            ("help.steampowered.com", "/wizard/AjaxAccountRecoveryChangePassword"): self._change_password,
+        }
+
+    def add_account(self, login: str, password: str, steamid: Optional[int] = None) -> StandinAccount:
+        account = StandinAccount(login, password, steamid or STEAMID_BASE + len(self.accounts))
+        self.accounts[login] = account
+        return account
+
+    def make_mafile(self, login: str, password: str) -> Dict:
+        """Register an account and return a maFile for it, as written by Steam Desktop Authenticator."""
+        account = self.add_account(login, password)
+        return {
+            "account_name": login,
+            "shared_secret": base64.b64encode(secrets.token_bytes(20)).decode(),
+            "identity_secret": base64.b64encode(secrets.token_bytes(20)).decode(),
+            "device_id": f"android:{secrets.token_hex(16)}",
+            "Session": {"SteamID": account.steamid},
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL for MeteredRequestStrategy."""
+        app = web.Application()
+        app.router.add_route("*", "/{host}{path:/.*}", self._dispatch)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _dispatch(self, request: web.Request) -> web.StreamResponse:
+        host = request.match_info["host"]
+        path = request.match_info["path"]
+        if host == "help.steampowered.com" and path[3:4] == "/" and path[1:3].isalpha():
+            # Language prefix of the help site: /en/wizard/..., /ru/wizard/...
+            path = path[3:]
+        if len(path) > 1:
+            path = path.rstrip("/")
+        handler = self._routes.get((host, path))
+        if handler is None:
+            return web.Response(status=404)
+
+        key = f"{host}{path}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+        low, high = self.latency
+        if high > 0:
+            await asyncio.sleep(random.uniform(low, high))
+        if self.failure_rate and random.random() < self.failure_rate:
+            return web.Response(status=503, headers={"X-eresult": str(ERESULT_SERVICE_UNAVAILABLE)})
+        return await handler(request, host)
+
+    # --- Sessions ---
+
+    def _rsa_key(self) -> Tuple[int, rsa.PrivateKey]:
+        now = int(time.time())
+        if now - self._rsa_timestamp >= self.rsa_key_ttl:
+            self._rsa_timestamp = now
+            self._rsa_keys[now] = rsa.newkeys(self.rsa_bits)[1]
+        return self._rsa_timestamp, self._rsa_keys[self._rsa_timestamp]
+
+    def _decrypt(self, encrypted: str, timestamp: int) -> Optional[str]:
+        key = self._rsa_keys.get(int(timestamp))
+        if key is None:
+            return None
+        try:
+            return rsa.decrypt(base64.b64decode(encrypted), key).decode("ascii")
+        except (rsa.DecryptionError, ValueError):
+            return None
+
+    def _issue_session(self, account: StandinAccount) -> str:
+        payload = base64.urlsafe_b64encode(
+            json.dumps({"sub": str(account.steamid), "exp": int(time.time()) + self.session_ttl}).encode()
+        ).decode().rstrip("=")
+        token = f"{account.steamid}%7C%7CeyJhbGciOiJFUzI1NiJ9.{payload}.{secrets.token_urlsafe(16)}"
+        account.sessions.add(token)
+        return token
+
+    def _session_account(self, request: web.Request) -> Optional[StandinAccount]:
+        token = request.cookies.get("steamLoginSecure")
+        if not token:
+            return None
+        steamid = int(token.split("%7C%7C", 1)[0]) if "%7C%7C" in token else 0
+        for account in self.accounts.values():
+            if account.steamid == steamid and token in account.sessions:
+                return account
+        return None
+
+    @staticmethod
+    def _protobuf(message) -> web.Response:
+        return web.Response(body=message.SerializeToString(), content_type="application/octet-stream")
+
+    @staticmethod
+    async def _protobuf_input(request: web.Request) -> bytes:
+        data = await request.post() if request.method == "POST" else request.query
+        return base64.b64decode(data.get("input_protobuf_encoded", ""))
+
+    async def _root(self, request: web.Request, host: str) -> web.Response:
+        response = web.Response(text="<html></html>", content_type="text/html")
+        if "sessionid" not in request.cookies:
+            response.set_cookie("sessionid", secrets.token_hex(12), path=f"/{host}")
+        return response
+
+    async def _clientjstoken(self, request: web.Request, host: str) -> web.Response:
+        account = self._session_account(request)
+        if account is None:
+            return web.json_response({"logged_in": False})
+        return web.json_response({"logged_in": True, "steamid": str(account.steamid)})
+
+    async def _get_password_rsa_key(self, request: web.Request, host: str) -> web.Response:
+        timestamp, key = self._rsa_key()
+        return self._protobuf(CAuthentication_GetPasswordRSAPublicKey_Response(
+            publickey_mod=format(key.n, "x"),
+            publickey_exp=format(key.e, "x"),
+            timestamp=timestamp,
+        ))
+
+    async def _begin_auth_session(self, request: web.Request, host: str) -> web.Response:
+        message = CAuthentication_BeginAuthSessionViaCredentials_Request.FromString(
+            await self._protobuf_input(request)
+        )
+        password = self._decrypt(message.encrypted_password, message.encryption_timestamp)
+        account = self.accounts.get(message.account_name)
+        if account is None and self.auto_register and password is not None:
+            account = self.add_account(message.account_name, password)
+        if account is None or password != account.password:
+            return web.Response(status=200, headers={"X-eresult": str(ERESULT_INVALID_PASSWORD)})
+        client_id = random.getrandbits(63)
+        self._auth_sessions[client_id] = (account, False)
+        response = CAuthentication_BeginAuthSessionViaCredentials_Response(
+            client_id=client_id,
+            request_id=secrets.token_bytes(16),
+            steamid=account.steamid,
+            interval=5,
+        )
+        confirmation = response.allowed_confirmations.add()
+        confirmation.confirmation_type = EAuthSessionGuardType.k_EAuthSessionGuardType_DeviceCode
+        return self._protobuf(response)
+
+    async def _update_auth_session(self, request: web.Request, host: str) -> web.Response:
+        # Any Steam Guard code is accepted, the stand-in doesn't check the shared secrets
+        message = CAuthentication_UpdateAuthSessionWithSteamGuardCode_Request.FromString(
+            await self._protobuf_input(request)
+        )
+        session = self._auth_sessions.get(message.client_id)
+        if session is not None:
+            self._auth_sessions[message.client_id] = (session[0], True)
+        return web.Response(body=b"")
+
+    async def _poll_auth_session(self, request: web.Request, host: str) -> web.Response:
+        message = CAuthentication_PollAuthSessionStatus_Request.FromString(await self._protobuf_input(request))
+        session = self._auth_sessions.pop(message.client_id, None)
+        if session is None or not session[1]:
+            return self._protobuf(CAuthentication_PollAuthSessionStatus_Response())
+        refresh_token = secrets.token_urlsafe(32)
+        self._refresh_tokens[refresh_token] = session[0]
+        return self._protobuf(CAuthentication_PollAuthSessionStatus_Response(
+            refresh_token=refresh_token,
+            access_token=secrets.token_urlsafe(32),
+            account_name=session[0].login,
+        ))
+
+    async def _query_time(self, request: web.Request, host: str) -> web.Response:
+        return web.json_response({"response": {"server_time": str(int(time.time()))}})
+
+    async def _finalize_login(self, request: web.Request, host: str) -> web.Response:
+        data = await request.post()
+        account = self._refresh_tokens.pop(data.get("nonce", ""), None)
+        if account is None:
+            return web.json_response({"success": False, "error": 8})
+        base = f"{request.scheme}://{request.host}"
+        return web.json_response({
+            "steamID": str(account.steamid),
+            "redir": "https://steamcommunity.com/login/home/?goto=",
+            "transfer_info": [
+                {
+                    "url": f"https://{domain}/login/settoken",
+                    "params": {"nonce": self._issue_session(account), "auth": secrets.token_hex(16)},
+                }
+                for domain in ("steamcommunity.com", "store.steampowered.com", "help.steampowered.com")
+            ],
+            "primary_domain": base,
+        })
+
+    async def _set_token(self, request: web.Request, host: str) -> web.Response:
+        data = await request.post()
+        response = web.json_response({"result": 1})
+        response.set_cookie("steamLoginSecure", data.get("nonce", ""), path=f"/{host}")
+        return response
+
+    # --- Mobile confirmations ---
+
+    async def _get_confirmations(self, request: web.Request, host: str) -> web.Response:
+        account = self._account_by_steamid(request.query.get("a"))
+        if account is None:
+            return web.json_response({"success": False, "message": "Invalid authenticator"})
+        now = time.time()
+        return web.json_response({
+            "success": True,
+            "conf": [conf for conf in account.confirmations if conf["creation_time"] <= now],
+        })
+
+    async def _confirm(self, request: web.Request, host: str) -> web.Response:
+        account = self._account_by_steamid(request.query.get("a"))
+        if account is None:
+            return web.json_response({"success": False})
+        for conf in account.confirmations:
+            if str(conf["id"]) == request.query.get("cid") and str(conf["nonce"]) == request.query.get("ck"):
+                account.confirmations.remove(conf)
+                wizard = self._wizards.get(int(conf["creator_id"]))
+                if wizard is not None:
+                    wizard["confirmed"] = True
+                return web.json_response({"success": True})
+        return web.json_response({"success": False})
+
+    def _account_by_steamid(self, steamid: Optional[str]) -> Optional[StandinAccount]:
+        for account in self.accounts.values():
+            if str(account.steamid) == steamid:
+                return account
+        return None
+
+    # --- Password change wizard ---
+
+    def _wizard(self, request: web.Request, values) -> Tuple[Optional[StandinAccount], Optional[Dict]]:
+        account = self._session_account(request)
+        wizard = self._wizards.get(int(values.get("s") or 0))
+        if account is None or wizard is None or wizard["account"] is not account:
+            return account, None
+        return account, wizard
+
+    @staticmethod
+    def _error(message: str) -> web.Response:
+        return web.json_response({"errorMsg": message})
+
+    async def _help_change_password(self, request: web.Request, host: str) -> web.Response:
+        account = self._session_account(request)
+        if account is None:
+            return web.Response(
+                text='<div id="error_description">Please sign in to continue.</div>',
+                content_type="text/html",
+            )
+        s = random.getrandbits(62)
+        self._wizards[s] = {"account": account, "confirmed": False, "verified": False}
+        raise web.HTTPFound(
+            f"/{host}/wizard/HelpWithLoginInfoEnterCode?s={s}&account={account.steamid - STEAMID_BASE}"
+            f"&reset=1&lost=0&issueid=406"
+        )
+
+    async def _enter_code(self, request: web.Request, host: str) -> web.Response:
+        return web.Response(text="<html></html>", content_type="text/html")
+
+    async def _send_recovery_code(self, request: web.Request, host: str) -> web.Response:
+        account, wizard = self._wizard(request, await request.post())
+        if wizard is None:
+            return self._error("Your session has expired.")
+        s = next(key for key, value in self._wizards.items() if value is wizard)
+        account.confirmations.append({
+            "type": 6,
+            "type_name": "Account recovery",
+            "id": random.getrandbits(40),
+            "creator_id": s,
+            "nonce": random.getrandbits(40),
+            "creation_time": time.time() + self.confirmation_delay,
+            "cancel": "Cancel",
+            "accept": "Confirm",
+            "icon": "",
+            "multi": False,
+            "headline": "Password change",
+            "summary": [],
+        })
+        return web.json_response({"success": True})
+
+    async def _poll_recovery_confirmation(self, request: web.Request, host: str) -> web.Response:
+        _, wizard = self._wizard(request, await request.post())
+        if wizard is None:
+            return self._error("Your session has expired.")
+        return web.json_response({"success": wizard["confirmed"], "continue": wizard["confirmed"]})
+
+    async def _verify_recovery_code(self, request: web.Request, host: str) -> web.Response:
+        _, wizard = self._wizard(request, request.query)
+        if wizard is None or not wizard["confirmed"]:
+            return self._error("The confirmation was not accepted.")
+        return web.json_response({"hash": secrets.token_hex(16)})
+
+    async def _next_step(self, request: web.Request, host: str) -> web.Response:
+        _, wizard = self._wizard(request, await request.post())
+        if wizard is None or not wizard["confirmed"]:
+            return self._error("The confirmation was not accepted.")
+        return web.json_response({"redirect": ""})
+
+    async def _get_rsa_key(self, request: web.Request, host: str) -> web.Response:
+        timestamp, key = self._rsa_key()
+        return web.json_response({
+            "success": True,
+            "publickey_mod": format(key.n, "x"),
+            "publickey_exp": format(key.e, "x"),
+            "timestamp": timestamp,
+            "token_gid": secrets.token_hex(8),
+        })
+
+    async def _verify_password(self, request: web.Request, host: str) -> web.Response:
+        data = await request.post()
+        account, wizard = self._wizard(request, data)
+        if wizard is None or not wizard["confirmed"]:
+            return self._error("The confirmation was not accepted.")
+        if self._decrypt(data.get("password", ""), int(data.get("rsatimestamp") or 0)) != account.password:
+            return self._error("The password you have entered is incorrect.")
+        wizard["verified"] = True
+        return web.json_response({"hash": secrets.token_hex(16)})
+
+    async def _check_password_available(self, request: web.Request, host: str) -> web.Response:
+        data = await request.post()
+        return web.json_response({"available": len(data.get("password", "")) >= 8})
+
+    async def _change_password(self, request: web.Request, host: str) -> web.Response:
+        data = await request.post()
+        account, wizard = self._wizard(request, data)
+        if wizard is None or not wizard["verified"]:
+            return self._error("Verify your current password first.")
+        password = self._decrypt(data.get("password", ""), int(data.get("rsatimestamp") or 0))
+        if password is None:
+            return self._error("The password could not be decrypted.")
+        account.password = password
+        del self._wizards[int(data["s"])]
+        return web.json_response({"hash": secrets.token_hex(16)})
+
+
+async def _serve(args) -> None:
+    standin = StandinSteam(
+        latency=tuple(args.latency),
+        failure_rate=args.failure_rate,
+        confirmation_delay=args.confirmation_delay,
+    )
+    base_url = await standin.start(args.host, args.port)
+    print(f"Steam stand-in is listening on {base_url}, set STEAM_STANDIN_URL={base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline Steam stand-in for the password rotation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--confirmation-delay", type=float, default=0.0)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
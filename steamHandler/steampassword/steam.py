@@ -1,9 +1,13 @@
+import base64
 import json
+import os
+import time
 from typing import (
     Any,
     Dict,
     Optional,
 )
+from urllib.parse import unquote
 
 import aiohttp
 from pysteamauth.abstract import (
@@ -13,9 +17,15 @@ from pysteamauth.abstract import (
 from pysteamauth.auth import Steam
 from urllib3.util import parse_url
 
+from steampassword.metrics import rotation_metrics
+from steampassword.transport import MeteredRequestStrategy
+
 
 class CustomSteam(Steam):
 
+    # Stored sessions expiring sooner than this are renewed before use, seconds
+    SESSION_EXPIRY_MARGIN = 600
+
     def __init__(
         self,
         login: str,
@@ -35,13 +45,47 @@ class CustomSteam(Steam):
             identity_secret=identity_secret,
             device_id=device_id,
             cookie_storage=cookie_storage,
-            request_strategy=request_strategy,
+            request_strategy=(
+                request_strategy if request_strategy is not None
+                else MeteredRequestStrategy(os.getenv("STEAM_STANDIN_URL"))
+            ),
         )
 
     @property
     def password(self) -> str:
         return self._password
 
+    async def session_expires_at(self) -> Optional[int]:
+        """Expiry (unix time) of the stored steamLoginSecure token, None if there is no session."""
+        token = (await self.cookies("steamcommunity.com")).get("steamLoginSecure")
+        if not token:
+            return None
+        try:
+            # "<steamid>||<JWT>", the JWT payload carries the expiry
+            payload = unquote(token).split("||", 1)[1].split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            return int(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+
+    async def login_to_steam(self) -> None:
+        """
+        Log in unless the stored session is valid for a while yet.
+
+        A stored session is used without an extra authorization request;
+        callers that get an authorization failure call relogin().
+        """
+        expires_at = await self.session_expires_at()
+        if expires_at is not None and expires_at - time.time() > self.SESSION_EXPIRY_MARGIN:
+            return
+        await super().login_to_steam()
+
+    async def relogin(self) -> None:
+        """Drop the stored session (revoked or expired early) and log in again."""
+        rotation_metrics.count_retry("relogin")
+        await self._storage.set(self._login, {})
+        await super().login_to_steam()
+
     async def json_request(self, url: str, method: str = "GET", **kwargs: Any) -> Dict:
         return json.loads(await super().request(url, method, **kwargs))
 
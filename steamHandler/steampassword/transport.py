@@ -0,0 +1,205 @@
+import asyncio
+import contextvars
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+import aiohttp
+from aiohttp.abc import AbstractCookieJar
+from pysteamauth.abstract import RequestStrategyAbstract
+from pysteamauth.errors import check_steam_error
+from urllib3.util import parse_url
+from yarl import URL
+
+from configHandler.configService import config_service
+from steampassword.metrics import rotation_metrics
+
+T = TypeVar("T")
+
+# Connections kept to all Steam hosts together and to any single one of them
+CONNECTIONS_LIMIT = 100
+CONNECTIONS_PER_HOST = 10
+# Resolved Steam host addresses are reused this long, seconds
+DNS_CACHE_TTL = 300
+REQUEST_TIMEOUT = 30
+
+
+# Private session of a request_sync() call made while no loop is bound
+_standalone_session: contextvars.ContextVar[Optional[aiohttp.ClientSession]] = contextvars.ContextVar(
+    "standalone_session", default=None
+)
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class SteamTransport:
+    """
+    Process-wide HTTP layer of all Steam requests.
+
+    One aiohttp session over one pooled TCPConnector: TCP and TLS connections
+    to Steam hosts are kept alive and reused by every account, host addresses
+    are cached and no host gets more than CONNECTIONS_PER_HOST concurrent
+    connections. The session has no cookie jar of its own, cookies belong to
+    the accounts (see MeteredRequestStrategy). Requests go through the
+    STEAM_PROXY_URL of the current settings.
+
+    The session is bound to one event loop, the supervisor loop in the bot
+    (see bind()); request_sync() runs requests on that loop from other threads.
+    """
+
+    def __init__(
+        self,
+        limit: int = CONNECTIONS_LIMIT,
+        limit_per_host: int = CONNECTIONS_PER_HOST,
+        dns_cache_ttl: int = DNS_CACHE_TTL,
+        timeout: float = REQUEST_TIMEOUT,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    def bind(self) -> None:
+        """Bind the shared session to the running loop. Call on the loop requests are made on."""
+        self.session()
+
+    def session(self) -> aiohttp.ClientSession:
+        standalone = _standalone_session.get()
+        if standalone is not None:
+            return standalone
+        loop = asyncio.get_running_loop()
+        if self._loop is not None and self._loop is not loop and not self._loop.is_closed():
+            raise RuntimeError("The Steam session is bound to another event loop, use request_sync()")
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # The loop of the previous session is closed (a finished asyncio.run()), it can't be reused
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    async def request(
+        self,
+        url: str,
+        method: str,
+        cookie_jar: AbstractCookieJar,
+        base_url: Optional[str] = None,
+        **kwargs: Any,
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a request with the cookies of cookie_jar and store the received ones in it.
+
+        Args:
+            cookie_jar: Cookies of the account the request is made for
+            base_url: Send the request to <base_url>/<host>/<path> instead,
+                that is to the offline stand-in (see standin.StandinSteam)
+        """
+        parsed = parse_url(url)
+        rotation_metrics.count_request(parsed.host)
+        if base_url:
+            url = f"{base_url.rstrip('/')}/{parsed.host}{parsed.request_uri}"
+        cookies = {key: morsel.value for key, morsel in cookie_jar.filter_cookies(URL(url)).items()}
+        cookies.update(kwargs.pop("cookies", None) or {})
+        kwargs.setdefault("proxy", config_service.settings.STEAM_PROXY_URL or None)
+        response = await self.session().request(method, url, cookies=cookies, **kwargs)
+        # Cookies set by redirects are kept as well
+        for received in (*response.history, response):
+            cookie_jar.update_cookies(received.cookies, received.url)
+        error = response.headers.get("X-eresult")
+        if error:
+            check_steam_error(int(error))
+        return response
+
+    def request_sync(self, request: Callable[[], Awaitable[T]], timeout: float = REQUEST_TIMEOUT) -> T:
+        """
+        Run a coroutine making Steam requests from synchronous code.
+
+        On the loop the session is bound to if it is running in another thread,
+        so the pooled connections are reused; otherwise on a temporary loop
+        with a private session, the shared one is left alone.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            if _running_loop() is loop:
+                raise RuntimeError("request_sync() would block the loop it waits for")
+            return asyncio.run_coroutine_threadsafe(request(), loop).result(timeout)
+        return asyncio.run(self._run_standalone(request))
+
+    async def _run_standalone(self, request: Callable[[], Awaitable[T]]) -> T:
+        session = self._create_session()
+        _standalone_session.set(session)
+        try:
+            return await request()
+        finally:
+            await session.close()
+
+    async def close(self) -> None:
+        """Close the pooled connections, the next request opens a new session."""
+        session, self._session, self._loop = self._session, None, None
+        if session is not None and not session.closed:
+            await session.close()
+
+
+steam_transport = SteamTransport()
+
+
+class MeteredRequestStrategy(RequestStrategyAbstract):
+    """
+    pysteamauth request strategy of one account over the shared steam_transport.
+
+    Only the cookies are per account; connections, limits and the proxy are
+    shared, requests are counted per host in rotation_metrics. With base_url,
+    every request goes to <base_url>/<host>/<path> instead, that is to the
+    offline stand-in (see standin.StandinSteam).
+    """
+
+    def __init__(self, base_url: Optional[str] = None, transport: Optional[SteamTransport] = None):
+        self._base_url = base_url or None
+        self._transport = transport or steam_transport
+        # Unsafe: the stand-in usually listens on an IP address, the default jar drops cookies of those
+        self._cookie_jar = aiohttp.CookieJar(unsafe=True)
+
+    async def request(self, url: str, method: str, **kwargs: Any) -> aiohttp.ClientResponse:
+        return await self._transport.request(url, method, self._cookie_jar, self._base_url, **kwargs)
+
+    async def text(self, url: str, method: str, **kwargs: Any) -> str:
+        return await (await self.request(url, method, **kwargs)).text()
+
+    async def bytes(self, url: str, method: str, **kwargs: Any) -> bytes:
+        return await (await self.request(url, method, **kwargs)).read()
+
+    def cookies(self, domain: str = "steamcommunity.com") -> Mapping[str, str]:
+        if self._base_url is None:
+            return {
+                cookie.key: cookie.value
+                for cookie in self._cookie_jar
+                if cookie["domain"] == domain
+            }
+        # The stand-in scopes cookies of a Steam host to its /<host> path
+        return {
+            cookie.key: cookie.value
+            for cookie in self._cookie_jar
+            if cookie["path"] == f"/{domain}"
+        }
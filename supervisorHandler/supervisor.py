@@ -0,0 +1,341 @@
+import asyncio
+import signal
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+from logger import logger
+
+
+class ComponentStats:
+    __slots__ = (
+        "state", "starts", "failures", "last_error", "started_at", "last_beat",
+        "cpu_time", "work_count", "work_time", "max_work_time",
+    )
+
+    def __init__(self):
+        self.state = "pending"
+        self.starts = 0
+        self.failures = 0
+        self.last_error = None
+        self.started_at = None
+        self.last_beat = None
+        # Seconds of CPU spent by the component, see Supervisor.measure() and _accounted()
+        self.cpu_time = 0.0
+        # Units of work (events, checks, rotations) reported through measure()
+        self.work_count = 0
+        self.work_time = 0.0
+        self.max_work_time = 0.0
+
+
+class Component:
+    __slots__ = ("name", "run", "heartbeat_timeout", "on_stop", "stats", "task")
+
+    def __init__(self, name, run, heartbeat_timeout=None, on_stop=None):
+        self.name = name
+        self.run = run
+        self.heartbeat_timeout = heartbeat_timeout
+        self.on_stop = on_stop
+        self.stats = ComponentStats()
+        self.task = None
+
+
+@types.coroutine
+def _accounted(coro, stats):
+    """
+    Drive a coroutine step by step, adding the thread CPU time of every step
+    to stats. Steps of different tasks never overlap on one loop, so this is
+    the exact CPU cost of the component, not of the whole loop.
+    """
+    value, error = None, None
+    while True:
+        started = time.thread_time()
+        try:
+            if error is None:
+                signal_ = coro.send(value)
+            else:
+                signal_ = coro.throw(error)
+        except StopIteration as e:
+            return e.value
+        finally:
+            stats.cpu_time += time.thread_time() - started
+        try:
+            value, error = (yield signal_), None
+        except BaseException as e:
+            value, error = None, e
+
+
+async def run_in_thread(func, *args, name=None):
+    """
+    Run blocking func(stop_event, *args) in a daemon thread and wait for it.
+
+    Unlike asyncio.to_thread, the thread doesn't hold up interpreter exit.
+    Cancelling the wait sets stop_event, func is expected to check it and return.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    stop_event = threading.Event()
+
+    def resolve(result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target():
+        try:
+            result = func(stop_event, *args)
+        except BaseException as e:
+            outcome = {"error": e}
+        else:
+            outcome = {"result": result}
+        try:
+            loop.call_soon_threadsafe(lambda: resolve(**outcome))
+        except RuntimeError:
+            # The loop is already closed, nobody waits for the result
+            pass
+
+    threading.Thread(target=target, name=name, daemon=True).start()
+    try:
+        return await future
+    finally:
+        stop_event.set()
+
+
+class Supervisor:
+    """
+    Runs the long-lived parts of the service as tasks on one event loop.
+
+    Every component is a coroutine function. It is restarted with exponential
+    backoff when it raises or returns, and when it stops reporting heartbeats
+    for longer than its heartbeat_timeout. SIGINT/SIGTERM stop all components,
+    wait for protected jobs (see protect()) and run the on_stop hooks.
+    CPU time is accounted per component, latency per reported unit of work,
+    along with the event loop lag.
+    """
+
+    def __init__(self, base_delay=1.0, max_delay=60.0, stable_after=60.0,
+                 health_interval=10.0, grace_period=30.0):
+        """
+        Args:
+            base_delay (float): First restart delay, doubled on every consecutive failure, seconds
+            max_delay (float): Maximum restart delay, seconds
+            stable_after (float): Run time after which a component's failure counter is reset, seconds
+            health_interval (float): Pause between heartbeat checks, seconds
+            grace_period (float): How long shutdown waits for protected jobs, seconds
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after
+        self.health_interval = health_interval
+        self.grace_period = grace_period
+        # Called with (component name, error message) when a component fails
+        self.on_failure = None
+
+        self.components = {}
+        self._protected = set()
+        self._loop = None
+        self._stopping = None
+        self._loop_lag = 0.0
+        self._max_loop_lag = 0.0
+
+    def add(self, name, run, heartbeat_timeout=None, on_stop=None):
+        """
+        Register a component.
+
+        Args:
+            name (str): Component name used in logs and metrics
+            run: Coroutine function running the component, called on every (re)start
+            heartbeat_timeout (float): Restart the component if it doesn't call
+                heartbeat() or measure() for this long, seconds. None disables the check
+            on_stop: Optional coroutine function called on shutdown
+        """
+        self.components[name] = Component(name, run, heartbeat_timeout, on_stop)
+
+    def heartbeat(self, name):
+        """Report that a component is alive. Safe to call from any thread."""
+        self.components[name].stats.last_beat = time.monotonic()
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Account one unit of work of a component: wall time, CPU time of the
+        current thread (for components running in their own thread) and a heartbeat.
+        """
+        stats = self.components[name].stats
+        started, started_cpu = time.monotonic(), time.thread_time()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            # On the loop thread CPU is already counted by _accounted()
+            if threading.current_thread() is not threading.main_thread():
+                stats.cpu_time += time.thread_time() - started_cpu
+            stats.work_count += 1
+            stats.work_time += elapsed
+            stats.max_work_time = max(stats.max_work_time, elapsed)
+            stats.last_beat = time.monotonic()
+
+    def protect(self, coro):
+        """
+        Run coro as a task that is not cancelled with its component, shutdown
+        waits up to grace_period for it. For jobs that must not stop halfway.
+        """
+        task = asyncio.ensure_future(coro)
+        self._protected.add(task)
+        task.add_done_callback(self._protected.discard)
+        return asyncio.shield(task)
+
+    def stop(self):
+        """Request a graceful shutdown. Safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def get_metrics(self):
+        """Per-component state and counters, plus the event loop lag in seconds."""
+        now = time.monotonic()
+        components = {}
+        for name, component in self.components.items():
+            stats = component.stats
+            components[name] = {
+                "state": stats.state,
+                "starts": stats.starts,
+                "failures": stats.failures,
+                "last_error": stats.last_error,
+                "uptime": now - stats.started_at if stats.state == "running" else 0.0,
+                "since_heartbeat": now - stats.last_beat if stats.last_beat else None,
+                "cpu_time": stats.cpu_time,
+                "work_count": stats.work_count,
+                "avg_work_time": stats.work_time / stats.work_count if stats.work_count else 0.0,
+                "max_work_time": stats.max_work_time,
+            }
+        return {
+            "components": components,
+            "loop_lag": self._loop_lag,
+            "max_loop_lag": self._max_loop_lag,
+        }
+
+    async def run(self):
+        """Run all components until stop() or a termination signal."""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: Ctrl+C cancels asyncio.run's main task, handled by finally below
+                pass
+
+        for component in self.components.values():
+            component.task = asyncio.create_task(self._supervise(component), name=component.name)
+        monitors = [
+            asyncio.create_task(self._check_health()),
+            asyncio.create_task(self._measure_loop_lag()),
+        ]
+        logger.info(f"Supervisor started: {', '.join(self.components)}")
+        try:
+            await self._stopping.wait()
+        finally:
+            await self._shutdown(monitors)
+
+    async def _supervise(self, component):
+        try:
+            await self._run_with_restarts(component)
+        finally:
+            component.stats.state = "stopped"
+
+    async def _run_with_restarts(self, component):
+        stats = component.stats
+        while not self._stopping.is_set():
+            stats.state = "running"
+            stats.starts += 1
+            stats.started_at = stats.last_beat = time.monotonic()
+            try:
+                await _accounted(component.run(), stats)
+                error = "component exited"
+            except asyncio.CancelledError:
+                if self._stopping.is_set():
+                    raise
+                # Cancelled by _check_health(), keep supervising
+                task = asyncio.current_task()
+                if hasattr(task, "uncancel"):
+                    task.uncancel()
+                error = "no heartbeat"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            if self._stopping.is_set():
+                break
+
+            if time.monotonic() - stats.started_at >= self.stable_after:
+                stats.failures = 0
+            stats.failures += 1
+            stats.last_error = error
+            stats.state = "restarting"
+            delay = min(self.base_delay * 2 ** (stats.failures - 1), self.max_delay)
+            logger.error(f"Component {component.name} failed ({error}), restarting in {delay:.0f}s")
+            if self.on_failure is not None:
+                try:
+                    self.on_failure(component.name, error)
+                except Exception as e:
+                    logger.error(f"Supervisor failure callback failed: {str(e)}")
+            await asyncio.sleep(delay)
+
+    async def _check_health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            now = time.monotonic()
+            for component in self.components.values():
+                stats = component.stats
+                if (
+                    component.heartbeat_timeout is not None
+                    and stats.state == "running"
+                    and now - stats.last_beat > component.heartbeat_timeout
+                ):
+                    logger.warning(
+                        f"Component {component.name} sent no heartbeat for "
+                        f"{now - stats.last_beat:.0f}s, restarting it."
+                    )
+                    # Interrupts the run, _supervise() treats it as a failure and restarts it
+                    stats.state = "unhealthy"
+                    component.task.cancel()
+
+    async def _measure_loop_lag(self):
+        interval = 1.0
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            self._loop_lag = time.monotonic() - started - interval
+            self._max_loop_lag = max(self._max_loop_lag, self._loop_lag)
+            if self._loop_lag > 1.0:
+                logger.warning(f"Event loop lag {self._loop_lag:.2f}s, something is blocking it.")
+
+    async def _shutdown(self, monitors):
+        logger.info("Shutting down...")
+        self._stopping.set()
+        for task in monitors:
+            task.cancel()
+        tasks = [component.task for component in self.components.values() if component.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *monitors, return_exceptions=True)
+
+        if self._protected:
+            logger.info(f"Waiting for {len(self._protected)} unfinished jobs...")
+            done, pending = await asyncio.wait(set(self._protected), timeout=self.grace_period)
+            if pending:
+                logger.warning(f"{len(pending)} jobs did not finish in {self.grace_period:.0f}s.")
+
+        for component in reversed(list(self.components.values())):
+            if component.on_stop is None:
+                continue
+            try:
+                await component.on_stop()
+            except Exception as e:
+                logger.error(f"Failed to stop component {component.name}: {str(e)}")
+        logger.info("Shutdown complete.")
+
+
+supervisor = Supervisor()